@@ -1,17 +1,43 @@
-from flask import Flask, render_template, jsonify, request, session
-from datetime import datetime, timedelta, timezone
-import pytz
+from flask import (Flask, Response, abort, copy_current_request_context, render_template, jsonify,
+                   request, send_file, session, stream_with_context, url_for)
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
 import csv
+import hashlib
+import io
+import json
+import mimetypes
 import requests
 import os
+import random
+import subprocess
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
-import re
-from threading import Lock
+from threading import Lock, Thread
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import uuid
 import time as time_module
 import google.generativeai as genai
 import jwt
-from functools import wraps
+from dateutil.parser import isoparse
+from functools import lru_cache, wraps
+from operator import itemgetter
+from werkzeug.utils import safe_join
+from assets import DIST_DIR, build_assets, load_critical_css, precompressed_variant
+from bulk_ingest import due_feeds, load_feeds
+from event_store import DEFAULT_USER, EventStore, event_key
+from fastjson import FastJSONProvider, dumps_bytes, fragment
+from filewatch import WatchedFile, atomic_write, file_digest
+from ics_parser import CSV_FIELDNAMES, decode_lines, event_to_csv_row, iter_ics_events
+from search_index import SearchIndex
+from shared_cache import SharedTimetableCache
+from lessons import event_from_csv_row, event_from_ics, row_to_event, subject_filter
+from room_index import RoomIndex
+from timetable_export import csv_chunks, ics_chunks
+from timetable_diff import COMPARED_FIELDS, affected_keys, affected_rooms, diff_events
+from upstream import Blocking, Upstream, run_flow
+from timeutil import local_day, local_day_start, parse_local_iso, request_now, to_local
 
 # Load configuration from config.py (or config.py.example if config.py doesn't exist)
 try:
@@ -47,52 +73,152 @@ except ImportError:
 if GOOGLE_AI_API_KEY:
     genai.configure(api_key=GOOGLE_AI_API_KEY)
 
-app = Flask(__name__)
+# STATIC_FOLDER: serve (and build static/dist, fast_timetable.json) from another
+# directory, e.g. loadtest.py points it at its temporary copy
+app = Flask(__name__, static_folder=os.getenv('STATIC_FOLDER', 'static'))
+# orjson when available, and pre-encoded fragments inside responses (see fastjson.py)
+app.json = FastJSONProvider(app)
+# Jinja asks |tojson for sort_keys by default, which takes the slow path
+app.jinja_env.policies['json.dumps_kwargs'] = {}
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['ICS_URL'] = ICS_URL
+# Further timetable feeds for the room index, "<name> <ICS URL>" per line (see bulk_ingest.py)
+app.config['FEEDS_FILE'] = os.getenv('FEEDS_FILE', os.path.join('uploads', 'feeds.txt'))
+# BULK_INGEST=1: every worker checks FEEDS_FILE periodically (see start_bulk_ingest)
+app.config['BULK_INGEST'] = os.getenv('BULK_INGEST') == '1'
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
 
+# Minified, content-hashed static assets (see assets.py)
+ASSET_MAX_AGE = 365 * 24 * 3600
+try:
+    _asset_manifest = build_assets(app.static_folder)
+except OSError as e:
+    print(f"Could not build static assets, serving sources: {e}")
+    _asset_manifest = {'files': {}, 'sources': {}}
+# Above-the-fold CSS inlined into index.html, the rest loads asynchronously
+_critical_css = load_critical_css(app.static_folder)
+# Static files of the page shell, precached by the service worker (templates/sw.js)
+SHELL_ASSETS = ('css/style.css', 'js/main.js', 'lang/de.json', 'lang/en.json')
+
 # ISY.KSR.CH Configuration
 ISY_BASE_URL = 'https://isy.ksr.ch'
 ISY_API_URL = 'https://isy-api.ksr.ch/graphql'
+ISY_AUTH_URL = 'https://isy-api.ksr.ch/authentication_token'
 ISY_DASHBOARD_URL = f'{ISY_BASE_URL}/dashboard'
+OPENWEATHER_URL = 'https://api.openweathermap.org/data/2.5/weather'
+
+# External services, each behind its own circuit breaker (see upstream.py)
+ics_upstream = Upstream('ics', timeout=8, deadline=15)
+weather_upstream = Upstream('openweather', timeout=4, deadline=8)
+isy_upstream = Upstream('isy', timeout=6, deadline=10)
+
+# Last good weather data, served while OpenWeather is unreachable
+_weather_cache = {'data': None, 'fetched_at': 0}
+
+# /api/isy/messages/mark: request flags -> fields of the user's message state
+# (Message.me). ISY's GraphQL API (API Platform) updates that state as its own
+# resource: update<Type>(input: {id, ...}) { <type> { ... } }. The type and the
+# mutation are looked up in ISY's schema on the first mark (see
+# isy_state_mutation_flow); ISY_STATE_TYPE is only used when ISY doesn't
+# answer schema queries.
+ISY_MARK_FIELDS = {'read': 'readWhen', 'seen': 'seenWhen', 'completed': 'completedWhen'}
+ISY_STATE_TYPE = os.getenv('ISY_STATE_TYPE', 'MessageMe')
+ISY_MARK_MAX = 100
+# {'names': (mutation, resource) or None} once the schema was read
+_isy_state_mutation = {}
+
+# Latest ISY messages per user: {username: {'todo'|'inbox': {message_id: message}}}
+_isy_message_store = {}
+_isy_message_lock = Lock()
+# Opened messages (body, author, ...) per (username, IRI), valid as long as the
+# lists report the same lastContentChange; least recently opened dropped first
+_isy_body_cache = {}
+ISY_BODY_CACHE_SIZE = 2000
+# Per-user state of a message, taken from the lists over a cached body
+ISY_STATE_FIELDS = ('readWhen', 'seenWhen', 'completedWhen', 'archivedWhen')
 
 # Ensure upload folder exists
 Path(app.config['UPLOAD_FOLDER']).mkdir(exist_ok=True)
 
 # Cache for timetable data to speed up loading
+# Per-worker view of the timetable snapshot shared by all workers ('shared').
+# The snapshot is rebuilt when uploads/timetable.csv changes (tracked by
+# 'source') or, in auto mode, when CACHE_DURATION expired.
 _timetable_cache = {
     'events': None,
-    'timestamp': 0,
-    'lock': Lock()
+    'version': None,
+    'window': None,
+    'lock': Lock(),
+    'source': WatchedFile(os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')),
+    'shared': SharedTimetableCache(os.path.join(app.config['UPLOAD_FOLDER'], 'supergui.db'))
 }
+_event_store = EventStore(_timetable_cache['shared'])
+_search_index = SearchIndex()
+# Room occupancy over all feeds in the event store (see room_index.py)
+_room_index = RoomIndex()
+_room_index_lock = Lock()
+# /api/rooms/<room>/schedule: default period from the start of today
+ROOM_SCHEDULE_DEFAULT_DAYS = 7
+# Feed owner in the event store (the app's own timetable)
+TIMETABLE_USER = DEFAULT_USER
+# Bulk import of FEEDS_FILE: feeds are fetched again after BULK_INGEST_INTERVAL,
+# each worker checks every BULK_INGEST_CHECK seconds whether any are due
+BULK_INGEST_INTERVAL = 15 * 60
+BULK_INGEST_CHECK = 60
+_bulk_ingest_thread = {'thread': None}
+_bulk_ingest_lock = Lock()
 CACHE_DURATION = 300  # 5 minutes cache
+# Hot set: only events from HOT_DAYS_BACK days ago to HOT_WEEKS_AHEAD weeks
+# ahead are kept in memory (search index, encoded lessons, weekly buckets);
+# all others stay in the event store. The window slides at local midnight.
+# It should span the longest school holidays, otherwise the timetable looks
+# empty during them.
+HOT_DAYS_BACK = 7
+HOT_WEEKS_AHEAD = 12
 
-# Subject abbreviation mapping
-SUBJECT_MAPPING = {
-    'IF': 'Informatik',
-    'F': 'Französisch',
-    'MU': 'Musik',
-    'M': 'Mathematik',
-    'D': 'Deutsch',
-    'WR': 'Wirtschaft und Recht',
-    'SP05': 'Sport',
-    'BG08': 'Bildnerisches Gestalten',
-    'E': 'Englisch',
-    'GG': 'Geografie',
-    'BIO': 'Biologie',
-    'BIO1': 'Biologie',
-    'G': 'Geschichte',
-    'CH': 'Chemie',
-    'CH1': 'Chemie',
-    # Legacy mappings for sample data
-    'MA': 'Mathematik',
-    'DE': 'Deutsch',
-    'EN': 'Englisch',
-    'PH': 'Physik',
-    'IN': 'Informatik'
+# Background parsing of large ICS uploads
+UPLOAD_ASYNC_THRESHOLD = 512 * 1024  # Parse uploads above 512KB in the background
+UPLOAD_JOB_RETENTION = 600  # Keep finished job status for 10 minutes
+_upload_jobs = {}
+_upload_jobs_lock = Lock()
+_upload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload')
+
+# /api/dashboard runs its upstream-bound sections on their own pool, each
+# with a timeout (seconds) counted from when it starts running; a section
+# still queued after DASHBOARD_QUEUE_TIMEOUT is dropped without running
+DASHBOARD_TIMEOUTS = {
+    'weather': 4,
+    'isy_dashboard_messages': 8
 }
+DASHBOARD_QUEUE_TIMEOUT = 2
+_dashboard_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='dashboard')
+
+# First-paint snapshot of /api/timetable, rewritten whenever the timetable
+# snapshot changes or the payload passes its next lesson boundary
+FAST_TIMETABLE_PATH = os.path.join(app.static_folder, 'fast_timetable.json')
+# horizon: changes starting before it (or touching an exam) can alter the payload
+_fast_timetable = {'version': None, 'valid_until': 0, 'horizon': 0, 'payload': None}
+
+# /api/changes: default look-back without since, and page size limits
+CHANGES_DEFAULT_WINDOW = 7 * 86400
+CHANGES_DEFAULT_LIMIT = 100
+CHANGES_MAX_LIMIT = 500
+# /api/export.*: Last-Modified of the current snapshot version, computed once per version
+_export_meta = {'version': None, 'last_modified': 0}
+WEEKDAYS_SHORT_DE = ('Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So')
+WEEKDAYS_DE = ('Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag')
+MONTHS_DE = ('Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli', 'August',
+             'September', 'Oktober', 'November', 'Dezember')
+
+# Every lesson's JSON, encoded once per snapshot: {event_key: (signature, fragment)}
+_lesson_fragments = {}
+_lesson_signature = itemgetter(*COMPARED_FIELDS)
+
+# Weekly view: lesson fragments bucketed per local day once per snapshot
+# (only the changed days are rebuilt), responses cached per week (by Monday)
+_weekly_cache = {'days': {}, 'weeks': {}}
+WEEKLY_CACHE_WEEKS = 8
 
 # OneNote notebook links for each subject
 # IMPORTANT: Replace these with YOUR OWN OneNote notebook URLs
@@ -130,7 +256,7 @@ def verify_isy_token(token):
         # Check if token is expired
         if 'exp' in decoded:
             exp_timestamp = decoded['exp']
-            if datetime.now(timezone.utc).timestamp() > exp_timestamp:
+            if request_now() > exp_timestamp:
                 print(f"Token expired at {datetime.fromtimestamp(exp_timestamp, timezone.utc)}")
                 return None
         
@@ -139,27 +265,36 @@ def verify_isy_token(token):
         print(f"Error verifying token: {e}")
         return None
 
+def check_isy_login():
+    """
+    Check the ISY session of the current request
+    Returns an error response, or None after storing the username in request.isy_username
+    """
+    # Check if user has ISY token in session
+    isy_token = session.get('isy_token')
+    
+    if not isy_token:
+        return jsonify({'error': 'ISY login required', 'login_required': True}), 401
+    
+    # Verify token is still valid
+    token_data = verify_isy_token(isy_token)
+    if not token_data:
+        session.pop('isy_token', None)
+        return jsonify({'error': 'ISY session expired', 'login_required': True}), 401
+    
+    # Store username in request context
+    request.isy_username = token_data.get('username')
+    return None
+
 def isy_login_required(f):
     """
     Decorator to require ISY authentication for routes
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Check if user has ISY token in session
-        isy_token = session.get('isy_token')
-        
-        if not isy_token:
-            return jsonify({'error': 'ISY login required', 'login_required': True}), 401
-        
-        # Verify token is still valid
-        token_data = verify_isy_token(isy_token)
-        if not token_data:
-            session.pop('isy_token', None)
-            return jsonify({'error': 'ISY session expired', 'login_required': True}), 401
-        
-        # Store username in request context
-        request.isy_username = token_data.get('username')
-        
+        denied = check_isy_login()
+        if denied is not None:
+            return denied
         return f(*args, **kwargs)
     return decorated_function
 
@@ -230,7 +365,7 @@ def get_person_id_from_me(token):
         }
         
         print(f"Trying 'me' query fallback...")
-        response = requests.post(ISY_API_URL, json=payload, headers=headers, timeout=10)
+        response = isy_upstream.request('POST', ISY_API_URL, key=('me', token), json=payload, headers=headers)
         
         response.raise_for_status()
         
@@ -263,15 +398,16 @@ def get_person_id_from_me(token):
         traceback.print_exc()
         return None
 
-def fetch_isy_messages(token, person_id):
+def fetch_isy_messages_flow(token, person_id):
     """
     Fetch messages from ISY using GraphQL API with authenticated session
-    Returns list of messages or None on error
+    Returns list of messages or None on error (flow, use with yield from)
     
-    Uses ISY's GraphQL API to fetch messages with full details
+    Only the fields the message list shows are requested; bodies are
+    loaded when a message is opened (see isy_message_flow).
     """
     try:
-        # GraphQL query for fetching messages with all important fields
+        # GraphQL query for the message list (no body)
         graphql_query = """
         query fetchMessages($me: String!, $first: Int, $after: String) {
           messages(
@@ -280,38 +416,25 @@ def fetch_isy_messages(token, person_id):
             after: $after
             order: {visibleTo: "DESC"}
           ) {
-            pageInfo {
-              hasNextPage
-              hasPreviousPage
-              startCursor
-              endCursor
-            }
             edges {
               node {
                 _id
                 id
                 title
                 subject
-                body
+                previewText
                 status
                 priority
-                dtFrom
-                dtTo
                 visibleFrom
                 visibleTo
                 dtDue
-                shownIn
-                authLevel
-                accomplished
+                lastContentChange
                 me {
                   id
                   readWhen
                   seenWhen
                   archivedWhen
-                  priorityTodo
-                  positionTodo
                   completedWhen
-                  modified
                 }
               }
             }
@@ -326,25 +449,11 @@ def fetch_isy_messages(token, person_id):
             "after": None
         }
         
-        # Make GraphQL request
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json',
-            'Accept': '*/*'
-        }
-        
-        payload = {
-            'operationName': 'fetchMessages',
-            'variables': variables,
-            'query': graphql_query
-        }
-        
         print(f"Fetching ISY messages for person: {person_id}")
-        response = requests.post(ISY_API_URL, json=payload, headers=headers, timeout=10)
+        response = yield isy_graphql(token, 'fetchMessages', graphql_query, variables)
         response.raise_for_status()
         
         data = response.json()
-        print(f"ISY API Response: {data}")
         
         # Check for GraphQL errors
         if 'errors' in data:
@@ -363,23 +472,19 @@ def fetch_isy_messages(token, person_id):
                     'id': node.get('_id'),
                     'title': node.get('title', 'Keine Titel'),
                     'subject': node.get('subject'),
-                    'body': node.get('body'),
+                    'previewText': node.get('previewText'),
                     'priority': node.get('priority', 0),
                     'status': node.get('status'),
-                    'dtFrom': node.get('dtFrom'),
-                    'dtTo': node.get('dtTo'),
                     'visibleFrom': node.get('visibleFrom'),
                     'visibleTo': node.get('visibleTo'),
                     'dtDue': node.get('dtDue'),
-                    'shownIn': node.get('shownIn'),
-                    'accomplished': node.get('accomplished'),
+                    'lastContentChange': node.get('lastContentChange'),
                     'completed': me.get('completedWhen') is not None,
                     'completedWhen': me.get('completedWhen'),
                     'readWhen': me.get('readWhen'),
                     'seenWhen': me.get('seenWhen'),
                     'archivedWhen': me.get('archivedWhen'),
-                    'priorityTodo': me.get('priorityTodo'),
-                    'positionTodo': me.get('positionTodo')
+                    'meId': me.get('id')
                 })
         else:
             print(f"No messages data in response: {data}")
@@ -392,74 +497,516 @@ def fetch_isy_messages(token, person_id):
         traceback.print_exc()
         return None
 
-def get_subject_name(abbreviation):
-    """Convert subject abbreviation to full name"""
-    return SUBJECT_MAPPING.get(abbreviation, abbreviation)
+def _isy_timestamp(value):
+    """Epoch seconds of an ISY ISO date string, or None"""
+    if not value:
+        return None
+    try:
+        return int(isoparse(value).timestamp())
+    except (ValueError, OverflowError):
+        return None
+
+
+def remember_isy_messages(username, kind, messages):
+    """
+    Keep the latest ISY messages of a user and update their search documents
+    kind is 'todo' (/api/isy/messages) or 'inbox' (/api/isy/dashboard-messages)
+    """
+    with _isy_message_lock:
+        _isy_message_store.setdefault(username, {})[kind] = {m['id']: m for m in messages if m.get('id')}
+        # Bodies of messages edited since they were opened are loaded again
+        for msg in messages:
+            iri = isy_message_iri(msg.get('id') or '')
+            cached = _isy_body_cache.get((username, iri)) if iri else None
+            if cached is not None and msg.get('lastContentChange') != cached.get('lastContentChange'):
+                del _isy_body_cache[(username, iri)]
+    
+    docs = {}
+    for msg in messages:
+        if not msg.get('id'):
+            continue
+        fields = [
+            (msg.get('title'), 3),
+            (msg.get('subject'), 2),
+            (msg.get('previewText'), 1)
+        ]
+        payload = {
+            'type': 'message',
+            'id': msg['id'],
+            'title': msg.get('title'),
+            'subject': msg.get('subject'),
+            'previewText': msg.get('previewText'),
+            'visibleTo': msg.get('visibleTo')
+        }
+        rank_time = _isy_timestamp(msg.get('modified') or msg.get('visibleFrom') or msg.get('dtFrom'))
+        docs[f"isy-{kind}:{username}:{msg['id']}"] = ([f for f in fields if f[0]], payload, rank_time)
+    _search_index.sync_group(f"isy-{kind}:{username}", docs, owner=username)
+
+
+def cached_isy_messages(username, kind):
+    """Last good message list of a user (see remember_isy_messages), or None"""
+    with _isy_message_lock:
+        messages = _isy_message_store.get(username, {}).get(kind)
+    return list(messages.values()) if messages is not None else None
+
+
+def isy_message_iri(message_id):
+    """'/messages/<n>' for a message id given as number or IRI, None if it is neither"""
+    value = str(message_id).strip()
+    number = value.rsplit('/', 1)[-1]
+    if not number.isdigit() or value not in (number, f'/messages/{number}'):
+        return None
+    return f'/messages/{number}'
+
+
+def _cached_isy_copies(username, iri):
+    """Cached copies of a message in the todo list and inbox (hold _isy_message_lock)"""
+    number = iri.rsplit('/', 1)[-1]
+    copies = []
+    for messages in _isy_message_store.get(username, {}).values():
+        msg = messages.get(iri) or messages.get(number) or messages.get(int(number))
+        if msg is not None:
+            copies.append(msg)
+    return copies
+
+
+def cached_isy_me_id(username, iri):
+    """IRI of the user's state of a message (Message.me) from the cached lists, or None"""
+    with _isy_message_lock:
+        return next((m['meId'] for m in _cached_isy_copies(username, iri) if m.get('meId')), None)
+
+
+def cached_isy_body(username, iri):
+    """
+    Full message as last returned by isy_message_flow, None if it isn't cached
+    or the lists don't show the same lastContentChange (any more)
+    """
+    with _isy_message_lock:
+        cached = _isy_body_cache.get((username, iri))
+        if cached is None:
+            return None
+        copies = _cached_isy_copies(username, iri)
+        if not any(m.get('lastContentChange') == cached['lastContentChange'] for m in copies):
+            return None
+        # Most recently used last
+        _isy_body_cache[(username, iri)] = _isy_body_cache.pop((username, iri))
+        state = {field: copy[field] for copy in copies for field in ISY_STATE_FIELDS if field in copy}
+    return dict(cached, **state)
+
+
+def remember_isy_body(username, iri, message):
+    """Cache an opened message until its lastContentChange changes"""
+    if not message.get('lastContentChange'):
+        return
+    with _isy_message_lock:
+        _isy_body_cache.pop((username, iri), None)
+        _isy_body_cache[(username, iri)] = message
+        while len(_isy_body_cache) > ISY_BODY_CACHE_SIZE:
+            del _isy_body_cache[next(iter(_isy_body_cache))]
+
+
+def update_isy_message_state(username, iri, values):
+    """
+    Set readWhen/seenWhen/completedWhen (and the flags derived from them) on the
+    cached copies of a message. Returns what to pass to restore_isy_message_state.
+    """
+    with _isy_message_lock:
+        previous = []
+        for msg in _cached_isy_copies(username, iri):
+            changed = dict(values)
+            if 'readWhen' in values and 'iHaveReadIt' in msg:
+                changed['iHaveReadIt'] = values['readWhen'] is not None
+            if 'completedWhen' in values and 'completed' in msg:
+                changed['completed'] = values['completedWhen'] is not None
+            previous.append((msg, {key: msg.get(key) for key in changed}))
+            msg.update(changed)
+    return previous
+
+
+def restore_isy_message_state(previous):
+    """Undo update_isy_message_state, e.g. when ISY rejected the change"""
+    with _isy_message_lock:
+        for msg, values in previous:
+            msg.update(values)
+
+
+def _store_snapshot(events, source_digest, fetched_at=None):
+    """
+    Upsert events into the event store and publish a new snapshot version atomically
+    
+    The differences to the stored snapshot go to the change feed and the
+    rooms they touch to the room update log, in the same transaction.
+    Without differences the version stays the same, so no worker reloads
+    or re-indexes anything. The first-paint file is only
+    regenerated if a change can affect it. Returns the version.
+    """
+    shared = _timetable_cache['shared']
+    seen_at = time_module.time()
+    with shared.transaction() as conn:
+        previous_version = shared.read_meta()[0]
+        # The full stored feed, the local events are only the hot window
+        previous = [row_to_event(r) for r in _event_store.all_events(TIMETABLE_USER)]
+        # No change records for the first import, every lesson would be "added"
+        changes = diff_events(previous, events) if previous else None
+        
+        _event_store.upsert(conn, TIMETABLE_USER, events, seen_at=seen_at)
+        rooms = affected_rooms(changes, previous, events)
+        if rooms:
+            _event_store.record_room_updates(conn, rooms, seen_at)
+        if changes == []:
+            version = shared.update_meta(conn, source_digest=source_digest, fetched_at=fetched_at)
+        else:
+            version = shared.bump_version(conn, source_digest=source_digest, fetched_at=fetched_at)
+            if changes:
+                _event_store.record_changes(conn, TIMETABLE_USER, version, changes, seen_at)
+    
+    if changes is None or _fast_timetable['version'] != previous_version or changes_affect_first_paint(changes):
+        write_fast_timetable(events, version)
+    else:
+        _fast_timetable['version'] = version
+    return version
+
+
+def _lesson_search_docs(events, prefix='lesson'):
+    """Search documents for timetable events: subject, teacher, room and notes"""
+    docs = {}
+    for event in events:
+        parts = event['original_summary'].split()
+        teacher = parts[1] if len(parts) > 1 and parts[1].islower() else ''
+        fields = [
+            (event['summary'].split('(')[0].strip(), 3),
+            (teacher, 2),
+            (event['location'], 2),
+            (f"{event['special_note']} {event['description']}", 1),
+            (event['original_summary'], 1)
+        ]
+        if event['is_exam']:
+            fields.append(('Prüfung Exam Test', 2))
+        payload = {
+            'type': 'lesson',
+            'summary': event['summary'],
+            'start': event['start'].isoformat(),
+            'end': event['end'].isoformat(),
+            'location': event['location'],
+            'is_exam': event['is_exam'],
+            'is_cancelled': event['is_cancelled'],
+            'special_note': event['special_note']
+        }
+        docs[f"{prefix}:{event_key(event)}"] = (fields, payload, event['start_ts'])
+    return docs
+
+
+def _changes_since_local(version):
+    """Change records from this worker's snapshot up to version, None if unknown"""
+    local_version = _timetable_cache['version']
+    if not local_version or version < local_version:
+        return None
+    if version == local_version:
+        return []
+    return _event_store.changes_between_versions(TIMETABLE_USER, local_version, version)
+
+
+def hot_window(now):
+    """Local days [first, end) of the hot in-memory event set around now"""
+    today = local_day(now)
+    return today - HOT_DAYS_BACK, today + HOT_WEEKS_AHEAD * 7
+
+def _window_bounds(window):
+    return local_day_start(window[0]), local_day_start(window[1])
+
+def _slice_window(events, window):
+    """Events (sorted by start) starting inside a window"""
+    start, stop = _window_bounds(window)
+    starts = [event['start_ts'] for event in events]
+    return events[bisect_left(starts, start):bisect_left(starts, stop)]
+
+def _rebuild_hot_views(hot):
+    """Build search index, encoded lessons and weekly buckets from scratch (caller holds the cache lock)"""
+    # Lessons that are already indexed unchanged are skipped
+    _search_index.sync_group('lessons', _lesson_search_docs(hot))
+    _lesson_fragments.clear()
+    for event in hot:
+        _lesson_fragments[event_key(event)] = (_lesson_signature(event), fragment(lesson_json(event)))
+    days = _weekly_cache['days']
+    days.clear()
+    for event in hot:
+        days.setdefault(event['day'], []).append(lesson_fragment(event))
+    _weekly_cache['weeks'].clear()
+
+def _patch_hot_views(hot, upserts, removed_keys, days):
+    """
+    Update only the given lessons in the per-snapshot views (caller holds the cache lock)
+    upserts are (re)indexed and encoded, removed_keys dropped, and the weekly
+    buckets of days rebuilt from hot; weeks containing them leave the cache.
+    """
+    _search_index.patch_group(
+        'lessons', _lesson_search_docs(upserts),
+        removed=[f"lesson:{key}" for key in removed_keys]
+    )
+    for key in removed_keys:
+        _lesson_fragments.pop(key, None)
+    for event in upserts:
+        _lesson_fragments[event_key(event)] = (_lesson_signature(event), fragment(lesson_json(event)))
+    
+    buckets = _weekly_cache['days']
+    starts = [event['start_ts'] for event in hot]
+    for day in days:
+        first = bisect_left(starts, local_day_start(day))
+        last = bisect_left(starts, local_day_start(day + 1))
+        if first < last:
+            buckets[day] = [lesson_fragment(event) for event in hot[first:last]]
+        else:
+            buckets.pop(day, None)
+        _weekly_cache['weeks'].pop(week_start(day), None)
+
+def _sync_later_exams(window):
+    """
+    Index the exams after the hot window as well (caller holds the cache lock)
+    They are few, and searching for a subject should find its exam even
+    when it is months away.
+    """
+    rows = _event_store.iter_events(TIMETABLE_USER, start=_window_bounds(window)[1], exams_only=True)
+    _search_index.sync_group('exams', _lesson_search_docs((row_to_event(r) for r in rows), prefix='exam'))
+
+def _set_local_events(events, version, source_digest):
+    """
+    Install a snapshot in this worker (caller holds the cache lock)
+    Only the events inside the hot window are kept.
+    """
+    window = hot_window(request_now())
+    changes = _changes_since_local(version) if window == _timetable_cache['window'] else None
+    hot = _slice_window(events, window)
+    _timetable_cache['events'] = hot
+    _timetable_cache['version'] = version
+    _timetable_cache['window'] = window
+    if changes is None:
+        _rebuild_hot_views(hot)
+    elif changes:
+        # The change feed says which lessons changed, patch just those
+        removed, changed = affected_keys(changes)
+        upserts = [event for event in hot if event_key(event) in changed]
+        # Lessons that moved out of the window are dropped as well
+        removed |= changed - {event_key(event) for event in upserts}
+        days = {local_day(side['start_ts']) for change in changes
+                for side in (change, change.get('before')) if side}
+        _patch_hot_views(hot, upserts, removed, days)
+    if changes != []:
+        _sync_later_exams(window)
+    # Remember which CSV content the snapshot was built from; identity None
+    # forces one stat on the next check, the digest avoids a needless reparse
+    _timetable_cache['source'].acknowledge((None, source_digest))
+
+
+def _slide_hot_window(window):
+    """
+    Move the hot set to a new window at day rollover (caller holds the cache lock)
+    Days that fell out of the window are dropped and the days that came in
+    are loaded from the event store; nothing else is touched.
+    """
+    old_first, old_end = _timetable_cache['window']
+    if window[0] < old_first or window[0] >= old_end:
+        # The clock went back or jumped past the whole window
+        rows = _event_store.events_between(TIMETABLE_USER, *_window_bounds(window))
+        hot = [row_to_event(r) for r in rows]
+        _timetable_cache['events'] = hot
+        _timetable_cache['window'] = window
+        _rebuild_hot_views(hot)
+        _sync_later_exams(window)
+        return
+    
+    events = _timetable_cache['events']
+    start, stop = _window_bounds(window)
+    first_kept = bisect_left([event['start_ts'] for event in events], start)
+    dropped = events[:first_kept]
+    added = [row_to_event(r) for r in
+             _event_store.events_between(TIMETABLE_USER, local_day_start(old_end), stop)]
+    hot = events[first_kept:] + added
+    _timetable_cache['events'] = hot
+    _timetable_cache['window'] = window
+    _patch_hot_views(
+        hot, added, {event_key(event) for event in dropped},
+        {event['day'] for event in dropped} | {event['day'] for event in added}
+    )
+    _sync_later_exams(window)
+
+
+def publish_timetable(events, fetched_at=None):
+    """
+    Publish a freshly parsed event list to all workers
+    Call after writing uploads/timetable.csv so the file watcher doesn't
+    treat our own write as an external change.
+    """
+    with _timetable_cache['lock']:
+        source_digest = file_digest(_timetable_cache['source'].path)
+        version = _store_snapshot(
+            events, source_digest,
+            fetched_at=fetched_at if fetched_at is not None else time_module.time()
+        )
+        _set_local_events(events, version, source_digest)
+
+
+def import_ics_lines(lines):
+    """
+    Convert ICS lines into timetable events and write uploads/timetable.csv
+    
+    Lines are processed one at a time, so memory only grows with the number
+    of events, not with the size of the ICS file. The CSV is written
+    atomically and left untouched if its content didn't change.
+    Returns (events, changed) with the events sorted by start time.
+    """
+    csv_path = os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')
+    events = []
+    
+    def write_csv(csvfile):
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
+        writer.writeheader()
+        for ics_event in iter_ics_events(lines):
+            writer.writerow(event_to_csv_row(ics_event))
+            event = event_from_ics(ics_event)
+            if event:
+                events.append(event)
+    
+    changed = atomic_write(csv_path, write_csv, only_if_changed=True)
+    events.sort(key=lambda x: x['start_ts'])
+    return events, changed
 
 
 def fetch_and_convert_ics_to_csv(url):
     """
     Fetch ICS from URL and convert to CSV format
-    Returns CSV file path or None on error
+    Returns (events, changed) or None on error
     """
     try:
-        # Download ICS
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+        # Download ICS and parse it straight from the response stream
+        with ics_upstream.request('GET', url, stream=True) as response:
+            response.raise_for_status()
+            events, changed = import_ics_lines(decode_lines(response.iter_lines(delimiter=b'\n')))
         
-        temp_ics = os.path.join(app.config['UPLOAD_FOLDER'], 'temp_timetable.ics')
-        with open(temp_ics, 'wb') as f:
-            f.write(response.content)
-        
-        # Parse ICS and convert to CSV
-        events = []
-        with open(temp_ics, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        event = {}
-        for line in lines:
-            line = line.strip()
-            if line.startswith("BEGIN:VEVENT"):
-                event = {}
-            elif line.startswith("SUMMARY:"):
-                event["Subject"] = line.replace("SUMMARY:", "")
-            elif line.startswith("DTSTART:"):
-                dtstart = datetime.strptime(line.replace("DTSTART:", ""), "%Y%m%dT%H%M%SZ")
-                event["Start Date"] = dtstart.strftime("%m/%d/%Y")
-                event["Start Time"] = dtstart.strftime("%H:%M")
-            elif line.startswith("DTEND:"):
-                dtend = datetime.strptime(line.replace("DTEND:", ""), "%Y%m%dT%H%M%SZ")
-                event["End Date"] = dtend.strftime("%m/%d/%Y")
-                event["End Time"] = dtend.strftime("%H:%M")
-            elif line.startswith("END:VEVENT"):
-                if event:  # Only add if event has data
-                    events.append(event)
-        
-        # Write to CSV
-        csv_path = os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')
-        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ["Subject", "Start Date", "Start Time", "End Date", "End Time", "Description", "Location"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for e in events:
-                writer.writerow({
-                    "Subject": e.get("Subject", ""),
-                    "Start Date": e.get("Start Date", ""),
-                    "Start Time": e.get("Start Time", ""),
-                    "End Date": e.get("End Date", ""),
-                    "End Time": e.get("End Time", ""),
-                    "Description": "",
-                    "Location": ""
-                })
-        
-        print(f"CSV file created: {csv_path}")
-        return csv_path
+        if changed:
+            print(f"CSV file updated: {os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')}")
+        return events, changed
         
     except Exception as e:
         print(f"Error converting ICS to CSV: {e}")
         return None
 
 
+def run_bulk_ingest():
+    """
+    Import the due feeds of FEEDS_FILE into the event store
+    Runs fetch_timetable.py --feeds in a child process: its parser processes
+    then don't have to import the app, and the 'bulk-ingest' lease keeps
+    workers (and cron runs of the script) from importing at the same time.
+    """
+    feeds_file = app.config['FEEDS_FILE']
+    try:
+        if not due_feeds(_event_store, load_feeds(feeds_file), BULK_INGEST_INTERVAL):
+            return
+    except OSError as e:
+        print(f"Could not read {feeds_file}: {e}")
+        return
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fetch_timetable.py')
+    try:
+        # A hung download or parser must not keep the loop (and the lease) forever
+        result = subprocess.run([
+            sys.executable, script, '--feeds', feeds_file,
+            '--db', _timetable_cache['shared'].db_path, '--due', str(BULK_INGEST_INTERVAL)
+        ], check=False, timeout=BULK_INGEST_INTERVAL)
+    except subprocess.TimeoutExpired:
+        print(f"Bulk import killed after {BULK_INGEST_INTERVAL}s")
+        return
+    if result.returncode != 0:
+        print(f"Bulk import exited with code {result.returncode}")
+
+
+def _bulk_ingest_loop():
+    while True:
+        # Jitter, so the workers don't all check at the same moment
+        time_module.sleep(BULK_INGEST_CHECK * random.uniform(0.8, 1.2))
+        try:
+            run_bulk_ingest()
+        except Exception as e:
+            print(f"Bulk import failed: {e}")
+
+
+def start_bulk_ingest():
+    """Start the periodic bulk import in this process if FEEDS_FILE exists; returns whether it runs"""
+    with _bulk_ingest_lock:
+        if _bulk_ingest_thread['thread'] is None and os.path.exists(app.config['FEEDS_FILE']):
+            thread = Thread(target=_bulk_ingest_loop, name='bulk-ingest', daemon=True)
+            thread.start()
+            _bulk_ingest_thread['thread'] = thread
+    return _bulk_ingest_thread['thread'] is not None
+
+
+# Opt-in, so scripts, asgi.py and the load test importing app don't start it
+if app.config['BULK_INGEST']:
+    start_bulk_ingest()
+
+
+def get_timetable_events(mode='auto'):
+    """
+    Get the timetable events, refreshing the cache only when needed
+    
+    All workers share one snapshot (see shared_cache.py). A worker only
+    loads it again when its version changed. Refreshing is done by a single
+    worker holding the refresh lease: in auto mode the ICS URL is fetched
+    again once CACHE_DURATION expired, and in both modes the snapshot is
+    rebuilt as soon as uploads/timetable.csv changes on disk.
+    Returns the events inside the hot window (see HOT_DAYS_BACK).
+    """
+    csv_path = os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')
+    source = _timetable_cache['source']
+    shared = _timetable_cache['shared']
+    current_time = time_module.time()
+    
+    with _timetable_cache['lock']:
+        version, fetched_at, source_digest = shared.read_meta()
+        if version != _timetable_cache['version']:
+            # Another worker published a new snapshot
+            if version:
+                rows = _event_store.events_between(
+                    TIMETABLE_USER, *_window_bounds(hot_window(int(current_time)))
+                )
+                _set_local_events([row_to_event(r) for r in rows], version, source_digest)
+        window = hot_window(int(current_time))
+        if _timetable_cache['events'] is not None and window != _timetable_cache['window']:
+            # Day rollover: slide the hot set instead of rebuilding it
+            _slide_hot_window(window)
+        events = _timetable_cache['events']
+        
+        needs_fetch = mode == 'auto' and app.config['ICS_URL'] and current_time - fetched_at >= CACHE_DURATION
+        if (needs_fetch or events is None or source.changed()) and shared.acquire_lease():
+            try:
+                if needs_fetch:
+                    shared.mark_fetched(current_time)
+                    result = fetch_and_convert_ics_to_csv(app.config['ICS_URL'])
+                    if result is not None:
+                        new_events, changed = result
+                        if changed or events is None:
+                            events = new_events
+                            state = source.current_state()
+                            version = _store_snapshot(events, state[1], fetched_at=current_time)
+                            _set_local_events(events, version, state[1])
+                
+                if events is None or source.changed():
+                    # Snapshot the file state before parsing, so a write during
+                    # parsing is picked up by the next check
+                    state = source.current_state()
+                    events = parse_csv_timetable(csv_path) if os.path.exists(csv_path) else []
+                    version = _store_snapshot(events, state[1])
+                    _set_local_events(events, version, state[1])
+                    source.acknowledge(state)
+            finally:
+                shared.release_lease()
+        elif events is None:
+            # Another worker is building the first snapshot - read the CSV
+            # without publishing anything until it is done
+            events = parse_csv_timetable(csv_path) if os.path.exists(csv_path) else []
+    
+    return events
+
+
 def parse_csv_timetable(csv_path):
     """
     Parse CSV timetable file
@@ -467,105 +1014,18 @@ def parse_csv_timetable(csv_path):
     Example: BIO sn 1Mf H1.03,10/22/2025,08:35,10/22/2025,09:20,,
     """
     events = []
-    zurich_tz = pytz.timezone('Europe/Zurich')
     
     try:
         with open(csv_path, 'r', encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile)
             for row in reader:
-                summary = row['Subject'].strip()
-                if not summary:
-                    continue
-                
-                # Parse dates and times
-                start_date_str = row['Start Date'].strip()
-                start_time_str = row['Start Time'].strip()
-                end_date_str = row['End Date'].strip()
-                end_time_str = row['End Time'].strip()
-                
-                if not start_date_str or not start_time_str:
-                    continue
-                
-                # Combine date and time
-                start_datetime_str = f"{start_date_str} {start_time_str}"
-                end_datetime_str = f"{end_date_str} {end_time_str}"
-                
-                # Parse datetime
-                start_dt = datetime.strptime(start_datetime_str, "%m/%d/%Y %H:%M")
-                end_dt = datetime.strptime(end_datetime_str, "%m/%d/%Y %H:%M")
-                
-                # Add 1 hour to correct timezone issue (ICS times are 1 hour too early)
-                start_dt = start_dt + timedelta(hours=1)
-                end_dt = end_dt + timedelta(hours=1)
-                
-                # Localize to Zurich timezone
-                start_dt = zurich_tz.localize(start_dt)
-                end_dt = zurich_tz.localize(end_dt)
-                
-                # Parse KSR format: "SUBJECT TEACHER CLASS ROOM"
-                # Example: "BIO sn 1Mf H1.03" or "M sig 1Mf HL3.01 (Prüfung)"
-                subject_display = summary  # Default to full summary
-                location = row.get('Location', '').strip()
-                description = row.get('Description', '').strip()
-                
-                # Extract room from SUMMARY if LOCATION is empty
-                if not location and summary:
-                    # Match KSR room format: 1-2 letters followed by digit(s).digit(s)
-                    room_match = re.search(r'\b([A-Z]{1,2}\d+\.\d{2})\b', summary)
-                    if room_match:
-                        location = room_match.group(1)
-                
-                # Extract subject abbreviation (first word before any lowercase letters)
-                # Format: "SUBJECT teacher class ROOM" or "SUBJECT class ROOM"
-                parts = summary.split()
-                if len(parts) > 0:
-                    # First part is usually the subject abbreviation (uppercase)
-                    subject_abbr = parts[0]
-                    
-                    # Get full subject name
-                    subject_name = get_subject_name(subject_abbr)
-                    
-                    # Build display name: "Subject (Room)" or just "Subject" if no room
-                    if location:
-                        subject_display = f"{subject_name} ({location})"
-                    else:
-                        subject_display = subject_name
-                
-                # Check if it's an exam:
-                # - Look for "(Prüfung)" anywhere in SUMMARY or DESCRIPTION
-                # - Note: teacher abbreviations like "klk" are NOT exam indicators
-                # - Note: "Nachprüfung" does NOT count as exam
-                is_exam = (('(prüfung)' in summary.lower() or 
-                           (description and '(prüfung)' in description.lower())) and
-                          'nachprüfung' not in summary.lower() and
-                          (not description or 'nachprüfung' not in description.lower()))
-                
-                # Check for special events (cancelled, etc.)
-                is_cancelled = any(keyword in summary.lower() or (description and keyword in description.lower()) 
-                                 for keyword in ['ausgefallen', 'cancelled', 'abgesagt', 'entfällt'])
-                
-                special_note = ''
-                if is_cancelled:
-                    special_note = 'Ausgefallen'
-                elif 'verschoben' in summary.lower() or (description and 'verschoben' in description.lower()):
-                    special_note = 'Verschoben'
-                elif 'raumwechsel' in summary.lower() or (description and 'raumwechsel' in description.lower()):
-                    special_note = 'Raumwechsel'
-                
-                events.append({
-                    'summary': subject_display,
-                    'original_summary': summary,  # Keep original for reference
-                    'start': start_dt,
-                    'end': end_dt,
-                    'description': description if description and description != 'None' else '',
-                    'location': location,
-                    'is_exam': is_exam,
-                    'is_cancelled': is_cancelled,
-                    'special_note': special_note
-                })
+                # CSV times are UTC (converted from the ICS 'Z' stamps)
+                event = event_from_csv_row(row)
+                if event:
+                    events.append(event)
         
         # Sort events by start time
-        events.sort(key=lambda x: x['start'])
+        events.sort(key=lambda x: x['start_ts'])
         return events
     except Exception as e:
         print(f"Error parsing CSV: {e}")
@@ -573,101 +1033,254 @@ def parse_csv_timetable(csv_path):
         traceback.print_exc()
         return []
 
-def get_next_lesson(events):
+def get_next_lesson(now=None):
     """Get the next upcoming lesson"""
-    zurich_tz = pytz.timezone('Europe/Zurich')
-    now = datetime.now(zurich_tz)
+    if now is None:
+        now = request_now()
     
-    for event in events:
-        if event['start'] > now:
-            return event
-    
-    return None
+    row = _event_store.next_event(TIMETABLE_USER, now)
+    return row_to_event(row) if row else None
 
-def get_current_lesson(events):
+def get_current_lesson(now=None):
     """Get the lesson that is currently happening (now between start and end time)"""
-    zurich_tz = pytz.timezone('Europe/Zurich')
-    now = datetime.now(zurich_tz)
-    
-    for event in events:
-        if event['start'] <= now <= event['end']:
-            return event
+    if now is None:
+        now = request_now()
     
-    return None
+    row = _event_store.current_event(TIMETABLE_USER, now)
+    return row_to_event(row) if row else None
 
-def get_todays_lessons(events):
+def get_todays_lessons(now=None):
     """Get all lessons for today that haven't ended yet"""
-    zurich_tz = pytz.timezone('Europe/Zurich')
-    now = datetime.now(zurich_tz)
-    today_str = now.strftime('%Y%m%d')
+    if now is None:
+        now = request_now()
     
-    todays = []
-    for event in events:
-        # Check if the event starts on the same day (compare YYYYMMDD format)
-        event_date_str = event['start'].strftime('%Y%m%d')
-        if event_date_str == today_str:
-            # Only include lessons that haven't ended yet
-            if event['end'] > now:
-                todays.append(event)
+    # Local (Zurich) day boundaries as epoch range
+    today_start = local_day_start(local_day(now))
+    tomorrow_start = local_day_start(local_day(now) + 1)
     
-    return todays
+    # Only include lessons that haven't ended yet
+    rows = _event_store.events_between(TIMETABLE_USER, today_start, tomorrow_start, ending_after=now)
+    return [row_to_event(r) for r in rows]
 
-def get_upcoming_exams(events, count=3):
+def get_upcoming_exams(count=3, now=None):
     """Get the next specified number of upcoming exams (not limited by days)"""
-    zurich_tz = pytz.timezone('Europe/Zurich')
-    now = datetime.now(zurich_tz)
+    if now is None:
+        now = request_now()
     
-    # Get all future exams and sort by start time
-    exams = [e for e in events if e['is_exam'] and e['start'] > now]
-    exams.sort(key=lambda x: x['start'])
+    rows = _event_store.upcoming_exams(TIMETABLE_USER, now, count)
+    return [row_to_event(r) for r in rows]
+
+@lru_cache(maxsize=1024)
+def day_label(day):
+    """German label of a local day number, e.g. 'Montag, 20. Oktober 2025'"""
+    d = date(1970, 1, 1) + timedelta(days=day)
+    return f"{WEEKDAYS_DE[d.weekday()]}, {d.day:02d}. {MONTHS_DE[d.month - 1]} {d.year}"
+
+def week_start(day):
+    """Local day number of the Monday of a day's week - day 0 of the epoch was a Thursday"""
+    return day - (day + 3) % 7
+
+def lesson_json(event):
+    """A lesson as listed in /api/timetable and /api/weekly"""
+    return {
+        'summary': event['summary'],
+        'start': event['start'].isoformat(),
+        'end': event['end'].isoformat(),
+        'description': event['description'],
+        'location': event['location'],
+        'is_exam': event['is_exam'],
+        'is_cancelled': event['is_cancelled'],
+        'special_note': event['special_note']
+    }
+
+def lesson_fragment(event):
+    """lesson_json() of an event, pre-encoded once per snapshot"""
+    cached = _lesson_fragments.get(event_key(event))
+    if cached is not None and cached[0] == _lesson_signature(event):
+        return cached[1]
+    # Not part of this worker's snapshot (yet)
+    return fragment(lesson_json(event))
+
+def get_weekly_lessons(now=None):
+    """
+    Get all lessons for the current week (Monday to Sunday), grouped by day
+    Returns the encoded list of {'date', 'lessons'} as a JSON fragment.
+    """
+    if now is None:
+        now = request_now()
     
-    # Return only the first 'count' exams
-    return exams[:count]
+    monday = week_start(local_day(now))
+    with _timetable_cache['lock']:
+        weeks = _weekly_cache['weeks']
+        schedule = weeks.get(monday)
+        if schedule is None:
+            days = _weekly_cache['days']
+            schedule = fragment([{'date': day_label(day), 'lessons': days[day]}
+                                 for day in range(monday, monday + 7) if day in days])
+            if len(weeks) >= WEEKLY_CACHE_WEEKS:
+                weeks.clear()
+            weeks[monday] = schedule
+    return schedule
+
+def timetable_valid_until(now, next_lesson, current_lesson, todays_lessons):
+    """Next time the /api/timetable payload changes: a lesson boundary or local midnight"""
+    boundaries = [local_day_start(local_day(now) + 1)]
+    if next_lesson:
+        boundaries.append(next_lesson['start_ts'])
+    if current_lesson:
+        boundaries.append(current_lesson['end_ts'] + 1)
+    boundaries.extend(lesson['end_ts'] for lesson in todays_lessons)
+    return min(b for b in boundaries if b > now)
 
-def get_weekly_lessons(events):
-    """Get all lessons for the current week (Monday to Sunday)"""
-    zurich_tz = pytz.timezone('Europe/Zurich')
-    now = datetime.now(zurich_tz)
+def build_timetable_payload(events, now=None):
+    """
+    Build the /api/timetable response
+    Returns (payload, valid_until) with valid_until as epoch seconds
+    """
+    if now is None:
+        now = request_now()
+    
+    if not events:
+        valid_until = timetable_valid_until(now, None, None, [])
+        return {
+            'next_lesson': None,
+            'current_lesson': None,
+            'todays_lessons': [],
+            'exams': [],
+            'valid_until': to_local(valid_until).isoformat(),
+            'message': 'Keine Stundenplan-Daten verfügbar. Bitte CSV-Datei hochladen oder automatische Synchronisation aktivieren.'
+        }, valid_until
     
-    # Calculate start of week (Monday)
-    start_of_week = now - timedelta(days=now.weekday())
-    start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
+    next_lesson = get_next_lesson(now)
+    current_lesson = get_current_lesson(now)
+    todays_lessons = get_todays_lessons(now)
+    exams = get_upcoming_exams(now=now)
     
-    # Calculate end of week (Sunday)
-    end_of_week = start_of_week + timedelta(days=7)
+    # Format current lesson data
+    current_lesson_data = None
+    if current_lesson:
+        # Extract subject name from summary (e.g., "Mathematik (HL3.01)" -> "Mathematik")
+        subject_name = current_lesson['summary'].split('(')[0].strip()
+        onenote_link = ONENOTE_LINKS.get(subject_name, None)
+        
+        current_lesson_data = {
+            'summary': current_lesson['summary'],
+            'subject': subject_name,
+            'start': current_lesson['start'].isoformat(),
+            'end': current_lesson['end'].isoformat(),
+            'location': current_lesson['location'],
+            'onenote_link': onenote_link
+        }
     
-    # Filter events for this week
-    weekly_lessons = []
-    for event in events:
-        if start_of_week <= event['start'] < end_of_week:
-            weekly_lessons.append(event)
-    
-    # Group by day
-    days = {}
-    for lesson in weekly_lessons:
-        day_key = lesson['start'].strftime('%Y-%m-%d')
-        day_name = lesson['start'].strftime('%A, %d. %B %Y')
-        
-        if day_key not in days:
-            days[day_key] = {
-                'date': day_name,
-                'lessons': []
-            }
-        days[day_key]['lessons'].append(lesson)
+    valid_until = timetable_valid_until(now, next_lesson, current_lesson, todays_lessons)
+    # Lessons are spliced in as pre-encoded fragments (see lesson_fragment)
+    return {
+        'next_lesson': lesson_fragment(next_lesson) if next_lesson else None,
+        'current_lesson': current_lesson_data,
+        'todays_lessons': [lesson_fragment(lesson) for lesson in todays_lessons],
+        'exams': [lesson_fragment(exam) for exam in exams],
+        'valid_until': to_local(valid_until).isoformat()
+    }, valid_until
+
+def changes_affect_first_paint(changes):
+    """True if a change touches an exam or starts before the first-paint horizon"""
+    horizon = _fast_timetable['horizon']
+    for change in changes:
+        for side in (change, change.get('before')):
+            if side and (side['is_exam'] or side['start_ts'] < horizon):
+                return True
+    return False
+
+def current_fast_timetable():
+    """Regenerate the first-paint snapshot if it went stale and return its payload"""
+    now = request_now()
+    version = _timetable_cache['shared'].read_meta()[0]
+    if _fast_timetable['version'] and version > _fast_timetable['version']:
+        # Another worker published changes; they may not concern the first paint
+        changes = _event_store.changes_between_versions(TIMETABLE_USER, _fast_timetable['version'], version)
+        if changes is not None and not changes_affect_first_paint(changes):
+            _fast_timetable['version'] = version
+    if (version != _fast_timetable['version'] or now >= _fast_timetable['valid_until']
+            or not os.path.exists(FAST_TIMETABLE_PATH)):
+        events = get_timetable_events('manual')
+        with _timetable_cache['lock']:
+            write_fast_timetable(events, _timetable_cache['version'], now)
+    return _fast_timetable['payload']
+
+def write_fast_timetable(events, version, now=None):
+    """
+    Regenerate static/fast_timetable.json (caller holds the cache lock)
+    The file is replaced atomically and only when its content changed.
+    """
+    if now is None:
+        now = request_now()
+    payload, valid_until = build_timetable_payload(events, now)
+    atomic_write(FAST_TIMETABLE_PATH, lambda f: f.write(dumps_bytes(payload)), binary=True, only_if_changed=True)
+    # Until local midnight, or the next lesson if that is later
+    horizon = local_day_start(local_day(now) + 1)
+    next_lesson = get_next_lesson(now) if events else None
+    if next_lesson:
+        horizon = max(horizon, next_lesson['start_ts'])
+    _fast_timetable['version'] = version
+    _fast_timetable['valid_until'] = valid_until
+    _fast_timetable['horizon'] = horizon
+    _fast_timetable['payload'] = payload
+
+@app.url_defaults
+def hashed_static_url(endpoint, values):
+    """Make url_for('static', ...) point to the built, content-hashed asset"""
+    if endpoint == 'static':
+        built = _asset_manifest['files'].get(values.get('filename'))
+        if built:
+            values['filename'] = built
+
+@app.route('/static/dist/<path:filename>')
+def hashed_static(filename):
+    """Serve a built asset, precompressed if the client accepts it, cached forever"""
+    path = safe_join(os.path.join(app.static_folder, DIST_DIR), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
     
-    # Sort days and return as list
-    sorted_days = sorted(days.items(), key=lambda x: x[0])
-    return [{'date': day[1]['date'], 'lessons': day[1]['lessons']} for day in sorted_days]
+    variant, encoding = precompressed_variant(path, request.headers.get('Accept-Encoding'))
+    response = send_file(variant, mimetype=mimetypes.guess_type(path)[0], conditional=True, max_age=ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # The file name changes with the content, so browsers never need to revalidate
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/')
 def index():
-    """Render main page"""
-    return render_template('index.html')
+    """Render main page with the critical CSS and the current timetable embedded"""
+    language = request.cookies.get('language', 'de')
+    return render_template(
+        'index.html',
+        critical_css=_critical_css,
+        initial_timetable=current_fast_timetable(),
+        language=language if language in ('de', 'en') else 'de'
+    )
+
+@app.route('/sw.js')
+def service_worker():
+    """Service worker for offline use; served from the root so it controls the whole site"""
+    precache_urls = [url_for('index')] + [url_for('static', filename=name) for name in SHELL_ASSETS]
+    # Changes with every asset build, so browsers install the new worker and drop the old shell
+    version = hashlib.sha256(json.dumps([precache_urls, _asset_manifest['sources']]).encode('utf-8')).hexdigest()[:12]
+    
+    response = Response(render_template('sw.js', version=version, precache_urls=precache_urls),
+                        mimetype='application/javascript')
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/api/isy/login', methods=['POST'])
 def isy_login():
+    """ISY login endpoint (see isy_login_flow)"""
+    return run_flow(isy_login_flow())
+
+def isy_login_flow():
     """
-    ISY login endpoint
+    ISY login
     Accepts username and password, authenticates with ISY, and stores session
     
     Uses ISY's authentication_token endpoint
@@ -681,9 +1294,6 @@ def isy_login():
         if not username or not password:
             return jsonify({'error': 'Username and password required'}), 400
         
-        # ISY authentication endpoint
-        auth_url = 'https://isy-api.ksr.ch/authentication_token'
-        
         # Prepare login payload
         login_payload = {
             'loginid': username,
@@ -698,7 +1308,8 @@ def isy_login():
             'Referer': 'https://isy.ksr.ch/'
         }
         
-        response = requests.post(auth_url, json=login_payload, headers=headers, timeout=10)
+        response = yield isy_upstream.call('POST', ISY_AUTH_URL, key=('login', username),
+                                           json=login_payload, headers=headers)
         
         if response.status_code != 200:
             return jsonify({'error': 'Invalid credentials'}), 401
@@ -764,6 +1375,10 @@ def isy_status():
 @app.route('/api/isy/messages')
 @isy_login_required
 def isy_messages():
+    """ISY messages/todos of the logged-in user (see isy_messages_flow)"""
+    return run_flow(isy_messages_flow())
+
+def isy_messages_flow():
     """
     Fetch ISY messages/todos for authenticated user using GraphQL API
     """
@@ -792,14 +1407,19 @@ def isy_messages():
             }), 500
         
         # Fetch messages using GraphQL
-        messages = fetch_isy_messages(token, person_id)
+        messages = yield from fetch_isy_messages_flow(token, person_id)
         
         if messages is None:
+            # Serve the last good list while ISY is failing
+            cached = cached_isy_messages(request.isy_username, 'todo')
+            if cached is not None:
+                return jsonify({'messages': cached, 'stale': True})
             return jsonify({
                 'error': 'Failed to fetch messages',
                 'message': 'Error communicating with ISY GraphQL API'
             }), 500
         
+        remember_isy_messages(request.isy_username, 'todo', messages)
         return jsonify({'messages': messages})
         
     except Exception as e:
@@ -814,6 +1434,10 @@ def isy_messages():
 @app.route('/api/isy/dashboard-messages')
 @isy_login_required
 def isy_dashboard_messages():
+    """ISY inbox of the logged-in user (see isy_dashboard_messages_flow)"""
+    return run_flow(isy_dashboard_messages_flow())
+
+def isy_dashboard_messages_flow():
     """
     Fetch inbox messages for dashboard display using GraphQL API
     This uses the getInboxMessages query with the user's person ID
@@ -842,7 +1466,7 @@ def isy_dashboard_messages():
                 'message': 'Failed to fetch person information from ISY. Please try logging in again.'
             }), 500
         
-        # GraphQL query for inbox messages
+        # GraphQL query for inbox messages: only what the dashboard list shows
         query = """
         query getInboxMessages($me: String!, $first: Int, $after: String, $last: Int, $before: String) {
           messages(
@@ -853,21 +1477,11 @@ def isy_dashboard_messages():
             before: $before
           ) {
             totalCount
-            pageInfo {
-              hasNextPage
-              hasPreviousPage
-              startCursor
-              endCursor
-              __typename
-            }
             edges {
               node {
                 ...MessageInboxFragment
-                __typename
               }
-              __typename
             }
-            __typename
           }
         }
 
@@ -881,30 +1495,19 @@ def isy_dashboard_messages():
           status
           visibleTo
           iHaveReadIt
-          authLevel
           modified
-          modifiedby
           lastContentChange
           primaryAuthor {
-            id
-            _id
-            role
             person {
-              id
-              _id
               firstname
               lastname
-              __typename
             }
-            __typename
           }
           me {
             id
             seenWhen
             readWhen
-            __typename
           }
-          __typename
         }
         """
         
@@ -914,21 +1517,7 @@ def isy_dashboard_messages():
             'after': None
         }
         
-        # Make GraphQL request
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json',
-            'Accept': '*/*',
-            'Origin': 'https://isy.ksr.ch',
-            'Referer': 'https://isy.ksr.ch/'
-        }
-        
-        response = requests.post(
-            ISY_API_URL,
-            json={'query': query, 'variables': variables, 'operationName': 'getInboxMessages'},
-            headers=headers,
-            timeout=10
-        )
+        response = yield isy_graphql(token, 'getInboxMessages', query, variables)
         
         if response.status_code != 200:
             print(f"GraphQL request failed with status {response.status_code}")
@@ -938,7 +1527,6 @@ def isy_dashboard_messages():
             }), 500
         
         data = response.json()
-        print(f"Dashboard Messages GraphQL Response: {data}")
         
         # Parse messages from response
         messages = []
@@ -982,17 +1570,27 @@ def isy_dashboard_messages():
                     'status': node.get('status'),
                     'visibleTo': node.get('visibleTo'),
                     'iHaveReadIt': node.get('iHaveReadIt', False),
-                    'authLevel': node.get('authLevel'),
                     'modified': node.get('modified'),
                     'lastContentChange': node.get('lastContentChange'),
                     'author': author_name,
                     'seenWhen': me.get('seenWhen'),
-                    'readWhen': me.get('readWhen')
+                    'readWhen': me.get('readWhen'),
+                    'meId': me.get('id')
                 })
         
         print(f"Found {len(messages)} dashboard messages")
+        remember_isy_messages(request.isy_username, 'inbox', messages)
         return jsonify({'messages': messages, 'totalCount': total_count if 'total_count' in locals() else len(messages)})
         
+    except requests.exceptions.RequestException as e:
+        print(f"ISY dashboard messages unavailable: {e}")
+        cached = cached_isy_messages(request.isy_username, 'inbox')
+        if cached is not None:
+            return jsonify({'messages': cached, 'totalCount': len(cached), 'stale': True})
+        return jsonify({
+            'error': 'ISY nicht erreichbar',
+            'message': 'ISY antwortet momentan nicht. Bitte später erneut versuchen.'
+        }), 503
     except Exception as e:
         print(f"Error in isy_dashboard_messages endpoint: {e}")
         import traceback
@@ -1002,120 +1600,578 @@ def isy_dashboard_messages():
             'message': str(e)
         }), 500
 
+def isy_graphql(token, operation, query, variables):
+    """Upstream call for an ISY GraphQL operation (yield it from a flow)"""
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json',
+        'Accept': '*/*',
+        'Origin': 'https://isy.ksr.ch',
+        'Referer': 'https://isy.ksr.ch/'
+    }
+    payload = {'operationName': operation, 'query': query, 'variables': variables}
+    # A failure is remembered for this exact request only: one message that
+    # fails to load must not fail the user's other messages as well
+    digest = hashlib.sha256(json.dumps([query, variables], sort_keys=True).encode('utf-8')).hexdigest()
+    return isy_upstream.call('POST', ISY_API_URL, key=(operation, token, digest), json=payload, headers=headers)
+
+@app.route('/api/isy/message/<message_id>')
+@isy_login_required
+def isy_message(message_id):
+    """A single ISY message with its full body (see isy_message_flow)"""
+    return run_flow(isy_message_flow(message_id))
+
+def isy_message_flow(message_id):
+    """
+    Fetch one message with body, author and the user's read state
+    message_id: the number or the IRI ('/messages/<n>')
+    """
+    iri = isy_message_iri(message_id)
+    if iri is None:
+        return jsonify({'error': 'Ungültige Mitteilungs-ID'}), 400
+    
+    cached = cached_isy_body(request.isy_username, iri)
+    if cached is not None:
+        return jsonify({'success': True, 'message': cached, 'cached': True})
+    
+    query = """
+    query getMessage($id: ID!) {
+      message(id: $id) {
+        id
+        _id
+        calculatedExtendedTitle
+        subject
+        body
+        previewText
+        priority
+        status
+        visibleFrom
+        visibleTo
+        dtDue
+        modified
+        lastContentChange
+        primaryAuthor {
+          person {
+            firstname
+            lastname
+          }
+        }
+        me {
+          id
+          readWhen
+          seenWhen
+          completedWhen
+          archivedWhen
+        }
+      }
+    }
+    """
+    try:
+        response = yield isy_graphql(session.get('isy_token'), 'getMessage', query, {'id': iri})
+        response.raise_for_status()
+        data = response.json()
+    except requests.exceptions.RequestException as e:
+        print(f"ISY message {iri} unavailable: {e}")
+        return jsonify({
+            'error': 'ISY nicht erreichbar',
+            'message': 'ISY antwortet momentan nicht. Bitte später erneut versuchen.'
+        }), 503
+    
+    node = (data.get('data') or {}).get('message')
+    if not node:
+        print(f"ISY message {iri} not found: {data.get('errors')}")
+        return jsonify({'error': 'Mitteilung nicht gefunden'}), 404
+    
+    me = node.get('me') or {}
+    message = dict(
+        node,
+        title=node.get('calculatedExtendedTitle') or node.get('subject') or 'Keine Titel',
+        meId=me.get('id'),
+        readWhen=me.get('readWhen'),
+        seenWhen=me.get('seenWhen'),
+        completedWhen=me.get('completedWhen'),
+        archivedWhen=me.get('archivedWhen')
+    )
+    if message['meId']:
+        # Lets /api/isy/messages/mark update this message without a lookup
+        update_isy_message_state(request.isy_username, iri, {'meId': message['meId']})
+    remember_isy_body(request.isy_username, iri, message)
+    return jsonify({'success': True, 'message': message})
+
+@app.route('/api/isy/messages/mark', methods=['POST'])
+@isy_login_required
+def isy_mark_messages():
+    """Mark ISY messages read/seen/completed in one go (see isy_mark_messages_flow)"""
+    return run_flow(isy_mark_messages_flow())
+
+def _graphql_type_fields(type_ref):
+    """Field names of an introspected type reference, looking through NON_NULL"""
+    while type_ref is not None:
+        if type_ref.get('fields') is not None:
+            return {field['name'] for field in type_ref['fields']}
+        type_ref = type_ref.get('ofType')
+    return set()
+
+def _graphql_type_name(type_ref):
+    while type_ref is not None and not type_ref.get('name'):
+        type_ref = type_ref.get('ofType')
+    return type_ref and type_ref['name']
+
+def isy_state_mutation_flow(token):
+    """
+    (mutation, resource) that updates a Message.me state in ISY, None if ISY has none
+    Read from ISY's schema once per process: the type of Message.me and the
+    update mutation API Platform generates for it.
+    """
+    if 'names' in _isy_state_mutation:
+        return _isy_state_mutation['names']
+    query = """
+    query stateMutation {
+      message: __type(name: "Message") {
+        fields { name type { name ofType { name ofType { name } } } }
+      }
+      schema: __schema {
+        mutationType {
+          fields { name type { name fields { name } ofType { name fields { name } } } }
+        }
+      }
+    }
+    """
+    response = yield isy_graphql(token, 'stateMutation', query, {})
+    response.raise_for_status()
+    data = response.json().get('data') or {}
+    message_type = data.get('message')
+    mutation_type = (data.get('schema') or {}).get('mutationType')
+    if not message_type or not mutation_type:
+        # Schema queries are disabled: go by API Platform's naming
+        print(f"ISY schema not readable, marking messages via update{ISY_STATE_TYPE}")
+        state_type = ISY_STATE_TYPE
+        names = (f'update{state_type}', state_type[0].lower() + state_type[1:])
+    else:
+        state_type = next((_graphql_type_name(field['type']) for field in message_type.get('fields') or []
+                           if field['name'] == 'me'), None)
+        names = None
+        if state_type:
+            mutation, resource = f'update{state_type}', state_type[0].lower() + state_type[1:]
+            payload = next((field['type'] for field in mutation_type.get('fields') or []
+                            if field['name'] == mutation), None)
+            if payload is not None and resource in _graphql_type_fields(payload):
+                names = (mutation, resource)
+        if names is None:
+            print(f"ISY has no update mutation for Message.me (type {state_type}), marking disabled")
+    _isy_state_mutation['names'] = names
+    return names
+
+def isy_mark_messages_flow():
+    """
+    Set the read, seen and completed state of several messages with one ISY request
+    
+    Body: {"updates": [{"id": ..., "read": true, "seen": true, "completed": false}, ...]},
+    as collected by the client over a short window. Updates of the same
+    message are merged, the last value of a flag wins. All of them go to
+    ISY as one mutation with an alias per message. The cached lists are
+    updated right away and restored for the messages ISY rejected.
+    """
+    data = request.get_json(silent=True) or {}
+    updates = data.get('updates')
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': 'Keine Änderungen angegeben'}), 400
+    
+    merged, client_ids = {}, {}
+    for update in updates:
+        iri = isy_message_iri(update.get('id', '')) if isinstance(update, dict) else None
+        if iri is None:
+            return jsonify({'error': 'Ungültige Mitteilungs-ID', 'update': update}), 400
+        flags = {name: value for name, value in update.items() if name in ISY_MARK_FIELDS}
+        if not flags or not all(isinstance(value, bool) for value in flags.values()):
+            return jsonify({
+                'error': 'Ungültige Änderung',
+                'message': 'Erlaubt sind read, seen und completed mit true oder false'
+            }), 400
+        merged.setdefault(iri, {}).update(flags)
+        client_ids[iri] = update['id']
+    if len(merged) > ISY_MARK_MAX:
+        return jsonify({'error': f'Höchstens {ISY_MARK_MAX} Mitteilungen auf einmal'}), 400
+    
+    token = session.get('isy_token')
+    username = request.isy_username
+    now = to_local(request_now()).isoformat()
+    values = {
+        iri: {ISY_MARK_FIELDS[name]: now if value else None for name, value in flags.items()}
+        for iri, flags in merged.items()
+    }
+    
+    try:
+        # Checked before anything is marked locally: if ISY can't store the
+        # state, the lists must not show it
+        names = yield from isy_state_mutation_flow(token)
+        if names is None:
+            return jsonify({
+                'error': 'Markieren wird von ISY nicht unterstützt',
+                'failed': list(client_ids.values())
+            }), 501
+        state_mutation, state_resource = names
+        
+        # State IRIs of messages this worker hasn't seen yet: one aliased lookup
+        me_ids = {iri: cached_isy_me_id(username, iri) for iri in values}
+        missing = [iri for iri, me_id in me_ids.items() if not me_id]
+        if missing:
+            query = 'query messageStates({}) {{ {} }}'.format(
+                ', '.join(f'$q{i}: ID!' for i in range(len(missing))),
+                ' '.join(f'q{i}: message(id: $q{i}) {{ id me {{ id }} }}' for i in range(len(missing)))
+            )
+            response = yield isy_graphql(token, 'messageStates', query,
+                                         {f'q{i}': iri for i, iri in enumerate(missing)})
+            response.raise_for_status()
+            found = response.json().get('data') or {}
+            for i, iri in enumerate(missing):
+                me_ids[iri] = ((found.get(f'q{i}') or {}).get('me') or {}).get('id')
+        
+        targets = [iri for iri in values if me_ids[iri]]
+        if not targets:
+            return jsonify({'error': 'Mitteilung nicht gefunden', 'failed': list(client_ids.values())}), 404
+        
+        # Optimistic: the lists show the new state even before ISY confirms it
+        previous = {iri: update_isy_message_state(username, iri, values[iri]) for iri in targets}
+        
+        declarations, fields, variables = [], [], {}
+        for i, iri in enumerate(targets):
+            declarations.append(f'$m{i}: ID!')
+            variables[f'm{i}'] = me_ids[iri]
+            inputs = [f'id: $m{i}']
+            for field, value in values[iri].items():
+                declarations.append(f'$m{i}{field}: String')
+                variables[f'm{i}{field}'] = value
+                inputs.append(f'{field}: $m{i}{field}')
+            fields.append(f'm{i}: {state_mutation}(input: {{{", ".join(inputs)}}}) '
+                          f'{{ {state_resource} {{ id readWhen seenWhen completedWhen }} }}')
+        mutation = f'mutation markMessages({", ".join(declarations)}) {{ {" ".join(fields)} }}'
+        try:
+            response = yield isy_graphql(token, 'markMessages', mutation, variables)
+            response.raise_for_status()
+            result = response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            for iri in targets:
+                restore_isy_message_state(previous[iri])
+            raise
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"ISY mark messages failed: {e}")
+        return jsonify({
+            'error': 'ISY nicht erreichbar',
+            'message': 'ISY antwortet momentan nicht. Bitte später erneut versuchen.',
+            'failed': list(client_ids.values())
+        }), 503
+    
+    # Aliases ISY rejected come back as null and/or with an error path
+    rejected = {(error.get('path') or [None])[0] for error in result.get('errors') or []}
+    done = result.get('data') or {}
+    updated, failed = [], [client_ids[iri] for iri in values if not me_ids[iri]]
+    for i, iri in enumerate(targets):
+        if f'm{i}' in rejected or not done.get(f'm{i}'):
+            restore_isy_message_state(previous[iri])
+            failed.append(client_ids[iri])
+        else:
+            updated.append(client_ids[iri])
+    if failed:
+        print(f"ISY rejected marks for {failed}: {result.get('errors')}")
+    return jsonify({'success': not failed, 'updated': updated, 'failed': failed}), 200 if updated else 502
+
 @app.route('/api/timetable')
 def get_timetable():
     """API endpoint to get timetable data with caching for performance"""
     # Check for mode parameter (auto or manual)
     mode = request.args.get('mode', 'auto')
     
-    events = []
-    csv_path = os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')
+    # Cached events, rebuilt only when the source changed
+    events = get_timetable_events(mode)
     
-    # Check cache first for performance optimization
-    current_time = time_module.time()
-    with _timetable_cache['lock']:
-        cache_age = current_time - _timetable_cache['timestamp']
-        
-        if _timetable_cache['events'] is not None and cache_age < CACHE_DURATION:
-            # Use cached data
-            events = _timetable_cache['events']
+    payload, _valid_until = build_timetable_payload(events)
+    return jsonify(payload)
+
+@app.route('/static/fast_timetable.json')
+def fast_timetable():
+    """First-paint snapshot of /api/timetable, regenerated when it went stale"""
+    current_fast_timetable()
+    
+    # Always revalidate: the ETag only changes when the content does
+    response = send_file(FAST_TIMETABLE_PATH, mimetype='application/json', conditional=True, max_age=0)
+    response.cache_control.private = True
+    response.cache_control.must_revalidate = True
+    return response
+
+def _change_time(ts):
+    """Short German date and time of a lesson, e.g. 'Mo 20.10. 08:30'"""
+    local = to_local(ts)
+    return f"{WEEKDAYS_SHORT_DE[local.weekday()]} {local:%d.%m. %H:%M}"
+
+def change_message(record):
+    """One-line German notification text for a change record"""
+    subject = record['summary'].split('(')[0].strip()
+    when = _change_time(record['start_ts'])
+    before = record.get('before')
+    kind = record['kind']
+    if kind == 'cancelled':
+        return f"{subject} am {when} fällt aus"
+    if kind == 'moved':
+        return f"{subject} von {_change_time(before['start_ts'])} auf {when} verschoben"
+    if kind == 'room_changed':
+        return f"{subject} am {when}: Raumwechsel von {before['location'] or '?'} nach {record['location'] or '?'}"
+    if kind == 'added':
+        return f"Neu im Stundenplan: {subject} am {when}"
+    if kind == 'removed':
+        return f"Nicht mehr im Stundenplan: {subject} am {when}"
+    return f"{subject} am {when} wurde geändert"
+
+def format_change(change_id, detected_at, record):
+    """Change feed entry as returned by /api/changes"""
+    def times(side):
+        return {
+            'summary': side['summary'],
+            'start': to_local(side['start_ts']).isoformat(),
+            'end': to_local(side['end_ts']).isoformat(),
+            'location': side['location'],
+            'is_exam': side['is_exam']
+        }
+    
+    change = {
+        'id': change_id,
+        'kind': record['kind'],
+        'detected_at': to_local(int(detected_at)).isoformat(),
+        'message': change_message(record),
+        **times(record)
+    }
+    if record.get('before'):
+        change['before'] = times(record['before'])
+    return change
+
+@app.route('/api/changes')
+def get_changes():
+    """
+    Timetable changes between successive snapshots, for notifications
+    Kinds: added, removed, moved, room_changed, cancelled, updated
+    Parameters: since (cursor of the previous response, or an ISO date/time;
+    default: the last 7 days), limit (default 100, max 500), mode (auto/manual)
+    """
+    # Refresh first, so a poll picks up changes as soon as the feed has them
+    get_timetable_events(request.args.get('mode', 'auto'))
+    
+    since = request.args.get('since', '').strip()
+    since_id, since_time = 0, None
+    if since.isdigit():
+        since_id = int(since)
+    elif since:
+        try:
+            since_time = parse_local_iso(since)
+        except ValueError:
+            return jsonify({
+                'error': 'Ungültiger since-Parameter',
+                'message': 'since muss ein Cursor (Zahl) oder ein ISO-Datum sein'
+            }), 400
+    else:
+        since_time = request_now() - CHANGES_DEFAULT_WINDOW
+    limit = max(1, min(request.args.get('limit', CHANGES_DEFAULT_LIMIT, type=int), CHANGES_MAX_LIMIT))
+    
+    rows = _event_store.changes_since(TIMETABLE_USER, since_id, since_time, limit)
+    if rows:
+        cursor = rows[-1][0]
+    else:
+        cursor = since_id or _event_store.latest_change_id(TIMETABLE_USER)
+    return jsonify({
+        'changes': [format_change(*row) for row in rows],
+        'cursor': cursor,
+        'more': len(rows) == limit
+    })
+
+def get_room_index():
+    """The room index, with the rooms logged as changed since the last call reloaded"""
+    with _room_index_lock:
+        rooms = None
+        if _room_index.cursor is not None:
+            latest, rooms = _event_store.room_updates_since(_room_index.cursor)
+        if rooms is None:
+            # First use, or this worker fell behind the pruned log
+            latest = _event_store.latest_room_update()
+            _room_index.load(_event_store.room_bookings(), latest)
         else:
-            # Cache expired or empty, fetch new data
-            if mode == 'auto':
-                # Try to fetch from URL and convert to CSV
-                csv_file = fetch_and_convert_ics_to_csv(app.config['ICS_URL'])
-                
-                if csv_file and os.path.exists(csv_file):
-                    events = parse_csv_timetable(csv_file)
-                elif os.path.exists(csv_path):
-                    # Auto fetch failed, fallback to existing local CSV
-                    events = parse_csv_timetable(csv_path)
-            else:
-                # Manual mode - use uploaded CSV file only
-                if os.path.exists(csv_path):
-                    events = parse_csv_timetable(csv_path)
-            
-            # Update cache
-            _timetable_cache['events'] = events
-            _timetable_cache['timestamp'] = current_time
+            for room in rooms:
+                _room_index.set_room(room, [row[1:] for row in _event_store.room_bookings(room)])
+            _room_index.cursor = latest
+    return _room_index
+
+def format_booking(booking):
+    """Room index booking as returned by the /api/rooms endpoints"""
+    start_ts, end_ts, summary, original_summary, feeds = booking
+    return {
+        'start': to_local(start_ts).isoformat(),
+        'end': to_local(end_ts).isoformat(),
+        'summary': summary,
+        'original_summary': original_summary,
+        'feeds': feeds
+    }
+
+def _time_arg(name, default):
+    """Epoch seconds of an ISO date/time query parameter (naive = Zurich time), raises ValueError"""
+    value = request.args.get(name, '').strip()
+    return parse_local_iso(value) if value else default
+
+@app.route('/api/rooms/free')
+def free_rooms():
+    """
+    Rooms without a lesson in any loaded timetable
+    Parameters: at (ISO date/time, default: now), until (optional: free for
+    the whole period from at to until), mode (auto/manual)
+    """
+    get_timetable_events(request.args.get('mode', 'auto'))
+    try:
+        at = _time_arg('at', request_now())
+        until = _time_arg('until', None)
+    except ValueError:
+        return jsonify({
+            'error': 'Ungültige Zeitangabe',
+            'message': 'at und until müssen ISO-Daten sein, z.B. 2025-11-14T10:15'
+        }), 400
     
-    if not events:
+    free, occupied = get_room_index().free_rooms(at, until)
+    return jsonify({
+        'at': to_local(at).isoformat(),
+        'until': to_local(until).isoformat() if until else None,
+        'free': [{
+            'room': room,
+            'free_until': to_local(next_start).isoformat() if next_start else None
+        } for room, next_start in free],
+        'occupied': [dict(format_booking(booking), room=room) for room, booking in occupied]
+    })
+
+@app.route('/api/rooms/<room>/schedule')
+def room_schedule(room):
+    """
+    Lessons in a room over all loaded timetables
+    Parameters: from, to (ISO date/time; default: today and the next 6 days), mode (auto/manual)
+    """
+    get_timetable_events(request.args.get('mode', 'auto'))
+    index = get_room_index()
+    name = index.find(room)
+    if name is None:
         return jsonify({
-            'next_lesson': None,
-            'current_lesson': None,
-            'todays_lessons': [],
-            'exams': [],
-            'message': 'Keine Stundenplan-Daten verfügbar. Bitte CSV-Datei hochladen oder automatische Synchronisation aktivieren.'
-        })
+            'error': 'Unbekannter Raum',
+            'message': f'Raum {room} kommt in keinem Stundenplan vor'
+        }), 404
     
-    next_lesson = get_next_lesson(events)
-    current_lesson = get_current_lesson(events)
-    todays_lessons = get_todays_lessons(events)
-    exams = get_upcoming_exams(events)
+    try:
+        start = _time_arg('from', local_day_start(local_day(request_now())))
+        end = _time_arg('to', None) or local_day_start(local_day(start) + ROOM_SCHEDULE_DEFAULT_DAYS)
+    except ValueError:
+        return jsonify({
+            'error': 'Ungültige Zeitangabe',
+            'message': 'from und to müssen ISO-Daten sein, z.B. 2025-11-14'
+        }), 400
     
-    # Format data for JSON response
-    next_lesson_data = None
-    if next_lesson:
-        next_lesson_data = {
-            'summary': next_lesson['summary'],
-            'start': next_lesson['start'].isoformat(),
-            'end': next_lesson['end'].isoformat() if next_lesson['end'] else None,
-            'description': next_lesson['description'] if next_lesson['description'] and next_lesson['description'] != 'None' else '',
-            'location': next_lesson['location'],
-            'is_cancelled': next_lesson['is_cancelled'],
-            'special_note': next_lesson['special_note']
-        }
+    return jsonify({
+        'room': name,
+        'from': to_local(start).isoformat(),
+        'to': to_local(end).isoformat(),
+        'lessons': [format_booking(booking) for booking in index.schedule(name, start, end)]
+    })
+
+def export_last_modified(version):
+    """Epoch seconds of the last change to the timetable, cached per snapshot version"""
+    if _export_meta['version'] != version:
+        _export_meta['last_modified'] = int(_event_store.last_modified(TIMETABLE_USER))
+        _export_meta['version'] = version
+    return _export_meta['last_modified']
+
+def export_timetable(fmt):
+    """
+    Stream the timetable as ICS or CSV straight from the event store
+    Parameters: subject (abbreviations or names, comma-separated), exams (1:
+    only exams), from, to (ISO date/time, to exclusive), mode (auto/manual)
+    The ETag is derived from the snapshot version and the filters, so
+    unchanged exports are answered with 304 without touching the store.
+    """
+    get_timetable_events(request.args.get('mode', 'auto'))
+    try:
+        start = _time_arg('from', None)
+        end = _time_arg('to', None)
+    except ValueError:
+        return jsonify({
+            'error': 'Ungültige Zeitangabe',
+            'message': 'from und to müssen ISO-Daten sein, z.B. 2025-11-14'
+        }), 400
+    subjects = sorted({s.strip().casefold() for s in request.args.get('subject', '').split(',') if s.strip()})
+    exams_only = request.args.get('exams', '').lower() in ('1', 'true', 'yes', 'ja')
     
-    # Format current lesson data
-    current_lesson_data = None
-    if current_lesson:
-        # Extract subject name from summary (e.g., "Mathematik (HL3.01)" -> "Mathematik")
-        subject_name = current_lesson['summary'].split('(')[0].strip()
-        onenote_link = ONENOTE_LINKS.get(subject_name, None)
-        
-        current_lesson_data = {
-            'summary': current_lesson['summary'],
-            'subject': subject_name,
-            'start': current_lesson['start'].isoformat(),
-            'end': current_lesson['end'].isoformat() if current_lesson['end'] else None,
-            'location': current_lesson['location'],
-            'onenote_link': onenote_link
-        }
+    version = _timetable_cache['shared'].read_meta()[0]
+    last_modified = export_last_modified(version)
+    filters = json.dumps([version, fmt, start, end, exams_only, subjects])
+    etag = hashlib.sha256(filters.encode('utf-8')).hexdigest()[:20]
     
-    # Format today's lessons
-    todays_data = []
-    for lesson in todays_lessons:
-        todays_data.append({
-            'summary': lesson['summary'],
-            'start': lesson['start'].isoformat(),
-            'end': lesson['end'].isoformat() if lesson['end'] else None,
-            'description': lesson['description'] if lesson['description'] and lesson['description'] != 'None' else '',
-            'location': lesson['location'],
-            'is_exam': lesson['is_exam'],
-            'special_note': lesson['special_note']
-        })
+    # Generators all the way down: the query only runs when the body is sent
+    events = (row_to_event(r) for r in _event_store.iter_events(TIMETABLE_USER, start, end, exams_only))
+    if subjects:
+        events = filter(subject_filter(subjects), events)
+    if fmt == 'ics':
+        chunks, mimetype = ics_chunks(events, last_modified or request_now()), 'text/calendar'
+    else:
+        chunks, mimetype = csv_chunks(events), 'text/csv'
     
-    exams_data = []
-    for exam in exams:
-        exams_data.append({
-            'summary': exam['summary'],
-            'start': exam['start'].isoformat(),
-            'end': exam['end'].isoformat() if exam['end'] else None,
-            'description': exam['description'] if exam['description'] and exam['description'] != 'None' else '',
-            'location': exam['location'],
-            'special_note': exam['special_note']
-        })
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=stundenplan.{fmt}'
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = datetime.fromtimestamp(last_modified, timezone.utc)
+    response.cache_control.private = True
+    response.cache_control.max_age = 0
+    response.cache_control.must_revalidate = True
+    return response.make_conditional(request)
+
+@app.route('/api/export.ics')
+def export_ics():
+    """Timetable as iCalendar file (see export_timetable for the filters)"""
+    return export_timetable('ics')
+
+@app.route('/api/export.csv')
+def export_csv():
+    """Timetable as CSV file (see export_timetable for the filters)"""
+    return export_timetable('csv')
+
+@app.route('/api/search')
+def search_all():
+    """
+    Full-text search over lessons and, when logged in to ISY, the user's messages
+    Parameters: q (query), limit (max results, default 20), mode (auto/manual)
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    
+    # Make sure the lesson index reflects the current snapshot
+    get_timetable_events(request.args.get('mode', 'auto'))
+    
+    owner = None
+    isy_token = session.get('isy_token')
+    if isy_token:
+        token_data = verify_isy_token(isy_token)
+        if token_data:
+            owner = token_data.get('username')
+    
+    started = time_module.perf_counter()
+    results = _search_index.search(query, now=request_now(), owner=owner, limit=limit)
+    took_ms = (time_module.perf_counter() - started) * 1000
     
     return jsonify({
-        'next_lesson': next_lesson_data,
-        'current_lesson': current_lesson_data,
-        'todays_lessons': todays_data,
-        'exams': exams_data
+        'query': query,
+        'results': results,
+        'took_ms': round(took_ms, 2)
     })
 
 @app.route('/api/weather')
 def get_weather():
-    """API endpoint to get weather data for Romanshorn"""
+    """API endpoint to get weather data for Romanshorn (see weather_flow)"""
+    return run_flow(weather_flow())
+
+def weather_flow():
+    """Current weather for Romanshorn from OpenWeather"""
     api_key = OPENWEATHER_API_KEY or os.environ.get('OPENWEATHER_API_KEY', '')
     
     if not api_key:
@@ -1129,8 +2185,8 @@ def get_weather():
         lat = 47.5661
         lon = 9.3789
         
-        url = f'https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric&lang=de'
-        response = requests.get(url, timeout=10)
+        url = f'{OPENWEATHER_URL}?lat={lat}&lon={lon}&appid={api_key}&units=metric&lang=de'
+        response = yield weather_upstream.call('GET', url, key='romanshorn')
         response.raise_for_status()
         
         data = response.json()
@@ -1144,9 +2200,14 @@ def get_weather():
             'wind_speed': data['wind']['speed']
         }
         
+        _weather_cache['data'] = weather_data
+        _weather_cache['fetched_at'] = time_module.time()
         return jsonify(weather_data)
     
     except requests.exceptions.RequestException as e:
+        # Serve the last good data while OpenWeather is unreachable
+        if _weather_cache['data'] is not None:
+            return jsonify(dict(_weather_cache['data'], stale=True, fetched_at=_weather_cache['fetched_at']))
         # Don't expose detailed error messages in production
         return jsonify({
             'error': 'Failed to fetch weather data',
@@ -1158,36 +2219,8 @@ def get_weekly():
     """API endpoint to get weekly timetable data"""
     mode = request.args.get('mode', 'auto')
     
-    events = []
-    csv_path = os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')
-    
-    # Check cache first for performance optimization
-    current_time = time_module.time()
-    with _timetable_cache['lock']:
-        cache_age = current_time - _timetable_cache['timestamp']
-        
-        if _timetable_cache['events'] is not None and cache_age < CACHE_DURATION:
-            # Use cached data
-            events = _timetable_cache['events']
-        else:
-            # Cache expired or empty, fetch new data
-            if mode == 'auto':
-                # Try to fetch from URL and convert to CSV
-                csv_file = fetch_and_convert_ics_to_csv(app.config['ICS_URL'])
-                
-                if csv_file and os.path.exists(csv_file):
-                    events = parse_csv_timetable(csv_file)
-                elif os.path.exists(csv_path):
-                    # Auto fetch failed, fallback to existing local CSV
-                    events = parse_csv_timetable(csv_path)
-            else:
-                # Manual mode - use uploaded CSV file only
-                if os.path.exists(csv_path):
-                    events = parse_csv_timetable(csv_path)
-            
-            # Update cache
-            _timetable_cache['events'] = events
-            _timetable_cache['timestamp'] = current_time
+    # Cached events, rebuilt only when the source changed
+    events = get_timetable_events(mode)
     
     if not events:
         return jsonify({
@@ -1195,36 +2228,176 @@ def get_weekly():
             'message': 'Keine Stundenplan-Daten verfügbar.'
         })
     
-    weekly_schedule = get_weekly_lessons(events)
-    
-    # Format data for JSON response
-    weekly_data = []
-    for day in weekly_schedule:
-        day_lessons = []
-        for lesson in day['lessons']:
-            day_lessons.append({
-                'summary': lesson['summary'],
-                'start': lesson['start'].isoformat(),
-                'end': lesson['end'].isoformat() if lesson['end'] else None,
-                'description': lesson['description'] if lesson['description'] and lesson['description'] != 'None' else '',
-                'location': lesson['location'],
-                'is_exam': lesson['is_exam'],
-                'is_cancelled': lesson['is_cancelled'],
-                'special_note': lesson['special_note']
-            })
-        
-        weekly_data.append({
-            'date': day['date'],
-            'lessons': day_lessons
-        })
+    # Precomputed day buckets, cached per week
+    return jsonify({
+        'weekly_schedule': get_weekly_lessons()
+    })
+
+def _view_json(view):
+    """Call a JSON view function, returns (data, status)"""
+    response = app.make_response(view())
+    return response.get_json(), response.status_code
+
+def _dashboard_translations():
+    """Translation file for the requested language"""
+    lang = request.args.get('lang', 'de')
+    if lang not in ('de', 'en'):
+        lang = 'de'
+    with open(os.path.join(app.static_folder, 'lang', f'{lang}.json'), encoding='utf-8') as f:
+        return json.load(f), 200
+
+DASHBOARD_SECTIONS = {
+    'timetable': lambda: _view_json(get_timetable),
+    'weather': lambda: _view_json(get_weather),
+    'isy_status': lambda: _view_json(isy_status),
+    'isy_dashboard_messages': lambda: _view_json(isy_dashboard_messages),
+    'translations': _dashboard_translations
+}
+
+def _run_dashboard_section(name):
+    """Run one section, returns its envelope {'status', 'data'} or {'status', 'error'}"""
+    try:
+        data, status = DASHBOARD_SECTIONS[name]()
+        return {'status': status, 'data': data}
+    except Exception as e:
+        print(f"Error in dashboard section {name}: {e}")
+        return {'status': 500, 'error': 'Interner Fehler'}
+
+def iter_dashboard_sections(names):
+    """
+    Run sections and yield (name, envelope) as they complete
     
+    Upstream-bound sections (DASHBOARD_TIMEOUTS) go to the dashboard pool,
+    the local ones run meanwhile in the request thread. A section that
+    misses its timeout is reported with status 504; it keeps running in the
+    background (its result warms the caches for the next request) but no
+    longer holds up the response. One that is still waiting for a worker
+    after DASHBOARD_QUEUE_TIMEOUT is cancelled instead.
+    """
+    submitted = time_module.monotonic()
+    started = {}
+    
+    def run(name):
+        started[name] = time_module.monotonic()
+        return _run_dashboard_section(name)
+    
+    pending = {}
+    for name in names:
+        if name in DASHBOARD_TIMEOUTS:
+            pending[_dashboard_executor.submit(copy_current_request_context(run), name)] = name
+    for name in names:
+        if name not in DASHBOARD_TIMEOUTS:
+            yield name, _run_dashboard_section(name)
+    
+    def deadline(name):
+        if name in started:
+            return started[name] + DASHBOARD_TIMEOUTS[name]
+        return submitted + DASHBOARD_QUEUE_TIMEOUT
+    
+    while pending:
+        next_deadline = min(deadline(name) for name in pending.values())
+        done, _ = wait(pending, timeout=max(0, next_deadline - time_module.monotonic()),
+                       return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future.result()
+        
+        now = time_module.monotonic()
+        for future, name in list(pending.items()):
+            # cancel() fails for a section that has just started: it gets its full timeout
+            if now >= deadline(name) and (name in started or future.cancel()):
+                del pending[future]
+                yield name, {'status': 504, 'error': 'Zeitüberschreitung'}
+
+@app.route('/api/dashboard')
+def get_dashboard():
+    """
+    All dashboard sections in one request
+    
+    Parameters: sections (comma-separated, default all), mode and lang as
+    for the single endpoints, stream=1 to get one NDJSON line per section
+    in the order they complete instead of a single JSON object.
+    """
+    requested = request.args.get('sections')
+    names = [n for n in requested.split(',') if n in DASHBOARD_SECTIONS] if requested else list(DASHBOARD_SECTIONS)
+    
+    # The session cookie goes out with the headers, before the sections run
+    # when streaming: forget an expired ISY login now, not inside a section
+    isy_token = session.get('isy_token')
+    if isy_token and not verify_isy_token(isy_token):
+        session.pop('isy_token', None)
+        session.pop('isy_username', None)
+    
+    if request.args.get('stream') == '1':
+        def generate():
+            complete = True
+            for name, envelope in iter_dashboard_sections(names):
+                complete = complete and envelope['status'] != 504
+                yield json.dumps(dict(envelope, section=name), ensure_ascii=False) + '\n'
+            yield json.dumps({'complete': complete}) + '\n'
+        
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        # Let nginx pass each line through instead of buffering the response
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    
+    sections = dict(iter_dashboard_sections(names))
     return jsonify({
-        'weekly_schedule': weekly_data
+        'sections': sections,
+        'complete': all(s['status'] != 504 for s in sections.values())
     })
 
+def _upload_size(file):
+    """Size of an uploaded file in bytes without reading it into memory"""
+    stream = file.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def _prune_upload_jobs():
+    """Forget finished upload jobs after UPLOAD_JOB_RETENTION seconds"""
+    cutoff = time_module.time() - UPLOAD_JOB_RETENTION
+    with _upload_jobs_lock:
+        for job_id in [j for j, job in _upload_jobs.items()
+                       if job['finished'] and job['finished'] < cutoff]:
+            del _upload_jobs[job_id]
+
+
+def _run_upload_job(job_id, stream):
+    """Background worker: parse an uploaded ICS stream and publish the result"""
+    job = _upload_jobs[job_id]
+    job['status'] = 'running'
+    
+    def progress(bytes_read):
+        job['bytes_read'] = bytes_read
+    
+    try:
+        events, _changed = import_ics_lines(decode_lines(stream, progress))
+        publish_timetable(events)
+        job['events'] = len(events)
+        job['status'] = 'done'
+    except Exception as e:
+        print(f"Error in upload job {job_id}: {e}")
+        import traceback
+        traceback.print_exc()
+        job['status'] = 'error'
+        job['error'] = str(e)
+    finally:
+        stream.close()
+        job['finished'] = time_module.time()
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Upload ICS file and convert to CSV"""
+    """
+    Upload ICS or CSV file
+    
+    ICS files are parsed straight from the upload stream. Files larger than
+    UPLOAD_ASYNC_THRESHOLD are parsed in the background; the response then
+    contains a job id whose progress can be polled via /upload/status/<job_id>.
+    """
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
     
@@ -1235,67 +2408,126 @@ def upload_file():
     
     if file and (file.filename.endswith('.ics') or file.filename.endswith('.csv')):
         if file.filename.endswith('.ics'):
-            # Save ICS file temporarily
-            temp_ics = os.path.join(app.config['UPLOAD_FOLDER'], 'uploaded_timetable.ics')
-            file.save(temp_ics)
+            size = _upload_size(file)
             
-            # Convert ICS to CSV
-            try:
-                events = []
-                with open(temp_ics, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-                
-                event = {}
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith("BEGIN:VEVENT"):
-                        event = {}
-                    elif line.startswith("SUMMARY:"):
-                        event["Subject"] = line.replace("SUMMARY:", "")
-                    elif line.startswith("DTSTART:"):
-                        dtstart = datetime.strptime(line.replace("DTSTART:", ""), "%Y%m%dT%H%M%SZ")
-                        event["Start Date"] = dtstart.strftime("%m/%d/%Y")
-                        event["Start Time"] = dtstart.strftime("%H:%M")
-                    elif line.startswith("DTEND:"):
-                        dtend = datetime.strptime(line.replace("DTEND:", ""), "%Y%m%dT%H%M%SZ")
-                        event["End Date"] = dtend.strftime("%m/%d/%Y")
-                        event["End Time"] = dtend.strftime("%H:%M")
-                    elif line.startswith("END:VEVENT"):
-                        if event:
-                            events.append(event)
+            if size > UPLOAD_ASYNC_THRESHOLD:
+                # Take ownership of the upload stream so Flask doesn't close
+                # it at the end of the request while the worker still reads it
+                stream = file.stream
+                file.stream = io.BytesIO()
                 
-                # Write to CSV
-                csv_path = os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')
-                with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-                    fieldnames = ["Subject", "Start Date", "Start Time", "End Date", "End Time", "Description", "Location"]
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    for e in events:
-                        writer.writerow({
-                            "Subject": e.get("Subject", ""),
-                            "Start Date": e.get("Start Date", ""),
-                            "Start Time": e.get("Start Time", ""),
-                            "End Date": e.get("End Date", ""),
-                            "End Time": e.get("End Time", ""),
-                            "Description": "",
-                            "Location": ""
-                        })
+                _prune_upload_jobs()
+                job_id = uuid.uuid4().hex
+                with _upload_jobs_lock:
+                    _upload_jobs[job_id] = {
+                        'status': 'queued',
+                        'bytes_read': 0,
+                        'total_bytes': size,
+                        'events': None,
+                        'error': None,
+                        'finished': None
+                    }
+                _upload_executor.submit(_run_upload_job, job_id, stream)
                 
-                return jsonify({'message': 'ICS file uploaded and converted to CSV successfully'})
+                return jsonify({
+                    'message': 'ICS file uploaded, conversion running in background',
+                    'job_id': job_id,
+                    'status_url': url_for('upload_status', job_id=job_id)
+                }), 202
+            
+            # Convert ICS to CSV directly from the upload stream
+            try:
+                events, _changed = import_ics_lines(decode_lines(file.stream))
+                publish_timetable(events)
+                return jsonify({
+                    'message': 'ICS file uploaded and converted to CSV successfully',
+                    'events': len(events)
+                })
             except Exception as e:
                 return jsonify({'error': f'Error converting ICS to CSV: {str(e)}'}), 500
         
         else:  # CSV file
-            # Save CSV directly
+            # Save CSV atomically so readers never see a partial upload
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')
-            file.save(filepath)
+            atomic_write(filepath, file.save, binary=True)
+            publish_timetable(parse_csv_timetable(filepath))
             return jsonify({'message': 'CSV file uploaded successfully'})
     
     return jsonify({'error': 'Invalid file type. Please upload an ICS or CSV file.'}), 400
 
+@app.route('/upload/status/<job_id>')
+def upload_status(job_id):
+    """Progress of a background ICS upload job"""
+    job = _upload_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown upload job'}), 404
+    
+    total = job['total_bytes']
+    progress = round(job['bytes_read'] * 100 / total) if total else 100
+    if job['status'] == 'done':
+        progress = 100
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'progress': progress,
+        'bytes_read': job['bytes_read'],
+        'total_bytes': total,
+        'events': job['events'],
+        'error': job['error']
+    })
+
+def _ai_timetable_context():
+    """Timetable summary the AI assistant gets in front of every question"""
+    # Get current timetable data for context
+    events = get_timetable_events('manual')
+    
+    # Prepare context about the timetable
+    context = "Du bist ein hilfreicher Assistent für einen Schüler. Du hast Zugriff auf seinen Stundenplan.\n\n"
+    
+    if events:
+        next_lesson = get_next_lesson()
+        current_lesson = get_current_lesson()
+        todays_lessons = get_todays_lessons()
+        upcoming_exams = get_upcoming_exams()
+        
+        context += "AKTUELLE INFORMATIONEN:\n"
+        
+        if current_lesson:
+            context += f"Aktuelle Lektion: {current_lesson['summary']}"
+            if current_lesson['location']:
+                context += f" im Raum {current_lesson['location']}"
+            context += f" (bis {current_lesson['end'].strftime('%H:%M')})\n"
+        
+        if next_lesson:
+            context += f"Nächste Lektion: {next_lesson['summary']}"
+            if next_lesson['location']:
+                context += f" im Raum {next_lesson['location']}"
+            context += f" um {next_lesson['start'].strftime('%H:%M')}\n"
+        
+        if todays_lessons:
+            context += f"\nHeutige Lektionen ({len(todays_lessons)}):\n"
+            for lesson in todays_lessons[:5]:  # Limit to 5
+                context += f"- {lesson['start'].strftime('%H:%M')}: {lesson['summary']}"
+                if lesson['is_exam']:
+                    context += " (PRÜFUNG)"
+                context += "\n"
+        
+        if upcoming_exams:
+            context += "\nKommende Prüfungen:\n"
+            for exam in upcoming_exams:
+                context += f"- {exam['start'].strftime('%d.%m.%Y %H:%M')}: {exam['summary']}\n"
+    
+    context += "\nBeantworte die Frage des Schülers freundlich und hilfreich auf Deutsch. Bei Fragen zum Stundenplan verwende die oben genannten Informationen."
+    return context
+
 @app.route('/api/ai/chat', methods=['POST'])
 def ai_chat():
-    """AI chat endpoint using Google Gemini"""
+    """AI chat endpoint using Google Gemini (see ai_chat_flow)"""
+    return run_flow(ai_chat_flow())
+
+def ai_chat_flow():
+    """Answer a chat message with Gemini, given the timetable as context"""
     if not GOOGLE_AI_API_KEY:
         return jsonify({
             'error': 'Google AI API key not configured',
@@ -1310,53 +2542,8 @@ def ai_chat():
         if not user_message:
             return jsonify({'error': 'No message provided'}), 400
         
-        # Get current timetable data for context
-        csv_path = os.path.join(app.config['UPLOAD_FOLDER'], 'timetable.csv')
-        events = []
-        
-        with _timetable_cache['lock']:
-            if _timetable_cache['events'] is not None:
-                events = _timetable_cache['events']
-            elif os.path.exists(csv_path):
-                events = parse_csv_timetable(csv_path)
-        
-        # Prepare context about the timetable
-        context = "Du bist ein hilfreicher Assistent für einen Schüler. Du hast Zugriff auf seinen Stundenplan.\n\n"
-        
-        if events:
-            next_lesson = get_next_lesson(events)
-            current_lesson = get_current_lesson(events)
-            todays_lessons = get_todays_lessons(events)
-            upcoming_exams = get_upcoming_exams(events)
-            
-            context += "AKTUELLE INFORMATIONEN:\n"
-            
-            if current_lesson:
-                context += f"Aktuelle Lektion: {current_lesson['summary']}"
-                if current_lesson['location']:
-                    context += f" im Raum {current_lesson['location']}"
-                context += f" (bis {current_lesson['end'].strftime('%H:%M')})\n"
-            
-            if next_lesson:
-                context += f"Nächste Lektion: {next_lesson['summary']}"
-                if next_lesson['location']:
-                    context += f" im Raum {next_lesson['location']}"
-                context += f" um {next_lesson['start'].strftime('%H:%M')}\n"
-            
-            if todays_lessons:
-                context += f"\nHeutige Lektionen ({len(todays_lessons)}):\n"
-                for lesson in todays_lessons[:5]:  # Limit to 5
-                    context += f"- {lesson['start'].strftime('%H:%M')}: {lesson['summary']}"
-                    if lesson['is_exam']:
-                        context += " (PRÜFUNG)"
-                    context += "\n"
-            
-            if upcoming_exams:
-                context += f"\nKommende Prüfungen:\n"
-                for exam in upcoming_exams:
-                    context += f"- {exam['start'].strftime('%d.%m.%Y %H:%M')}: {exam['summary']}\n"
-        
-        context += "\nBeantworte die Frage des Schülers freundlich und hilfreich auf Deutsch. Bei Fragen zum Stundenplan verwende die oben genannten Informationen."
+        # Timetable lookups may wait for the cache lock, keep them off the event loop
+        context = yield Blocking(_ai_timetable_context)
         
         # Use Gemini Flash Lite model (free tier)
         model = genai.GenerativeModel('gemini-2.5-flash-lite')
@@ -1374,7 +2561,10 @@ def ai_chat():
         
         # Send message with context
         full_message = f"{context}\n\nFrage: {user_message}"
-        response = chat.send_message(full_message)
+        response = yield Blocking(
+            lambda: chat.send_message(full_message),
+            lambda: chat.send_message_async(full_message)
+        )
         
         return jsonify({
             'response': response.text
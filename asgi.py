@@ -0,0 +1,185 @@
+"""
+ASGI entry point: upstream-bound routes on an event loop
+
+    uvicorn asgi:application --workers 2
+
+isy_login, isy_messages, isy_dashboard_messages, isy_message,
+isy_mark_messages, get_weather and ai_chat spend almost all their time
+waiting on ISY, OpenWeather or Gemini. Here they run as coroutines (their
+flows from app.py driven by upstream.run_flow_async) with a shared httpx
+connection pool, so one process can wait on hundreds of upstream calls at
+once. Every other route is served by the regular Flask app in a thread
+pool (asgiref's WsgiToAsgi).
+
+Requires httpx, asgiref and an ASGI server such as uvicorn.
+"""
+import functools
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (app, ai_chat_flow, check_isy_login, isy_dashboard_messages_flow,
+                 isy_login_flow, isy_mark_messages_flow, isy_message_flow, isy_messages_flow,
+                 weather_flow)
+from upstream import close_async_client, run_flow_async
+
+
+async def isy_login_view():
+    return await run_flow_async(isy_login_flow())
+
+
+async def isy_messages_view():
+    denied = check_isy_login()
+    if denied is not None:
+        return denied
+    return await run_flow_async(isy_messages_flow())
+
+
+async def isy_dashboard_messages_view():
+    denied = check_isy_login()
+    if denied is not None:
+        return denied
+    return await run_flow_async(isy_dashboard_messages_flow())
+
+
+async def isy_message_view(message_id):
+    denied = check_isy_login()
+    if denied is not None:
+        return denied
+    return await run_flow_async(isy_message_flow(message_id))
+
+
+async def isy_mark_messages_view():
+    denied = check_isy_login()
+    if denied is not None:
+        return denied
+    return await run_flow_async(isy_mark_messages_flow())
+
+
+async def weather_view():
+    return await run_flow_async(weather_flow())
+
+
+async def ai_chat_view():
+    return await run_flow_async(ai_chat_flow())
+
+
+# (method, path) -> async view; same URLs as the Flask routes
+ASYNC_ROUTES = {
+    ('POST', '/api/isy/login'): isy_login_view,
+    ('GET', '/api/isy/messages'): isy_messages_view,
+    ('GET', '/api/isy/dashboard-messages'): isy_dashboard_messages_view,
+    ('POST', '/api/isy/messages/mark'): isy_mark_messages_view,
+    ('GET', '/api/weather'): weather_view,
+    ('POST', '/api/ai/chat'): ai_chat_view
+}
+# (method, path prefix) -> async view taking the rest of the path, e.g. /api/isy/message/<id>
+ASYNC_PREFIX_ROUTES = {
+    ('GET', '/api/isy/message/'): isy_message_view
+}
+
+
+def async_view(method, path):
+    """Async view for a request, None if the Flask app handles it"""
+    view = ASYNC_ROUTES.get((method, path))
+    if view is not None:
+        return view
+    for (route_method, prefix), prefix_view in ASYNC_PREFIX_ROUTES.items():
+        rest = path[len(prefix):]
+        if method == route_method and path.startswith(prefix) and rest and '/' not in rest:
+            return functools.partial(prefix_view, rest)
+    return None
+
+_wsgi_application = WsgiToAsgi(app)
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope, so Flask's request and session work as usual"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+async def _serve_async_view(view, scope, receive, send):
+    """Run an async view inside a Flask request context and send its response"""
+    environ = build_environ(scope, await _read_body(receive))
+    with app.request_context(environ):
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view()
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            response = app.handle_exception(e)
+
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                   for name, value in response.get_wsgi_headers(environ).to_wsgi_list()]
+        body = response.get_data()
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] == 'http':
+        view = async_view(scope['method'], scope['path'])
+        if view is not None:
+            await _serve_async_view(view, scope, receive, send)
+            return
+    await _wsgi_application(scope, receive, send)
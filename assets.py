@@ -0,0 +1,374 @@
+"""
+Static asset pipeline
+
+Minifies the stylesheet, the script and the translation files, writes them
+under static/dist with a content hash in the file name and precompresses
+every file to gzip (and brotli, if the brotli package is installed).
+dist/manifest.json maps the source names to the hashed ones, so
+url_for('static', filename='css/style.css') can point to the current build
+and the hashed files can be cached forever.
+
+Run at app startup (only rebuilds when a source changed) or as a build step:
+    python assets.py
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from filewatch import atomic_write, file_digest
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Source files relative to the static folder; lang/*.json is added at build time
+ASSETS = ('css/style.css', 'js/main.js')
+
+# Classes of the above-the-fold layout (header, clock, next lesson, today and
+# exams cards); rules using only these are inlined into the page
+CRITICAL_CLASSES = frozenset('''
+container compact header compact-header logo header-search compact-search search-input-compact
+search-buttons-compact search-btn-compact google-btn chatgpt-btn github-btn brave-btn controls
+lang-btn notify-btn isy-btn active clock-container compact-clock time date main-content
+compact-main compact-row card compact-card current-notebook current-subject current-subject-small
+notebook-btn has-notebook no-notebook no-notebook-text lesson-info lesson-title lesson-time
+lesson-location lesson-location-inline lesson-countdown lesson-description special-badge
+cancelled moved room-change loading no-data no-lesson no-lessons todays-list today-lesson-item
+today-subject today-time show-more-btn exams-list exam-item exam-title exam-time exam-location
+exam-description exam-badge-inline isy-dashboard-messages info-message
+'''.split())
+CRITICAL_NAME = 'critical.css'
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_STRING_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+_CSS_SPACE_RE = re.compile(r'\s+')
+_CSS_PUNCT_RE = re.compile(r'\s*([{};,>])\s*')
+_CSS_CLASS_RE = re.compile(r'\.([a-zA-Z_][\w-]*)')
+# Characters after which a "/" starts a regex literal instead of a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of')
+
+
+def minify_css(text):
+    """Strip comments and collapse whitespace (spaces inside calc() etc. are kept)"""
+    if rcssmin:
+        return rcssmin.cssmin(text)
+
+    strings = []
+
+    def stash(match):
+        strings.append(match.group(0))
+        return f'"\0{len(strings) - 1}\0"'
+
+    text = _CSS_STRING_RE.sub(stash, text)
+    text = _CSS_COMMENT_RE.sub('', text)
+    text = _CSS_SPACE_RE.sub(' ', text)
+    text = _CSS_PUNCT_RE.sub(r'\1', text)
+    text = text.replace(': ', ':').replace(';}', '}').strip()
+    return re.sub(r'"\0(\d+)\0"', lambda m: strings[int(m.group(1))], text)
+
+
+def _css_blocks(css):
+    """Yield (prelude, body) for each top-level rule of minified CSS; body is None for statements"""
+    depth = 0
+    start = body_start = 0
+    prelude = ''
+    quote = None
+    for i, c in enumerate(css):
+        if quote:
+            if c == quote and css[i - 1] != '\\':
+                quote = None
+        elif c in '"\'':
+            quote = c
+        elif c == '{':
+            if depth == 0:
+                prelude, body_start = css[start:i].strip(), i + 1
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                yield prelude, css[body_start:i]
+                start = i + 1
+        elif c == ';' and depth == 0:
+            yield css[start:i].strip(), None
+            start = i + 1
+
+
+def _critical_rules(css, classes):
+    rules, keyframes = [], {}
+    for prelude, body in _css_blocks(css):
+        if body is None:
+            continue
+        if prelude.startswith(('@media', '@supports')):
+            inner, inner_keyframes = _critical_rules(body, classes)
+            keyframes.update(inner_keyframes)
+            if inner:
+                rules.append(f"{prelude}{{{''.join(inner)}}}")
+        elif '@keyframes' in prelude:
+            keyframes.setdefault(prelude.split()[-1], []).append(f"{prelude}{{{body}}}")
+        elif prelude.startswith('@font-face'):
+            rules.append(f"{prelude}{{{body}}}")
+        elif not prelude.startswith('@'):
+            selectors = [sel for sel in prelude.split(',')
+                         if '#' not in sel and set(_CSS_CLASS_RE.findall(sel)) <= classes]
+            if selectors:
+                rules.append(f"{','.join(selectors)}{{{body}}}")
+    return rules, keyframes
+
+
+def extract_critical_css(css, classes=CRITICAL_CLASSES):
+    """
+    Rules needed for the first paint: selectors that only use the given
+    classes (or none), media queries around them and the keyframes they use
+    """
+    rules, keyframes = _critical_rules(minify_css(css), classes)
+    text = ''.join(rules)
+    used = [''.join(blocks) for name, blocks in keyframes.items()
+            if re.search(rf'(?<![\w-]){re.escape(name)}(?![\w-])', text)]
+    return text + ''.join(used)
+
+
+def minify_js(text):
+    """
+    Remove comments, indentation and blank lines from JavaScript
+
+    Line breaks are kept, so automatic semicolon insertion behaves exactly
+    as in the source. Strings, template literals (including nested ${...})
+    and regex literals are copied verbatim.
+    """
+    if rjsmin:
+        return rjsmin.jsmin(text)
+
+    out = []
+    i, n = 0, len(text)
+    # One entry per open template literal: brace depth of its current ${...}
+    templates = []
+    last = ''  # last significant character written in code mode
+
+    def ends_with_keyword():
+        tail = ''.join(out[-12:]).rstrip()
+        return any(tail.endswith(k) and not (tail[:-len(k)][-1:].isalnum() or tail[:-len(k)][-1:] in '_$')
+                   for k in _REGEX_KEYWORDS)
+
+    def copy_until(j, quote):
+        """Copy a string/regex body starting at j up to and including the closing quote"""
+        in_class = False
+        while j < n:
+            c = text[j]
+            if c == '\\':
+                j += 2
+                continue
+            if quote == '/' and c == '[':
+                in_class = True
+            elif quote == '/' and c == ']':
+                in_class = False
+            elif c == quote and not in_class:
+                return j + 1
+            elif c == '\n' and quote != '`':
+                return j
+            j += 1
+        return j
+
+    def copy_template(j):
+        """Copy template text from j up to the closing backtick or the next ${"""
+        while j < n:
+            c = text[j]
+            if c == '\\':
+                j += 2
+                continue
+            if c == '`':
+                return j + 1, True
+            if c == '$' and text[j + 1:j + 2] == '{':
+                return j + 2, False
+            j += 1
+        return j, True
+
+    while i < n:
+        c = text[i]
+        if c in '"\'':
+            j = copy_until(i + 1, c)
+            out.append(text[i:j])
+            last, i = c, j
+        elif c == '`' or (c == '}' and templates and templates[-1] == 0):
+            if c == '`':
+                templates.append(0)
+            j, closed = copy_template(i + 1)
+            out.append(text[i:j])
+            if closed:
+                templates.pop()
+            last, i = '`', j
+        elif c == '/' and text[i + 1:i + 2] == '/':
+            while i < n and text[i] != '\n':
+                i += 1
+        elif c == '/' and text[i + 1:i + 2] == '*':
+            end = text.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+        elif c == '/' and (last in _REGEX_PRECEDERS or not last or ends_with_keyword()):
+            j = copy_until(i + 1, '/')
+            while j < n and text[j].isalpha():
+                j += 1  # flags
+            out.append(text[i:j])
+            last, i = '/', j
+        elif c in ' \t\r\n':
+            j = i
+            newline = False
+            while j < n and text[j] in ' \t\r\n':
+                newline = newline or text[j] == '\n'
+                j += 1
+            if out and out[-1] not in ('\n', ' '):
+                out.append('\n' if newline else ' ')
+            elif newline and out and out[-1] == ' ':
+                out[-1] = '\n'
+            i = j
+        else:
+            if templates:
+                if c == '{':
+                    templates[-1] += 1
+                elif c == '}':
+                    templates[-1] -= 1
+            out.append(c)
+            last, i = c, i + 1
+    return ''.join(out).strip() + '\n'
+
+
+def minify_json(text):
+    """Re-serialize JSON without whitespace"""
+    return json.dumps(json.loads(text), ensure_ascii=False, separators=(',', ':'))
+
+
+_MINIFIERS = {'.css': minify_css, '.js': minify_js, '.json': minify_json}
+
+
+def hashed_name(name, content):
+    """style.css + content -> style.<hash>.css"""
+    root, ext = os.path.splitext(name)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+
+def _write_bytes(path, data):
+    atomic_write(path, lambda f: f.write(data), binary=True, only_if_changed=True)
+
+
+def source_assets(static_folder):
+    """Source file names (relative to the static folder) handled by the pipeline"""
+    names = [name for name in ASSETS if os.path.exists(os.path.join(static_folder, name))]
+    lang_dir = os.path.join(static_folder, 'lang')
+    if os.path.isdir(lang_dir):
+        names.extend(f"lang/{name}" for name in sorted(os.listdir(lang_dir)) if name.endswith('.json'))
+    return names
+
+
+def load_manifest(static_folder):
+    """Return the manifest of the last build, or None"""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_assets(static_folder, force=False):
+    """
+    Build static/dist if a source changed and return the manifest
+    {'files': {source: 'dist/...hashed'}, 'sources': {source: sha256},
+     'previous': [files of the build before, kept for one more release]}
+    """
+    names = source_assets(static_folder)
+    digests = {name: file_digest(os.path.join(static_folder, name)) for name in names}
+    manifest = load_manifest(static_folder)
+    if not force and manifest and manifest.get('sources') == digests and all(
+            os.path.exists(os.path.join(static_folder, path))
+            for path in [*manifest['files'].values(), f"{DIST_DIR}/{CRITICAL_NAME}"]):
+        return manifest
+
+    dist = os.path.join(static_folder, DIST_DIR)
+    files = {}
+    for name in names:
+        with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+            source = f.read()
+        content = _MINIFIERS[os.path.splitext(name)[1]](source).encode('utf-8')
+        target = f"{DIST_DIR}/{hashed_name(name, content)}"
+        path = os.path.join(static_folder, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_bytes(path, content)
+        # mtime=0 keeps the gzip output identical between builds
+        _write_bytes(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli:
+            _write_bytes(path + '.br', brotli.compress(content, quality=11))
+        files[name] = target
+
+    # Above-the-fold subset of the stylesheet, inlined by the template
+    if 'css/style.css' in digests:
+        with open(os.path.join(static_folder, 'css/style.css'), encoding='utf-8') as f:
+            critical = extract_critical_css(f.read()).encode('utf-8')
+        os.makedirs(dist, exist_ok=True)
+        _write_bytes(os.path.join(dist, CRITICAL_NAME), critical)
+
+    # Drop outputs of earlier builds, except the one just replaced: pages
+    # (and service workers) still on it may fetch files they haven't loaded yet
+    previous = sorted(set(manifest['files'].values()) - set(files.values())) if manifest else []
+    if not previous and manifest:
+        previous = manifest.get('previous', [])
+    keep = set(files.values()) | set(previous)
+    for root, _dirs, filenames in os.walk(dist):
+        for filename in filenames:
+            rel = os.path.relpath(os.path.join(root, filename), static_folder).replace(os.sep, '/')
+            base = rel[:-3] if rel.endswith(('.gz', '.br')) else rel
+            if (base not in keep and filename not in (MANIFEST_NAME, CRITICAL_NAME)
+                    and not filename.startswith('.')):
+                os.remove(os.path.join(root, filename))
+
+    manifest = {'files': files, 'sources': digests, 'previous': previous}
+    atomic_write(
+        os.path.join(dist, MANIFEST_NAME),
+        lambda f: json.dump(manifest, f, indent=2, sort_keys=True),
+        only_if_changed=True
+    )
+    return manifest
+
+
+def load_critical_css(static_folder):
+    """Return the inlined above-the-fold CSS of the last build, or ''"""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, CRITICAL_NAME), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def precompressed_variant(path, accept_encoding):
+    """
+    Pick the best precompressed file for an Accept-Encoding header
+    Returns (path, content_encoding); content_encoding is None for the plain file
+    """
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted and os.path.exists(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+if __name__ == '__main__':
+    static = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    result = build_assets(static, force=True)
+    for source_name, built in sorted(result['files'].items()):
+        src_size = os.path.getsize(os.path.join(static, source_name))
+        out = os.path.join(static, built)
+        print(f"{source_name} -> {built} ({src_size} -> {os.path.getsize(out)} bytes, "
+              f"gzip {os.path.getsize(out + '.gz')})")
+    print(f"critical css: {len(load_critical_css(static))} bytes")
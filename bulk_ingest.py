@@ -0,0 +1,201 @@
+"""
+Bulk ingestion of many personal ICS feeds
+
+For a school-wide deployment with hundreds of timetable URLs (e.g. every
+student of a class year), feeding them one after another through
+fetch_and_convert_ics_to_csv would take many minutes. Here:
+
+- Downloads run concurrently on a thread pool over the pooled HTTP session
+  of upstream.py, at most per_host at a time per server, as conditional
+  requests (ETag) and behind one circuit breaker for all feeds.
+- Parsing and classification (ics_parser, lessons.event_from_ics) run on a
+  process pool, so they use all cores instead of sharing the GIL.
+- Each feed is published to the event store as soon as it is parsed: events
+  upserted, changes recorded, touched rooms logged for the room index.
+  Feeds whose content didn't change are only marked as fetched.
+
+Used by `python fetch_timetable.py --feeds feeds.txt` and by the scheduled
+job in app.py (FEEDS_FILE).
+
+Feeds file: one feed per line, "<name> <ICS URL>"; empty lines and lines
+starting with # are ignored. The name identifies the feed in the event store.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+import hashlib
+import multiprocessing
+import threading
+import time as time_module
+from urllib.parse import urlsplit
+
+from event_store import DEFAULT_USER
+from ics_parser import decode_lines, iter_ics_events
+from lessons import event_from_ics, row_to_event
+from timetable_diff import affected_rooms, diff_events
+from upstream import Upstream
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST = 8
+
+# One breaker for all bulk downloads: when the feed server is down, the
+# remaining feeds fail fast instead of each waiting for its deadline
+bulk_upstream = Upstream('ics-bulk', timeout=15, deadline=30, failure_threshold=10, reset_timeout=60)
+
+
+def load_feeds(path):
+    """Read a feeds file into a list of (name, url)"""
+    feeds = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split()
+            if len(parts) != 2:
+                print(f"{path}:{number}: expected '<name> <url>', skipped")
+            elif parts[0] == DEFAULT_USER:
+                print(f"{path}:{number}: '{DEFAULT_USER}' is the app's own timetable, skipped")
+            else:
+                feeds.append((parts[0], parts[1]))
+    return feeds
+
+
+def due_feeds(store, feeds, max_age, now=None):
+    """Feeds not fetched within the last max_age seconds"""
+    now = time_module.time() if now is None else now
+    states = store.feed_states()
+    return [(name, url) for name, url in feeds
+            if name not in states or now - states[name][3] >= max_age]
+
+
+class HostLimiter:
+    """Allow at most limit concurrent downloads per host"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._slots.get(host)
+            if semaphore is None:
+                semaphore = self._slots[host] = threading.BoundedSemaphore(self.limit)
+        with semaphore:
+            yield
+
+
+def download(url, etag, limiter):
+    """
+    Fetch a feed, returns (data, etag); data is None if it is unchanged (304)
+    Raises on HTTP errors and when the server is unreachable.
+    """
+    headers = {'If-None-Match': etag} if etag else {}
+    with limiter.slot(url):
+        response = bulk_upstream.request('GET', url, headers=headers)
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    return response.content, response.headers.get('ETag')
+
+
+def parse_feed(data):
+    """Parse and classify a downloaded feed into events sorted by start (runs in a worker process)"""
+    events = []
+    for ics_event in iter_ics_events(decode_lines(data.splitlines(keepends=True))):
+        event = event_from_ics(ics_event)
+        if event:
+            events.append(event)
+    events.sort(key=lambda e: e['start_ts'])
+    return events
+
+
+def publish_feed(store, name, url, fetched_at, events=None, etag=None, digest=None, error=None):
+    """
+    Publish one feed to the event store in a single transaction
+    With events None only the fetch (unchanged content or error) is recorded.
+    Returns the number of changes, None for the first import of a feed.
+    """
+    with store.shared.transaction() as conn:
+        if events is None:
+            store.record_feed_fetch(conn, name, url, fetched_at, etag, digest, error)
+            return 0
+        previous = [row_to_event(r) for r in store.all_events(name)]
+        changes = diff_events(previous, events) if previous else None
+        if changes != []:
+            store.upsert(conn, name, events, seen_at=fetched_at)
+            rooms = affected_rooms(changes, previous, events)
+            if rooms:
+                store.record_room_updates(conn, rooms, fetched_at)
+        version = store.record_feed_fetch(conn, name, url, fetched_at, etag, digest, changed=changes != [])
+        if changes:
+            store.record_changes(conn, name, version, changes, fetched_at)
+    return None if changes is None else len(changes)
+
+
+def ingest(store, feeds, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, processes=None,
+           on_published=None):
+    """
+    Download, parse and publish feeds [(name, url)], each as soon as it is ready
+    processes: parser processes (default: one per CPU, 0 parses on the download threads).
+    on_published(name, outcome) is called after every feed, e.g. to renew a lease.
+    Returns counts: feeds, new, changed, unchanged, failed, changes, seconds.
+    """
+    started = time_module.monotonic()
+    stats = {'feeds': len(feeds), 'new': 0, 'changed': 0, 'unchanged': 0, 'failed': 0, 'changes': 0}
+    states = store.feed_states()
+    limiter = HostLimiter(per_host)
+    parsers = None
+    if processes != 0 and feeds:
+        parsers = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+
+    with ThreadPoolExecutor(concurrency, thread_name_prefix='feed-download') as downloads:
+        pending = {}
+        for name, url in feeds:
+            etag = states[name][1] if name in states else None
+            pending[downloads.submit(download, url, etag, limiter)] = (name, url, None)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, url, parsed_from = pending.pop(future)
+                fetched_at = time_module.time()
+                try:
+                    if parsed_from is None:
+                        data, etag = future.result()
+                        digest = hashlib.sha256(data).hexdigest() if data is not None else None
+                        if data is not None and (name not in states or digest != states[name][2]):
+                            # New content: parse it, publish when the parser is done
+                            parse = (parsers or downloads).submit(parse_feed, data)
+                            pending[parse] = (name, url, (etag, digest))
+                            continue
+                        publish_feed(store, name, url, fetched_at, etag=etag)
+                        outcome = 'unchanged'
+                    else:
+                        count = publish_feed(store, name, url, fetched_at, future.result(), *parsed_from)
+                        stats['changes'] += count or 0
+                        outcome = 'new' if count is None else 'changed' if count else 'unchanged'
+                except Exception as e:
+                    print(f"Feed {name} failed: {type(e).__name__}: {e}")
+                    try:
+                        publish_feed(store, name, url, fetched_at, error=f"{type(e).__name__}: {e}")
+                    except Exception as publish_error:
+                        print(f"Feed {name}: could not record the failure: {publish_error}")
+                    outcome = 'failed'
+                stats[outcome] += 1
+                if on_published:
+                    on_published(name, outcome)
+
+    if parsers:
+        parsers.shutdown()
+    stats['seconds'] = round(time_module.monotonic() - started, 1)
+    return stats
+
+
+def format_stats(stats):
+    """One-line summary of ingest() counts"""
+    return (f"{stats['feeds']} feeds in {stats['seconds']}s: {stats['new']} new, "
+            f"{stats['changed']} changed ({stats['changes']} changes), "
+            f"{stats['unchanged']} unchanged, {stats['failed']} failed")
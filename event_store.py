@@ -0,0 +1,319 @@
+"""
+SQLite event store for timetable events
+
+Events are upserted by a stable key (the ICS UID, or start time + summary
+when there is none) and never deleted: events that disappear from the feed
+get a removed_at timestamp, so the store keeps a history across refreshes
+and restarts. All dashboard queries are index range scans on
+(user, start_ts) or (user, is_exam, start_ts). The differences between
+successive snapshots are kept in a change feed (see timetable_diff.py),
+and the rooms a snapshot touched in a room update log (see room_index.py).
+"""
+import json
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    user TEXT NOT NULL,
+    event_key TEXT NOT NULL,
+    uid TEXT NOT NULL DEFAULT '',
+    original_summary TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    room TEXT NOT NULL DEFAULT '',
+    is_exam INTEGER NOT NULL DEFAULT 0,
+    is_cancelled INTEGER NOT NULL DEFAULT 0,
+    special_note TEXT NOT NULL DEFAULT '',
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    removed_at REAL,
+    PRIMARY KEY (user, event_key)
+);
+CREATE INDEX IF NOT EXISTS idx_events_user_start ON events (user, start_ts);
+CREATE INDEX IF NOT EXISTS idx_events_user_exam_start ON events (user, is_exam, start_ts);
+CREATE INDEX IF NOT EXISTS idx_events_room ON events (room, start_ts);
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    detected_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    event_key TEXT NOT NULL,
+    start_ts INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_changes_user_id ON changes (user, id);
+CREATE INDEX IF NOT EXISTS idx_changes_user_version ON changes (user, version);
+CREATE TABLE IF NOT EXISTS feeds (
+    user TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    digest TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS room_updates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Columns returned by all queries, in row order
+COLUMNS = ('event_key', 'uid', 'original_summary', 'summary', 'start_ts', 'end_ts',
+           'description', 'room', 'is_exam', 'is_cancelled', 'special_note')
+_SELECT = f"SELECT {', '.join(COLUMNS)} FROM events"
+
+# Owner of the app's own timetable (ICS_URL / uploaded CSV); bulk-ingested
+# feeds (see bulk_ingest.py) use their own names
+DEFAULT_USER = 'default'
+
+# Change feed entries older than this are pruned when new ones are recorded
+CHANGE_RETENTION_SECONDS = 60 * 86400
+
+# Room update log entries older than this are pruned (the newest one is kept);
+# a worker that falls further behind rebuilds its room index
+ROOM_UPDATE_RETENTION_SECONDS = 86400
+
+# Bookings per room and time slot over all feeds, cancelled lessons excluded
+_ROOM_BOOKINGS = (
+    "SELECT room, start_ts, end_ts, MIN(summary), MIN(original_summary), COUNT(DISTINCT user) "
+    "FROM events WHERE removed_at IS NULL AND is_cancelled = 0 AND room != ''"
+)
+
+# Upper bound for event duration, limits the index scan for "current event"
+MAX_EVENT_SECONDS = 7 * 86400
+
+
+def event_key(event):
+    """Stable identity of an event: its UID, or start time + summary"""
+    if event.get('uid'):
+        return f"uid:{event['uid']}"
+    return f"{event['start_ts']}|{event['original_summary']}"
+
+
+class EventStore:
+    """Indexed event table, sharing the connection handling of the shared cache"""
+
+    def __init__(self, shared_cache):
+        self.shared = shared_cache
+        self.shared.connection().executescript(SCHEMA)
+
+    def upsert(self, conn, user, events, seen_at):
+        """
+        Replace a user's feed with events (call inside shared.transaction())
+        Events missing from the new feed are marked removed, not deleted.
+        """
+        conn.executemany(
+            """
+            INSERT INTO events (user, event_key, uid, original_summary, summary, start_ts, end_ts,
+                                description, room, is_exam, is_cancelled, special_note,
+                                first_seen, last_seen, removed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)
+            ON CONFLICT (user, event_key) DO UPDATE SET
+                uid = excluded.uid,
+                original_summary = excluded.original_summary,
+                summary = excluded.summary,
+                start_ts = excluded.start_ts,
+                end_ts = excluded.end_ts,
+                description = excluded.description,
+                room = excluded.room,
+                is_exam = excluded.is_exam,
+                is_cancelled = excluded.is_cancelled,
+                special_note = excluded.special_note,
+                last_seen = excluded.last_seen,
+                removed_at = NULL
+            """,
+            (
+                (user, event_key(e), e.get('uid', ''), e['original_summary'], e['summary'],
+                 e['start_ts'], e['end_ts'], e['description'], e['location'],
+                 int(e['is_exam']), int(e['is_cancelled']), e['special_note'], seen_at, seen_at)
+                for e in events
+            )
+        )
+        conn.execute(
+            'UPDATE events SET removed_at = ? WHERE user = ? AND last_seen < ? AND removed_at IS NULL',
+            (seen_at, user, seen_at)
+        )
+
+    def _query(self, sql, params):
+        return self.shared.connection().execute(sql, params).fetchall()
+
+    def all_events(self, user):
+        """All active events of a user, sorted by start"""
+        return self._query(
+            f"{_SELECT} WHERE user = ? AND removed_at IS NULL ORDER BY start_ts", (user,)
+        )
+
+    def next_event(self, user, now):
+        """First active event starting after now"""
+        rows = self._query(
+            f"{_SELECT} WHERE user = ? AND start_ts > ? AND removed_at IS NULL "
+            "ORDER BY start_ts LIMIT 1", (user, now)
+        )
+        return rows[0] if rows else None
+
+    def current_event(self, user, now):
+        """First active event running at now"""
+        rows = self._query(
+            f"{_SELECT} WHERE user = ? AND start_ts BETWEEN ? AND ? AND end_ts >= ? "
+            "AND removed_at IS NULL ORDER BY start_ts LIMIT 1",
+            (user, now - MAX_EVENT_SECONDS, now, now)
+        )
+        return rows[0] if rows else None
+
+    def events_between(self, user, start, end, ending_after=None):
+        """Active events starting in [start, end), optionally only those ending after a time"""
+        if ending_after is None:
+            return self._query(
+                f"{_SELECT} WHERE user = ? AND start_ts >= ? AND start_ts < ? "
+                "AND removed_at IS NULL ORDER BY start_ts", (user, start, end)
+            )
+        return self._query(
+            f"{_SELECT} WHERE user = ? AND start_ts >= ? AND start_ts < ? AND end_ts > ? "
+            "AND removed_at IS NULL ORDER BY start_ts", (user, start, end, ending_after)
+        )
+
+    def upcoming_exams(self, user, now, count):
+        """Next count active exams starting after now"""
+        return self._query(
+            f"{_SELECT} WHERE user = ? AND is_exam = 1 AND start_ts > ? AND removed_at IS NULL "
+            "ORDER BY start_ts LIMIT ?", (user, now, count)
+        )
+
+    def iter_events(self, user, start=None, end=None, exams_only=False, batch_size=500):
+        """
+        Active events starting in [start, end) (unbounded if None), sorted by start
+        A generator that fetches batch_size rows at a time, for exports of any size.
+        """
+        conditions, params = ['user = ?'], [user]
+        if exams_only:
+            conditions.append('is_exam = 1')
+        if start is not None:
+            conditions.append('start_ts >= ?')
+            params.append(start)
+        if end is not None:
+            conditions.append('start_ts < ?')
+            params.append(end)
+        cursor = self.shared.connection().execute(
+            f"{_SELECT} WHERE {' AND '.join(conditions)} AND removed_at IS NULL ORDER BY start_ts", params
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    def last_modified(self, user):
+        """Time of the last change to a user's events (first import or change feed entry), 0 if none"""
+        return self._query(
+            'SELECT MAX(COALESCE((SELECT MAX(first_seen) FROM events WHERE user = ?), 0), '
+            'COALESCE((SELECT MAX(detected_at) FROM changes WHERE user = ?), 0))', (user, user)
+        )[0][0]
+
+    def record_changes(self, conn, user, version, changes, detected_at):
+        """Append change records of a new snapshot version (call inside shared.transaction())"""
+        conn.executemany(
+            'INSERT INTO changes (user, version, detected_at, kind, event_key, start_ts, record) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((user, version, detected_at, c['kind'], c['event_key'], c['start_ts'],
+              json.dumps(c, ensure_ascii=False)) for c in changes)
+        )
+        conn.execute('DELETE FROM changes WHERE user = ? AND detected_at < ?',
+                     (user, detected_at - CHANGE_RETENTION_SECONDS))
+
+    def changes_since(self, user, since_id=0, since_time=None, limit=100):
+        """Changes after a change id and/or detection time, oldest first, as (id, detected_at, record)"""
+        rows = self._query(
+            'SELECT id, detected_at, record FROM changes WHERE user = ? AND id > ? AND detected_at > ? '
+            'ORDER BY id LIMIT ?', (user, since_id, since_time or 0, limit)
+        )
+        return [(change_id, detected_at, json.loads(record)) for change_id, detected_at, record in rows]
+
+    def latest_change_id(self, user):
+        """Id of the newest change (0 if there is none)"""
+        return self._query('SELECT COALESCE(MAX(id), 0) FROM changes WHERE user = ?', (user,))[0][0]
+
+    def changes_between_versions(self, user, old_version, new_version):
+        """
+        Change records of the snapshot versions after old_version up to new_version
+        Returns None if a version in between has no recorded changes (e.g. it
+        was the first import or its changes were pruned), so the caller has
+        to reload everything.
+        """
+        if new_version < old_version:
+            return None
+        rows = self._query(
+            'SELECT version, record FROM changes WHERE user = ? AND version > ? AND version <= ? ORDER BY id',
+            (user, old_version, new_version)
+        )
+        if {version for version, _record in rows} != set(range(old_version + 1, new_version + 1)):
+            return None
+        return [json.loads(record) for _version, record in rows]
+
+    def record_room_updates(self, conn, rooms, updated_at):
+        """Log rooms whose bookings a snapshot changed (call inside shared.transaction())"""
+        conn.executemany('INSERT INTO room_updates (room, updated_at) VALUES (?, ?)',
+                         ((room, updated_at) for room in sorted(rooms) if room))
+        conn.execute('DELETE FROM room_updates WHERE updated_at < ? AND id < (SELECT MAX(id) FROM room_updates)',
+                     (updated_at - ROOM_UPDATE_RETENTION_SECONDS,))
+
+    def room_updates_since(self, after_id):
+        """
+        (latest id, rooms updated after after_id) from the room update log
+        rooms is None if entries after after_id were already pruned.
+        """
+        first, latest = self._query('SELECT MIN(id), MAX(id) FROM room_updates', ())[0]
+        if latest is None or latest <= after_id:
+            return after_id, set()
+        if first > after_id + 1:
+            return latest, None
+        rows = self._query('SELECT room FROM room_updates WHERE id > ? AND id <= ?', (after_id, latest))
+        return latest, {room for (room,) in rows}
+
+    def latest_room_update(self):
+        """Id of the newest room update (0 if there is none)"""
+        return self._query('SELECT COALESCE(MAX(id), 0) FROM room_updates', ())[0][0]
+
+    def room_bookings(self, room=None):
+        """
+        Bookings as (room, start_ts, end_ts, summary, original_summary, feeds),
+        one per room and time slot, sorted by room and start; all rooms if room is None
+        """
+        if room is None:
+            return self._query(f"{_ROOM_BOOKINGS} GROUP BY room, start_ts, end_ts ORDER BY room, start_ts, end_ts", ())
+        return self._query(
+            f"{_ROOM_BOOKINGS} AND room = ? GROUP BY start_ts, end_ts ORDER BY start_ts, end_ts", (room,)
+        )
+
+    def feed_states(self):
+        """Bulk-ingested feeds as {user: (url, etag, digest, fetched_at)}"""
+        rows = self._query('SELECT user, url, etag, digest, fetched_at FROM feeds', ())
+        return {user: tuple(state) for user, *state in rows}
+
+    def record_feed_fetch(self, conn, user, url, fetched_at, etag=None, digest=None, error=None, changed=False):
+        """
+        Record a fetch of a bulk-ingested feed (call inside shared.transaction())
+        etag and digest are kept from the last fetch when None. Returns the
+        feed's version, which counts the fetches that changed its events.
+        """
+        conn.execute(
+            """
+            INSERT INTO feeds (user, url, etag, digest, version, fetched_at, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user) DO UPDATE SET
+                url = excluded.url,
+                etag = COALESCE(excluded.etag, etag),
+                digest = COALESCE(excluded.digest, digest),
+                version = version + excluded.version,
+                fetched_at = excluded.fetched_at,
+                error = excluded.error
+            """,
+            (user, url, etag, digest, int(changed), fetched_at, error)
+        )
+        return conn.execute('SELECT version FROM feeds WHERE user = ?', (user,)).fetchone()[0]
@@ -0,0 +1,122 @@
+"""
+JSON encoding for API responses, with pre-encoded fragments
+
+fragment(obj) encodes a value once and returns a Fragment that can be
+placed anywhere in a response object; encoding the response splices its
+bytes in as they are. The timetable uses this to encode every lesson once
+per snapshot instead of once per request.
+
+Uses orjson (3.9 or newer, which has orjson.Fragment) when installed and
+the standard library otherwise. FastJSONProvider plugs this into Flask,
+so jsonify() and the |tojson template filter handle fragments as well.
+Formatting options (sort_keys, indent, ...) are honoured by re-encoding
+with the standard library; app.py turns off Jinja's default sort_keys so
+|tojson stays on the fast path.
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    if not hasattr(orjson, 'Fragment'):
+        orjson = None
+except ImportError:
+    orjson = None
+
+_ORJSON_OPTIONS = 0
+if orjson is not None:
+    # Leave datetimes, dataclasses and non-str keys to Flask's default(),
+    # so responses look the same with or without orjson
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+class Fragment:
+    """Pre-encoded JSON (standard library mode)"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __repr__(self):
+        return f"Fragment({self.data!r})"
+
+
+class _ContainsFragment(Exception):
+    pass
+
+
+def _refuse_fragment(default):
+    def hook(obj):
+        if isinstance(obj, Fragment):
+            raise _ContainsFragment()
+        return default(obj)
+    return hook
+
+
+def _std_dumps(obj, default):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default)
+
+
+def _splice(obj, default, out):
+    """Encode obj into out (list of str), inserting fragments verbatim"""
+    if isinstance(obj, Fragment):
+        out.append(obj.data)
+    elif isinstance(obj, dict):
+        out.append('{')
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                out.append(',')
+            out.append(_std_dumps(str(key), default))
+            out.append(':')
+            _splice(value, default, out)
+        out.append('}')
+    elif isinstance(obj, (list, tuple)):
+        out.append('[')
+        for i, value in enumerate(obj):
+            if i:
+                out.append(',')
+            _splice(value, default, out)
+        out.append(']')
+    else:
+        out.append(_std_dumps(obj, default))
+
+
+def dumps_bytes(obj, default=None):
+    """Encode obj as compact UTF-8 JSON bytes; default() handles unknown types"""
+    if default is None:
+        default = DefaultJSONProvider.default
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+    try:
+        # Fast path: no fragments inside, the C encoder does everything
+        return _std_dumps(obj, _refuse_fragment(default)).encode('utf-8')
+    except _ContainsFragment:
+        out = []
+        _splice(obj, default, out)
+        return ''.join(out).encode('utf-8')
+
+
+def fragment(obj):
+    """Encode obj once for splicing into later responses"""
+    if orjson is not None:
+        return orjson.Fragment(dumps_bytes(obj))
+    return Fragment(dumps_bytes(obj).decode('utf-8'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider using dumps_bytes (orjson if available, fragments allowed)"""
+
+    def dumps(self, obj, **kwargs):
+        default = kwargs.pop('default', self.default)
+        data = dumps_bytes(obj, default)
+        if kwargs:
+            # indent, sort_keys etc. are only known to the standard library
+            # encoder: expand the fragments by decoding, then format
+            return super().dumps(json.loads(data), **kwargs)
+        return data.decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, self.default), mimetype=self.mimetype)
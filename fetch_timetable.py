@@ -1,70 +1,99 @@
 """
 Script to fetch ICS from KSR API and convert to CSV format
 This matches the user's provided script
+
+With --feeds it ingests many timetable feeds into the event store instead
+(see bulk_ingest.py):
+
+    python fetch_timetable.py                       # default URL -> stundenplan.csv
+    python fetch_timetable.py URL -o plan.csv
+    python fetch_timetable.py --feeds feeds.txt     # all feeds -> uploads/supergui.db
 """
+import argparse
 import csv
+import os
+import sys
+
 import requests
-from datetime import datetime
+
+from ics_parser import CSV_FIELDNAMES, decode_lines, event_to_csv_row, iter_ics_events
+
+DEFAULT_URL = "https://isy-api.ksr.ch/pagdDownloadTimeTableIcal/dmbphs0g5i58gpwo7fxkja/timetable.ics"
+DEFAULT_DB = os.path.join('uploads', 'supergui.db')
+# Lease held while ingesting, so app workers and cron runs don't overlap
+BULK_INGEST_LEASE = 'bulk-ingest'
+
 
 def fetch_and_convert_to_csv(url, output_file="stundenplan.csv"):
     """
     Fetch ICS from URL and convert to CSV format
     Format: Subject,Start Date,Start Time,End Date,End Time,Description,Location
     """
-    input_file = "stundenplan_temp.ics"
-    
-    # Download ICS from URL
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        with open(input_file, "wb") as f:
-            f.write(r.content)
+        with requests.get(url, timeout=10, stream=True) as r:
+            r.raise_for_status()
+            with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
+                writer.writeheader()
+                for event in iter_ics_events(decode_lines(r.iter_lines(delimiter=b'\n'))):
+                    writer.writerow(event_to_csv_row(event))
     except Exception as e:
         print(f"Error fetching ICS: {e}")
         return False
-    
-    # Parse ICS file
-    events = []
-    with open(input_file, "r", encoding="utf-8", errors="ignore") as f:
-        lines = f.readlines()
-    
-    event = {}
-    for line in lines:
-        line = line.strip()
-        if line.startswith("BEGIN:VEVENT"):
-            event = {}
-        elif line.startswith("SUMMARY:"):
-            event["Subject"] = line.replace("SUMMARY:", "")
-        elif line.startswith("DTSTART:"):
-            dtstart = datetime.strptime(line.replace("DTSTART:", ""), "%Y%m%dT%H%M%SZ")
-            event["Start Date"] = dtstart.strftime("%m/%d/%Y")
-            event["Start Time"] = dtstart.strftime("%H:%M")
-        elif line.startswith("DTEND:"):
-            dtend = datetime.strptime(line.replace("DTEND:", ""), "%Y%m%dT%H%M%SZ")
-            event["End Date"] = dtend.strftime("%m/%d/%Y")
-            event["End Time"] = dtend.strftime("%H:%M")
-        elif line.startswith("END:VEVENT"):
-            events.append(event)
-    
-    # Write to CSV
-    with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-        fieldnames = ["Subject", "Start Date", "Start Time", "End Date", "End Time", "Description", "Location"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for e in events:
-            writer.writerow({
-                "Subject": e.get("Subject", ""),
-                "Start Date": e.get("Start Date", ""),
-                "Start Time": e.get("Start Time", ""),
-                "End Date": e.get("End Date", ""),
-                "End Time": e.get("End Time", ""),
-                "Description": "",
-                "Location": ""
-            })
-    
+
     print(f"CSV file created: {output_file}")
     return True
 
+
+def bulk_ingest(feeds_file, db_path, due=0, concurrency=None, per_host=None, processes=None):
+    """Ingest all (or only the due) feeds of feeds_file into the event store at db_path"""
+    # Imported here: the single-feed mode only needs requests
+    from bulk_ingest import DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, due_feeds, format_stats, ingest, load_feeds
+    from event_store import EventStore
+    from shared_cache import SharedTimetableCache
+
+    shared = SharedTimetableCache(db_path)
+    store = EventStore(shared)
+    feeds = load_feeds(feeds_file)
+    if due:
+        feeds = due_feeds(store, feeds, due)
+    if not feeds:
+        print("No feeds to fetch")
+        return True
+    if not shared.acquire_lease(BULK_INGEST_LEASE):
+        print("Another bulk import is running")
+        return True
+    try:
+        stats = ingest(
+            store, feeds,
+            concurrency=concurrency or DEFAULT_CONCURRENCY,
+            per_host=per_host or DEFAULT_PER_HOST,
+            processes=processes,
+            on_published=lambda name, outcome: shared.acquire_lease(BULK_INGEST_LEASE)
+        )
+    finally:
+        shared.release_lease(BULK_INGEST_LEASE)
+    print(format_stats(stats))
+    return stats['failed'] < stats['feeds']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch ICS timetables")
+    parser.add_argument('url', nargs='?', default=DEFAULT_URL, help="ICS URL (single feed to CSV)")
+    parser.add_argument('-o', '--output', default="stundenplan.csv", help="CSV file (single feed)")
+    parser.add_argument('--feeds', help="feeds file with '<name> <url>' lines: ingest all into the event store")
+    parser.add_argument('--db', default=DEFAULT_DB, help=f"event store database (default {DEFAULT_DB})")
+    parser.add_argument('--due', type=int, default=0, metavar='SECONDS',
+                        help="only feeds not fetched within SECONDS")
+    parser.add_argument('--concurrency', type=int, help="parallel downloads (default 16)")
+    parser.add_argument('--per-host', type=int, help="parallel downloads per server (default 8)")
+    parser.add_argument('--processes', type=int, help="parser processes (default one per CPU, 0 for none)")
+    args = parser.parse_args(argv)
+
+    if args.feeds:
+        return bulk_ingest(args.feeds, args.db, args.due, args.concurrency, args.per_host, args.processes)
+    return fetch_and_convert_to_csv(args.url, args.output)
+
+
 if __name__ == "__main__":
-    url = "https://isy-api.ksr.ch/pagdDownloadTimeTableIcal/dmbphs0g5i58gpwo7fxkja/timetable.ics"
-    fetch_and_convert_to_csv(url)
+    sys.exit(0 if main() else 1)
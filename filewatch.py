@@ -0,0 +1,186 @@
+"""
+File change tracking for the timetable source file
+
+A WatchedFile remembers the identity (mtime, size, inode) and content hash
+of the file version the cache was built from. On Linux, inotify tells us
+when the file was touched at all; elsewhere the file is stat-polled at most
+once per poll interval. The content hash is only computed when the stat
+identity changed, so unchanged files cost one stat call at most.
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time as time_module
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def file_identity(path):
+    """Return (mtime_ns, size, inode) of a file, or None if it doesn't exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def file_digest(path):
+    """SHA-256 of a file's content, read in chunks; None if it doesn't exist"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def atomic_write(path, write, binary=False, only_if_changed=False):
+    """
+    Write a file atomically
+
+    Calls write(f) with a temporary file in the same directory and renames
+    it over path once complete, so readers never see a half-written file.
+    With only_if_changed the existing file is left untouched when the new
+    content is identical. Returns True if path was replaced.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        if binary:
+            f = os.fdopen(fd, 'wb')
+        else:
+            f = os.fdopen(fd, 'w', newline='', encoding='utf-8')
+        with f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if only_if_changed and file_digest(tmp_path) == file_digest(path):
+            os.remove(tmp_path)
+            return False
+
+        # mkstemp creates 0600 files, keep the usual permissions instead
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class _InotifyWatcher:
+    """Background thread that reports inotify events for one file name in a directory"""
+
+    def __init__(self, directory, filename, callback):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        # Watch the directory, not the file: atomic renames replace the inode
+        mask = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+                IN_MOVED_TO | IN_CREATE | IN_DELETE)
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+        if wd < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+
+        self._filename = os.fsencode(filename)
+        self._callback = callback
+        thread = threading.Thread(target=self._run, name='inotify-watch', daemon=True)
+        thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                data = os.read(self._fd, 4096)
+            except OSError:
+                return
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if name == self._filename:
+                    self._callback()
+
+
+class WatchedFile:
+    """Tracks whether a file changed since the cache was last built from it"""
+
+    def __init__(self, path, poll_interval=1.0, use_inotify=True):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._identity = None
+        self._digest = None
+        self._acknowledged = False
+        self._dirty = threading.Event()
+        self._dirty.set()
+        self._last_poll = 0
+        self._inotify = None
+
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                directory = os.path.dirname(os.path.abspath(path))
+                self._inotify = _InotifyWatcher(directory, os.path.basename(path), self._dirty.set)
+            except (OSError, AttributeError) as e:
+                print(f"inotify not available, falling back to polling: {e}")
+
+    def current_state(self):
+        """Snapshot the file's identity and content hash"""
+        return file_identity(self.path), file_digest(self.path)
+
+    def acknowledge(self, state=None):
+        """Record the file version the cache was built from"""
+        if state is None:
+            state = self.current_state()
+        self._identity, self._digest = state
+        self._acknowledged = True
+
+    def changed(self):
+        """Return True if the file content differs from the acknowledged version"""
+        if not self._acknowledged:
+            return True
+
+        if self._inotify:
+            if not self._dirty.is_set():
+                return False
+        else:
+            now = time_module.monotonic()
+            if now - self._last_poll < self.poll_interval:
+                return False
+            self._last_poll = now
+        self._dirty.clear()
+
+        identity = file_identity(self.path)
+        if identity == self._identity:
+            return False
+
+        # Identity changed - only a different content hash counts as a change
+        digest = file_digest(self.path)
+        if digest == self._digest:
+            self._identity = identity
+            return False
+
+        # Keep reporting the change until it is acknowledged
+        self._dirty.set()
+        self._last_poll = 0
+        return True
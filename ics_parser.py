@@ -0,0 +1,77 @@
+"""
+Streaming ICS parser
+
+Parses VEVENTs line by line from any iterable, so uploads and downloads can
+be processed straight from their streams without loading the whole file
+into memory or saving a temporary copy first.
+"""
+from timeutil import format_csv_utc, parse_ics_utc
+
+# Column layout of uploads/timetable.csv
+CSV_FIELDNAMES = ["Subject", "Start Date", "Start Time", "End Date", "End Time", "Description", "Location"]
+
+
+def decode_lines(stream, progress=None):
+    """
+    Decode a binary stream into text lines
+    Calls progress(bytes_read) after each line if given
+    """
+    bytes_read = 0
+    for raw_line in stream:
+        bytes_read += len(raw_line)
+        if progress:
+            progress(bytes_read)
+        yield raw_line.decode('utf-8', errors='ignore')
+
+
+def unfold_lines(lines):
+    """Join folded ICS content lines (continuations start with a space or tab)"""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def iter_ics_events(lines):
+    """
+    Yield one dict per VEVENT with the fields the timetable uses:
+    Subject, UID, start_ts and end_ts (UTC epoch seconds, None if missing)
+    """
+    event = None
+    for line in unfold_lines(lines):
+        line = line.strip()
+        if line.startswith("BEGIN:VEVENT"):
+            event = {'Subject': '', 'UID': '', 'start_ts': None, 'end_ts': None}
+        elif event is None:
+            continue
+        elif line.startswith("SUMMARY:"):
+            event['Subject'] = line[8:]
+        elif line.startswith("UID:"):
+            event['UID'] = line[4:]
+        elif line.startswith("DTSTART:"):
+            event['start_ts'] = parse_ics_utc(line[8:])
+        elif line.startswith("DTEND:"):
+            event['end_ts'] = parse_ics_utc(line[6:])
+        elif line.startswith("END:VEVENT"):
+            # Only yield if event has data
+            if event['Subject'] or event['start_ts'] is not None:
+                yield event
+            event = None
+
+
+def event_to_csv_row(event):
+    """Convert a parsed ICS event into a timetable.csv row"""
+    row = {field: "" for field in CSV_FIELDNAMES}
+    row["Subject"] = event.get('Subject', '')
+    if event.get('start_ts') is not None:
+        row["Start Date"], row["Start Time"] = format_csv_utc(event['start_ts'])
+    if event.get('end_ts') is not None:
+        row["End Date"], row["End Time"] = format_csv_utc(event['end_ts'])
+    return row
@@ -0,0 +1,182 @@
+"""
+Timetable events from KSR feed entries
+
+build_event() turns a SUMMARY like "BIO sn 1Mf H1.03" and its UTC start/end
+into the event dict used everywhere: display name with the full subject,
+room, and the exam/cancelled/moved flags. event_from_ics(),
+event_from_csv_row() and row_to_event() do the same for parsed ICS entries,
+timetable.csv rows and event store rows. Kept apart from app.py so the bulk ingestion can classify
+feeds in worker processes without loading the web app.
+"""
+import re
+
+from timeutil import local_day, parse_csv_utc, to_local
+
+# Subject abbreviation mapping
+SUBJECT_MAPPING = {
+    'IF': 'Informatik',
+    'F': 'Französisch',
+    'MU': 'Musik',
+    'M': 'Mathematik',
+    'D': 'Deutsch',
+    'WR': 'Wirtschaft und Recht',
+    'SP05': 'Sport',
+    'BG08': 'Bildnerisches Gestalten',
+    'E': 'Englisch',
+    'GG': 'Geografie',
+    'BIO': 'Biologie',
+    'BIO1': 'Biologie',
+    'G': 'Geschichte',
+    'CH': 'Chemie',
+    'CH1': 'Chemie',
+    # Legacy mappings for sample data
+    'MA': 'Mathematik',
+    'DE': 'Deutsch',
+    'EN': 'Englisch',
+    'PH': 'Physik',
+    'IN': 'Informatik'
+}
+
+
+def get_subject_name(abbreviation):
+    """Convert subject abbreviation to full name"""
+    return SUBJECT_MAPPING.get(abbreviation, abbreviation)
+
+
+def build_event(summary, start_ts, end_ts, description='', location='', uid=''):
+    """
+    Build a timetable event from a KSR SUMMARY and UTC epoch start/end
+    Returns None for empty summaries
+    """
+    if not summary:
+        return None
+    
+    # Convert to Zurich time (DST-aware, offsets cached per day)
+    start_dt = to_local(start_ts)
+    end_dt = to_local(end_ts)
+    
+    # Parse KSR format: "SUBJECT TEACHER CLASS ROOM"
+    # Example: "BIO sn 1Mf H1.03" or "M sig 1Mf HL3.01 (Prüfung)"
+    subject_display = summary  # Default to full summary
+    
+    # Extract room from SUMMARY if LOCATION is empty
+    if not location and summary:
+        # Match KSR room format: 1-2 letters followed by digit(s).digit(s)
+        room_match = re.search(r'\b([A-Z]{1,2}\d+\.\d{2})\b', summary)
+        if room_match:
+            location = room_match.group(1)
+    
+    # Extract subject abbreviation (first word before any lowercase letters)
+    # Format: "SUBJECT teacher class ROOM" or "SUBJECT class ROOM"
+    parts = summary.split()
+    if len(parts) > 0:
+        # First part is usually the subject abbreviation (uppercase)
+        subject_abbr = parts[0]
+        
+        # Get full subject name
+        subject_name = get_subject_name(subject_abbr)
+        
+        # Build display name: "Subject (Room)" or just "Subject" if no room
+        if location:
+            subject_display = f"{subject_name} ({location})"
+        else:
+            subject_display = subject_name
+    
+    # Check if it's an exam:
+    # - Look for "(Prüfung)" anywhere in SUMMARY or DESCRIPTION
+    # - Note: teacher abbreviations like "klk" are NOT exam indicators
+    # - Note: "Nachprüfung" does NOT count as exam
+    is_exam = bool(('(prüfung)' in summary.lower() or 
+                    (description and '(prüfung)' in description.lower())) and
+                   'nachprüfung' not in summary.lower() and
+                   (not description or 'nachprüfung' not in description.lower()))
+    
+    # Check for special events (cancelled, etc.)
+    is_cancelled = any(keyword in summary.lower() or (description and keyword in description.lower()) 
+                     for keyword in ['ausgefallen', 'cancelled', 'abgesagt', 'entfällt'])
+    
+    special_note = ''
+    if is_cancelled:
+        special_note = 'Ausgefallen'
+    elif 'verschoben' in summary.lower() or (description and 'verschoben' in description.lower()):
+        special_note = 'Verschoben'
+    elif 'raumwechsel' in summary.lower() or (description and 'raumwechsel' in description.lower()):
+        special_note = 'Raumwechsel'
+    
+    return {
+        'summary': subject_display,
+        'original_summary': summary,  # Keep original for reference
+        'uid': uid,
+        'start': start_dt,
+        'end': end_dt,
+        'start_ts': start_ts,
+        'end_ts': end_ts,
+        # Local day for the weekly buckets
+        'day': local_day(start_ts),
+        'description': description if description and description != 'None' else '',
+        'location': location,
+        'is_exam': is_exam,
+        'is_cancelled': is_cancelled,
+        'special_note': special_note
+    }
+
+
+def event_from_ics(ics_event):
+    """Timetable event for a VEVENT from ics_parser.iter_ics_events, None without start or summary"""
+    start_ts = ics_event['start_ts']
+    if start_ts is None:
+        return None
+    end_ts = ics_event['end_ts'] if ics_event['end_ts'] is not None else start_ts
+    return build_event(ics_event['Subject'].strip(), start_ts, end_ts, uid=ics_event['UID'])
+
+
+def event_from_csv_row(row):
+    """Timetable event for a timetable.csv row (times in UTC), None without subject or start"""
+    summary = (row.get('Subject') or '').strip()
+    start_date, start_time = (row.get('Start Date') or '').strip(), (row.get('Start Time') or '').strip()
+    if not summary or not start_date or not start_time:
+        return None
+    start_ts = parse_csv_utc(start_date, start_time)
+    end_date, end_time = (row.get('End Date') or '').strip(), (row.get('End Time') or '').strip()
+    end_ts = parse_csv_utc(end_date, end_time) if end_date and end_time else start_ts
+    return build_event(
+        summary, start_ts, end_ts,
+        description=(row.get('Description') or '').strip(),
+        location=(row.get('Location') or '').strip()
+    )
+
+
+def row_to_event(row):
+    """Turn an event store row (see event_store.COLUMNS) into a timetable event"""
+    (_key, uid, original_summary, summary, start_ts, end_ts,
+     description, location, is_exam, is_cancelled, special_note) = row
+    return {
+        'summary': summary,
+        'original_summary': original_summary,
+        'uid': uid,
+        'start': to_local(start_ts),
+        'end': to_local(end_ts),
+        'start_ts': start_ts,
+        'end_ts': end_ts,
+        'day': local_day(start_ts),
+        'description': description,
+        'location': location,
+        'is_exam': bool(is_exam),
+        'is_cancelled': bool(is_cancelled),
+        'special_note': special_note
+    }
+
+
+def subject_filter(subjects):
+    """
+    Predicate for events of any of the given subjects
+    A subject matches by abbreviation ("M") or full name ("Mathematik"), case-insensitive.
+    """
+    wanted = {subject.strip().casefold() for subject in subjects if subject.strip()}
+
+    def matches(event):
+        parts = event['original_summary'].split()
+        abbreviation = parts[0] if parts else ''
+        return (abbreviation.casefold() in wanted or
+                get_subject_name(abbreviation).casefold() in wanted)
+    return matches
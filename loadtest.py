@@ -0,0 +1,475 @@
+"""
+Load test against local stand-ins for ISY, the ICS feed and OpenWeather
+
+    python loadtest.py --users 50 --duration 60
+    python loadtest.py --server asgi --latency isy=400 --error-rate weather=0.2
+
+Starts one mock server that implements the upstream endpoints app.py uses
+(ISY authentication_token, GraphQL messages queries and mark mutation, the
+ICS download, OpenWeather /data/2.5/weather) with configurable latency,
+error rate and payload sizes. The app runs in a subprocess with a temporary uploads
+directory, wired to the mock, so neither the real services nor the local
+timetable data are touched. Virtual students then log in to ISY and click
+through a weighted mix of routes; the report lists throughput and
+p50/p95/p99 latency per route and the number of upstream calls.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time as time_module
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import jwt
+import requests
+
+SERVICES = ('isy', 'ics', 'weather')
+
+# Lessons of the mock timetable: (subject, teacher, room)
+LESSONS = (
+    ('M', 'sig', 'HL3.01'), ('D', 'mur', 'HR3.06'), ('E', 'kel', 'HR2.04'), ('F', 'bru', 'HR2.11'),
+    ('GG', 'sig', 'P1.09'), ('B', 'hub', 'N2.03'), ('C', 'wal', 'N1.07'), ('PH', 'fis', 'N3.01'),
+    ('G', 'zim', 'HR1.02'), ('BG', 'lan', 'K0.05'), ('SP', 'gra', 'TH1'), ('IN', 'roh', 'HL1.12')
+)
+LESSON_STARTS = ((7, 40), (8, 30), (9, 25), (10, 25), (11, 15), (13, 0), (13, 50), (14, 45), (15, 35))
+SEARCH_TERMS = ('mathe', 'deutsch', 'prüfung', 'hl3', 'chemie', 'englisch', 'physik', 'sig')
+
+# Virtual student behaviour: (route name, weight, method, path)
+TRAFFIC_MIX = (
+    ('index', 10, 'GET', '/'),
+    ('timetable', 30, 'GET', '/api/timetable'),
+    ('dashboard', 10, 'GET', '/api/dashboard'),
+    ('weather', 8, 'GET', '/api/weather'),
+    ('weekly', 8, 'GET', '/api/weekly'),
+    ('search', 7, 'GET', '/api/search?q={term}'),
+    ('isy_status', 5, 'GET', '/api/isy/status'),
+    ('isy_messages', 11, 'GET', '/api/isy/messages'),
+    ('isy_dashboard_messages', 11, 'GET', '/api/isy/dashboard-messages'),
+    ('isy_message', 6, 'GET', '/api/isy/message/{message}'),
+    ('isy_mark', 3, 'POST', '/api/isy/messages/mark')
+)
+
+
+class MockConfig:
+    """Latency (ms), error rate and payload sizes of the mock upstreams"""
+
+    def __init__(self, latency, error_rate, events, messages, body_size):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.events = events
+        self.messages = messages
+        self.body_size = body_size
+        self.calls = {service: 0 for service in SERVICES}
+        self.failures = {service: 0 for service in SERVICES}
+        self._lock = threading.Lock()
+        self._ics = None
+
+    def count(self, service, failed):
+        with self._lock:
+            self.calls[service] += 1
+            if failed:
+                self.failures[service] += 1
+
+    def ics(self):
+        """ICS feed with events spread over the weeks around today (built once)"""
+        if self._ics is None:
+            rng = random.Random(1)
+            today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            first_day = today - timedelta(days=today.weekday() + 7)
+            school_days = [first_day + timedelta(days=d) for d in range(35) if d % 7 < 5]
+            lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//SuperGUI//Lasttest//DE']
+            for i in range(self.events):
+                day = school_days[(i // len(LESSON_STARTS)) % len(school_days)]
+                hour, minute = LESSON_STARTS[i % len(LESSON_STARTS)]
+                # Timestamps are UTC in the feed; Zurich is one or two hours ahead
+                start = day + timedelta(hours=hour - 1, minutes=minute)
+                subject, teacher, room = rng.choice(LESSONS)
+                summary = f"{subject} {teacher} 1Mf {room}"
+                if rng.random() < 0.03:
+                    summary += ' (Prüfung)'
+                lines += [
+                    'BEGIN:VEVENT',
+                    f"UID:loadtest{i}@ksr.ch",
+                    f"DTSTART:{start:%Y%m%dT%H%M%SZ}",
+                    f"DTEND:{start + timedelta(minutes=45):%Y%m%dT%H%M%SZ}",
+                    f"SUMMARY:{summary}",
+                    'END:VEVENT'
+                ]
+            lines.append('END:VCALENDAR')
+            self._ics = '\r\n'.join(lines).encode('utf-8')
+        return self._ics
+
+
+# Messages don't change during a run (lastContentChange stays the same)
+_MOCK_NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _isy_message(i, body_size):
+    text = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * (body_size // 57 + 1))[:body_size]
+    modified = (_MOCK_NOW - timedelta(hours=i)).isoformat()
+    return {
+        'id': f"/messages/{1000 + i}",
+        '_id': 1000 + i,
+        'title': f"Mitteilung {i}",
+        'calculatedExtendedTitleShort': f"Mitteilung {i}",
+        'subject': f"Betreff {i}",
+        'body': text,
+        'previewText': text[:200],
+        'priority': random.choice(('LOW', 'NORMAL', 'NORMAL', 'HIGH')),
+        'status': 'PUBLISHED',
+        'visibleTo': None,
+        'iHaveReadIt': i % 3 == 0,
+        'modified': modified,
+        'lastContentChange': modified,
+        'dtDue': None,
+        'primaryAuthor': {'person': {'firstname': 'Lehr', 'lastname': f"Person {i % 7}"}},
+        'me': {'id': f"/message_mes/{1000 + i}", 'seenWhen': modified if i % 2 else None,
+               'readWhen': None, 'completedWhen': None}
+    }
+
+
+# What isy_state_mutation_flow reads from ISY's schema
+_MOCK_SCHEMA = {
+    'message': {'fields': [
+        {'name': 'id', 'type': {'name': None, 'ofType': {'name': 'ID', 'ofType': None}}},
+        {'name': 'me', 'type': {'name': 'MessageMe', 'ofType': None}}
+    ]},
+    'schema': {'mutationType': {'fields': [
+        {'name': 'updateMessageMe', 'type': {
+            'name': 'updateMessageMePayload', 'ofType': None,
+            'fields': [{'name': 'messageMe'}, {'name': 'clientMutationId'}]
+        }}
+    ]}}
+}
+
+
+def _mock_mark(variables):
+    """Answer markMessages: every alias m<i> returns the updated state"""
+    data = {}
+    for name, value in variables.items():
+        if name[1:].isdigit():
+            state = {'id': value, 'readWhen': None, 'seenWhen': None, 'completedWhen': None}
+            for field in ('readWhen', 'seenWhen', 'completedWhen'):
+                if f'{name}{field}' in variables:
+                    state[field] = variables[f'{name}{field}']
+            data[name] = {'messageMe': state}
+    return data
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """ISY, ICS and OpenWeather endpoints as used by app.py"""
+
+    protocol_version = 'HTTP/1.1'
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _service(self):
+        path = urlsplit(self.path).path
+        if path in ('/authentication_token', '/graphql'):
+            return 'isy'
+        if path.endswith('.ics'):
+            return 'ics'
+        if path == '/data/2.5/weather':
+            return 'weather'
+        return None
+
+    def _send(self, status, body, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request_body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+        service = self._service()
+        if service is None:
+            self._send(404, {'error': 'not found'})
+            return
+
+        config = self.config
+        latency = config.latency.get(service, 0) / 1000
+        time_module.sleep(random.uniform(0.5 * latency, 1.5 * latency))
+        failed = random.random() < config.error_rate.get(service, 0)
+        config.count(service, failed)
+        if failed:
+            self._send(503, {'error': 'mock failure'})
+            return
+
+        if service == 'ics':
+            self._send(200, config.ics(), 'text/calendar; charset=utf-8')
+        elif service == 'weather':
+            self._send(200, {
+                'main': {'temp': 11.4, 'feels_like': 9.8, 'humidity': 71},
+                'weather': [{'description': 'leichter Regen', 'icon': '10d'}],
+                'wind': {'speed': 3.6}
+            })
+        elif self.path.startswith('/authentication_token'):
+            username = request_body.get('loginid', 'student')
+            token = jwt.encode({'username': username, 'exp': int(time_module.time()) + 3600},
+                               'supergui-loadtest-mock-signing-key', algorithm='HS256')
+            self._send(200, {'token': token})
+        elif request_body.get('operationName') == 'stateMutation':
+            self._send(200, {'data': _MOCK_SCHEMA})
+        elif request_body.get('operationName') == 'messageStates':
+            self._send(200, {'data': {
+                alias: {'id': iri, 'me': {'id': iri.replace('/messages/', '/message_mes/')}}
+                for alias, iri in request_body['variables'].items()
+            }})
+        elif request_body.get('operationName') == 'markMessages':
+            self._send(200, {'data': _mock_mark(request_body['variables'])})
+        elif request_body.get('operationName') == 'getMessage':
+            number = int(request_body['variables']['id'].rsplit('/', 1)[-1])
+            self._send(200, {'data': {'message': _isy_message(number - 1000, config.body_size)}})
+        else:
+            # Like ISY, only send the body when the query asks for it
+            with_body = 'body' in request_body.get('query', '')
+            edges = [{'node': _isy_message(i, config.body_size)} for i in range(config.messages)]
+            for edge in edges:
+                if not with_body:
+                    del edge['node']['body']
+            self._send(200, {'data': {'messages': {'totalCount': len(edges), 'edges': edges}}})
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+def start_mock_server(config):
+    """Start the mock upstreams in a background thread and return the server"""
+    handler = type('Handler', (MockHandler,), {'config': config})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_app(port, mock_url, server):
+    """Run the app wired to the mock upstreams (called in the app subprocess)"""
+    import app as supergui
+    supergui.app.config['ICS_URL'] = f"{mock_url}/pagdDownloadTimeTableIcal/loadtest/timetable.ics"
+    supergui.ISY_API_URL = f"{mock_url}/graphql"
+    supergui.ISY_AUTH_URL = f"{mock_url}/authentication_token"
+    supergui.OPENWEATHER_URL = f"{mock_url}/data/2.5/weather"
+    supergui.OPENWEATHER_API_KEY = 'loadtest'
+    if server == 'asgi':
+        import uvicorn
+        from asgi import application
+        uvicorn.run(application, host='127.0.0.1', port=port, log_level='warning')
+    else:
+        from werkzeug.serving import run_simple
+        run_simple('127.0.0.1', port, supergui.app, threaded=True)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(mock_url, server, workdir):
+    """Start the app subprocess and wait until it answers; returns (process, base_url)"""
+    port = _free_port()
+    repo = os.path.dirname(os.path.abspath(__file__))
+    # The app writes static/dist and static/fast_timetable.json; give it its own
+    # copy so the mock lessons never end up in the checkout's static folder
+    static_copy = os.path.join(workdir, 'static')
+    shutil.copytree(os.path.join(repo, 'static'), static_copy,
+                    ignore=shutil.ignore_patterns('dist', 'fast_timetable.json'))
+    env = dict(os.environ, PYTHONPATH=repo, FLASK_ENV='production', STATIC_FOLDER=static_copy)
+    log = open(os.path.join(workdir, 'app.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve-app', str(port), mock_url, server],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time_module.monotonic() + 60
+    while time_module.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode}, see {log.name}")
+        try:
+            requests.get(f"{base_url}/api/isy/status", timeout=1)
+            return process, base_url
+        except requests.exceptions.RequestException:
+            time_module.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"App did not start within 60s, see {log.name}")
+
+
+class Results:
+    """Latencies per route, collected from all virtual users"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def virtual_user(number, base_url, results, stop_at, think_time):
+    """One student: log in to ISY, then request routes from TRAFFIC_MIX until stop_at"""
+    http = requests.Session()
+    names = [entry[0] for entry in TRAFFIC_MIX]
+    weights = [entry[1] for entry in TRAFFIC_MIX]
+    routes = {entry[0]: entry for entry in TRAFFIC_MIX}
+
+    def send(route, method, path, **kwargs):
+        started = time_module.perf_counter()
+        try:
+            response = http.request(method, base_url + path, timeout=30, **kwargs)
+            ok = response.status_code < 400
+        except requests.exceptions.RequestException:
+            ok = False
+        results.record(route, time_module.perf_counter() - started, ok)
+
+    send('isy_login', 'POST', '/api/isy/login',
+         json={'username': f"schueler{number}", 'password': 'loadtest'})
+    while time_module.monotonic() < stop_at:
+        name = random.choices(names, weights)[0]
+        _name, _weight, method, path = routes[name]
+        # Opened (and marked) messages: one of the ten shown on the dashboard
+        message = 1000 + random.randrange(10)
+        body = {'updates': [{'id': message, 'read': True, 'seen': True}]} if method == 'POST' else None
+        send(name, method, path.format(term=random.choice(SEARCH_TERMS), message=message), json=body)
+        time_module.sleep(random.expovariate(1 / think_time) if think_time > 0 else 0)
+
+
+def run_load(base_url, users, duration, ramp_up, think_time):
+    """Run the virtual users and return (results, elapsed seconds)"""
+    results = Results()
+    started = time_module.monotonic()
+    stop_at = started + ramp_up + duration
+    threads = []
+    for number in range(users):
+        thread = threading.Thread(target=virtual_user, daemon=True,
+                                  args=(number, base_url, results, stop_at, think_time))
+        threads.append(thread)
+        thread.start()
+        if ramp_up:
+            time_module.sleep(ramp_up / users)
+    for thread in threads:
+        thread.join()
+    return results, time_module.monotonic() - started
+
+
+def summarize(results, elapsed, mock):
+    """Per-route statistics (milliseconds) and upstream call counts"""
+    routes = {}
+    for route, values in sorted(results.latencies.items()):
+        values.sort()
+        routes[route] = {
+            'requests': len(values),
+            'errors': results.errors.get(route, 0),
+            'rps': round(len(values) / elapsed, 2),
+            'p50': round(percentile(values, 50) * 1000, 1),
+            'p95': round(percentile(values, 95) * 1000, 1),
+            'p99': round(percentile(values, 99) * 1000, 1),
+            'max': round(values[-1] * 1000, 1)
+        }
+    total = sum(r['requests'] for r in routes.values())
+    return {
+        'elapsed': round(elapsed, 1),
+        'requests': total,
+        'rps': round(total / elapsed, 2),
+        'routes': routes,
+        'upstream_calls': dict(mock.calls),
+        'upstream_failures': dict(mock.failures)
+    }
+
+
+def print_report(summary):
+    print(f"\n{summary['requests']} requests in {summary['elapsed']}s ({summary['rps']} req/s)\n")
+    print(f"{'route':<24}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for route, r in summary['routes'].items():
+        print(f"{route:<24}{r['requests']:>9}{r['errors']:>8}{r['rps']:>9}"
+              f"{r['p50']:>9}{r['p95']:>9}{r['p99']:>9}{r['max']:>9}")
+    print('\nupstream calls: ' + ', '.join(
+        f"{s} {summary['upstream_calls'][s]} ({summary['upstream_failures'][s]} failed)" for s in SERVICES
+    ))
+
+
+def _per_service(values, name):
+    """Parse ['300', 'isy=500'] into {service: float}: plain numbers apply to all services"""
+    result = {service: 0.0 for service in SERVICES}
+    for value in values or []:
+        service, _, number = value.rpartition('=')
+        if service and service not in SERVICES:
+            raise argparse.ArgumentTypeError(f"{name}: unknown service {service!r}")
+        for target in ([service] if service else SERVICES):
+            result[target] = float(number)
+    return result
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--serve-app':
+        serve_app(int(sys.argv[2]), sys.argv[3], sys.argv[4])
+        return
+
+    parser = argparse.ArgumentParser(description='Load test SuperGUI against mock upstreams')
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual students')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of full load')
+    parser.add_argument('--ramp-up', type=float, default=5, help='seconds to start all users')
+    parser.add_argument('--think-time', type=float, default=1.0, help='mean pause between requests')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+                        help='threaded WSGI server or uvicorn with asgi.py')
+    parser.add_argument('--latency', action='append', metavar='[SERVICE=]MS',
+                        help='mock latency in ms, e.g. 200 or isy=400 (default isy=300 ics=800 weather=150)')
+    parser.add_argument('--error-rate', action='append', metavar='[SERVICE=]RATE',
+                        help='share of failing mock calls, e.g. 0.05 or weather=0.2')
+    parser.add_argument('--events', type=int, default=600, help='events in the ICS feed')
+    parser.add_argument('--messages', type=int, default=60, help='messages per ISY query')
+    parser.add_argument('--body-size', type=int, default=1500, help='characters per ISY message body')
+    parser.add_argument('--json', metavar='FILE', help='also write the summary as JSON')
+    args = parser.parse_args()
+
+    latency = _per_service(args.latency or ['isy=300', 'ics=800', 'weather=150'], 'latency')
+    mock = MockConfig(latency, _per_service(args.error_rate, 'error-rate'),
+                      args.events, args.messages, args.body_size)
+    mock_server = start_mock_server(mock)
+    mock_url = f"http://127.0.0.1:{mock_server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory(prefix='supergui-loadtest-') as workdir:
+        process, base_url = start_app(mock_url, args.server, workdir)
+        print(f"App ({args.server}) on {base_url}, mocks on {mock_url}, "
+              f"{args.users} users for {args.duration}s")
+        try:
+            results, elapsed = run_load(base_url, args.users, args.duration, args.ramp_up, args.think_time)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+            mock_server.shutdown()
+
+    summary = summarize(results, elapsed, mock)
+    print_report(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
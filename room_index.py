@@ -0,0 +1,113 @@
+"""
+Room occupancy index over all timetable feeds in the event store
+
+Every room has its bookings as parallel arrays sorted by start time. A
+booking is one (start, end) slot in a room; the same lesson in the feeds
+of a whole class is a single booking that counts the feeds it appears in.
+Cancelled lessons don't occupy a room.
+
+"Is the room busy between a and b" is a binary search for the first
+booking starting at or after b, followed by a short backwards scan over
+the bookings that start less than the room's longest booking before a.
+That keeps queries at O(rooms * log bookings) no matter how many feeds
+are loaded.
+
+The index is built from the event store once and then kept current room
+by room: every snapshot logs the rooms it touched (EventStore.room_updates),
+and only those rooms are reloaded. This works across workers, since each
+worker follows the same log.
+"""
+from bisect import bisect_left
+import threading
+
+
+class RoomIndex:
+    """Per-room sorted booking arrays, reloaded one room at a time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {}   # room -> (starts, ends, bookings, longest)
+        self._names = {}   # casefolded name -> room
+        self.cursor = None  # last room update applied, None before the first build
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def rooms(self):
+        """All known room names, sorted"""
+        return sorted(self._rooms)
+
+    def find(self, name):
+        """Room name as stored for a case-insensitive name, None if unknown"""
+        return self._names.get(name.strip().casefold())
+
+    @staticmethod
+    def _entry(bookings):
+        starts = [booking[0] for booking in bookings]
+        ends = [booking[1] for booking in bookings]
+        longest = max(end - start for start, end in zip(starts, ends))
+        return starts, ends, bookings, longest
+
+    def set_room(self, room, bookings):
+        """Replace a room's bookings: (start_ts, end_ts, summary, original_summary, feeds) sorted by start"""
+        entry = self._entry(bookings) if bookings else None
+        with self._lock:
+            if entry is None:
+                self._rooms.pop(room, None)
+                self._names.pop(room.casefold(), None)
+            else:
+                self._rooms[room] = entry
+                self._names[room.casefold()] = room
+
+    def load(self, rows, cursor):
+        """Replace the whole index with rows of (room, start_ts, end_ts, summary, original_summary, feeds)"""
+        by_room = {}
+        for room, *booking in rows:
+            by_room.setdefault(room, []).append(tuple(booking))
+        rooms = {room: self._entry(bookings) for room, bookings in by_room.items()}
+        with self._lock:
+            self._rooms = rooms
+            self._names = {room.casefold(): room for room in rooms}
+            self.cursor = cursor
+
+    def _busy(self, room, start, end):
+        """First booking of room overlapping [start, end), None if the room is free"""
+        starts, ends, bookings, longest = self._rooms[room]
+        # Only bookings starting before end and after start - longest can overlap
+        i = bisect_left(starts, end) - 1
+        while i >= 0 and starts[i] > start - longest:
+            if ends[i] > start:
+                return bookings[i]
+            i -= 1
+        return None
+
+    def _next_start(self, room, ts):
+        """Start of the room's first booking at or after ts, None if there is none"""
+        starts = self._rooms[room][0]
+        i = bisect_left(starts, ts)
+        return starts[i] if i < len(starts) else None
+
+    def free_rooms(self, start, end=None):
+        """
+        Rooms free during [start, end) (at the instant start if end is None)
+        Returns (free, occupied): free as (room, free_until or None),
+        occupied as (room, booking), both sorted by room.
+        """
+        end = start + 1 if end is None or end <= start else end
+        free, occupied = [], []
+        with self._lock:
+            for room in sorted(self._rooms):
+                booking = self._busy(room, start, end)
+                if booking is None:
+                    free.append((room, self._next_start(room, end)))
+                else:
+                    occupied.append((room, booking))
+        return free, occupied
+
+    def schedule(self, room, start, end):
+        """Bookings of room overlapping [start, end), sorted by start"""
+        with self._lock:
+            starts, ends, bookings, longest = self._rooms[room]
+            first = bisect_left(starts, start - longest)
+            last = bisect_left(starts, end)
+            return [bookings[i] for i in range(first, last) if ends[i] > start]
@@ -0,0 +1,210 @@
+"""
+In-memory full-text search over lessons and ISY messages
+
+Documents are indexed into an inverted index (token -> {doc_id: weight}).
+Tokenization is German-aware: umlauts and their ae/oe/ue spellings fold
+to the same token, common German and English stopwords are dropped and
+simple plural/inflection suffixes are stripped. Query terms also match
+as prefixes, so "chem" finds "Chemie".
+
+Documents are grouped (e.g. all lessons, or one user's ISY inbox) and each
+group is synced incrementally: only added, changed or removed documents
+touch the index. When the changed documents are already known (e.g. from
+the timetable change feed), patch_group() skips comparing the whole group.
+"""
+from bisect import bisect_left
+import heapq
+import math
+import re
+import threading
+import unicodedata
+
+STOPWORDS = frozenset("""
+der die das den dem des ein eine einer eines einem einen und oder aber im in am an auf aus bei mit
+nach von vor zu zum zur fur uber unter ist sind war wird werden wann wo wie was wer welche welcher
+welches ich du er sie es wir ihr mein meine dein deine nachste nachsten nachster nicht noch
+auch nur schon gibt gab hat habe hatte um als so da dass
+the a an and or of to in on at for is are was be when where what which who how my your next that this
+""".split())
+
+# Suffixes stripped by the stemmer, longest first
+_SUFFIXES = ('ern', 'en', 'er', 'es', 'em', 'e', 'n', 's')
+_MIN_STEM = 4
+_TOKEN_RE = re.compile(r'[a-z0-9]+(?:\.[a-z0-9]+)*')
+_FOLD = str.maketrans({'ä': 'a', 'ö': 'o', 'ü': 'u', 'ß': 'ss', 'é': 'e', 'è': 'e', 'à': 'a'})
+_DIGRAPHS = (('ae', 'a'), ('oe', 'o'), ('ue', 'u'))
+# Prefix matches score lower than exact matches and are capped per term
+PREFIX_FACTOR = 0.5
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def normalize(text):
+    """Lowercase and fold umlauts and their digraph spellings"""
+    text = unicodedata.normalize('NFKC', text).casefold().translate(_FOLD)
+    for digraph, letter in _DIGRAPHS:
+        text = text.replace(digraph, letter)
+    return text
+
+
+def stem(token):
+    """Strip a common German/English inflection suffix"""
+    if token[0].isdigit():
+        return token
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    """Split text into normalized, stemmed tokens without stopwords"""
+    if not text:
+        return []
+    return [stem(t) for t in _TOKEN_RE.findall(normalize(text)) if t not in STOPWORDS]
+
+
+class SearchIndex:
+    """Inverted index with incremental per-group updates"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}      # token -> {doc_id: weight}
+        self._docs = {}          # doc_id -> (signature, tokens, payload, rank_time, owner)
+        self._groups = {}        # group -> set of doc_ids
+        self._vocabulary = None  # sorted token list for prefix lookups, rebuilt lazily
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _add(self, doc_id, signature, fields, payload, rank_time, owner):
+        weights = {}
+        for text, field_weight in fields:
+            for token in tokenize(text):
+                weights[token] = weights.get(token, 0) + field_weight
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._vocabulary = None
+            postings[doc_id] = weight
+        self._docs[doc_id] = (signature, tuple(weights), payload, rank_time, owner)
+
+    def _remove(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for token in doc[1]:
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[token]
+                    self._vocabulary = None
+
+    def sync_group(self, group, docs, owner=None):
+        """
+        Make a group contain exactly docs and return the number of changed documents
+
+        docs maps doc_id -> (fields, payload, rank_time), where fields is a
+        list of (text, weight). Unchanged documents are left alone.
+        """
+        changed = 0
+        with self._lock:
+            old_ids = self._groups.get(group, set())
+            for doc_id in old_ids - docs.keys():
+                self._remove(doc_id)
+                changed += 1
+            for doc_id, (fields, payload, rank_time) in docs.items():
+                changed += self._put(doc_id, fields, payload, rank_time, owner)
+            self._groups[group] = set(docs)
+        return changed
+
+    def patch_group(self, group, docs, removed=(), owner=None):
+        """
+        Add or replace only the given documents of a group and drop the removed
+        doc_ids; the rest of the group is left alone. Returns the number of
+        changed documents.
+        """
+        changed = 0
+        with self._lock:
+            members = self._groups.setdefault(group, set())
+            for doc_id in removed:
+                if doc_id in members and doc_id not in docs:
+                    members.discard(doc_id)
+                    self._remove(doc_id)
+                    changed += 1
+            for doc_id, (fields, payload, rank_time) in docs.items():
+                changed += self._put(doc_id, fields, payload, rank_time, owner)
+                members.add(doc_id)
+        return changed
+
+    def _put(self, doc_id, fields, payload, rank_time, owner):
+        """Index a document unless it is unchanged; returns 1 if it was (re)indexed"""
+        signature = (tuple(fields), rank_time)
+        existing = self._docs.get(doc_id)
+        if (existing is not None and existing[0] == signature
+                and existing[2] == payload and existing[4] == owner):
+            return 0
+        self._remove(doc_id)
+        self._add(doc_id, signature, fields, payload, rank_time, owner)
+        return 1
+
+    def _expand(self, term):
+        """Exact token plus tokens the term is a prefix of"""
+        matches = []
+        if term in self._postings:
+            matches.append((term, 1.0))
+        if len(term) >= 2:
+            if self._vocabulary is None:
+                self._vocabulary = sorted(self._postings)
+            vocabulary = self._vocabulary
+            i = bisect_left(vocabulary, term)
+            expansions = 0
+            while i < len(vocabulary) and vocabulary[i].startswith(term) and expansions < MAX_PREFIX_EXPANSIONS:
+                if vocabulary[i] != term:
+                    matches.append((vocabulary[i], PREFIX_FACTOR))
+                    expansions += 1
+                i += 1
+        return matches
+
+    def search(self, query, now, owner=None, limit=20):
+        """
+        Rank documents for a query
+
+        Score is the sum of idf-weighted field weights per matched term,
+        scaled by the share of query terms matched. Ties go to upcoming
+        documents (soonest first), then to past ones (most recent first).
+        Documents with an owner are only visible to that owner.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            total_docs = len(self._docs) or 1
+            scores = {}
+            matched = {}
+            for term in dict.fromkeys(terms):
+                seen = set()
+                for token, factor in self._expand(term):
+                    postings = self._postings[token]
+                    idf = math.log(1 + total_docs / len(postings))
+                    for doc_id, weight in postings.items():
+                        scores[doc_id] = scores.get(doc_id, 0.0) + weight * idf * factor
+                        seen.add(doc_id)
+                for doc_id in seen:
+                    matched[doc_id] = matched.get(doc_id, 0) + 1
+
+            term_count = len(set(terms))
+            results = []
+            for doc_id, score in scores.items():
+                _signature, _tokens, payload, rank_time, doc_owner = self._docs[doc_id]
+                if doc_owner is not None and doc_owner != owner:
+                    continue
+                score *= matched[doc_id] / term_count
+                upcoming = rank_time is not None and rank_time >= now
+                time_key = (rank_time - now) if upcoming else (now - (rank_time or 0))
+                results.append((-score, not upcoming, time_key, doc_id, payload))
+
+        top = heapq.nsmallest(limit, results, key=lambda r: r[:4])
+        return [dict(r[4], score=round(-r[0], 3)) for r in top]
@@ -0,0 +1,136 @@
+"""
+Timetable cache shared between worker processes
+
+With several gunicorn workers, every worker used to fetch the ICS feed and
+write uploads/timetable.csv on its own. The shared cache keeps the version
+of the current timetable snapshot in an SQLite database in WAL mode, so
+readers never block the writer, plus a refresh lease: only the worker
+holding the lease fetches upstream and writes the CSV, all others just pick
+up the new snapshot. The events themselves live in the same database (see
+event_store.py) and are published in the same transaction as the version.
+"""
+from contextlib import contextmanager
+import os
+import socket
+import sqlite3
+import threading
+import time as time_module
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS timetable_snapshot (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    source_digest TEXT
+);
+CREATE TABLE IF NOT EXISTS refresh_lease (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+INSERT OR IGNORE INTO timetable_snapshot (id, version, fetched_at) VALUES (1, 0, 0);
+"""
+
+
+def connect(db_path):
+    """Open an SQLite connection configured for concurrent multi-process use"""
+    conn = sqlite3.connect(db_path, timeout=10, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=10000')
+    return conn
+
+
+class SharedTimetableCache:
+    """Versioned timetable snapshot plus a refresh lease, stored in SQLite"""
+
+    def __init__(self, db_path, lease_seconds=60):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        """One connection per thread (and per process, connections don't survive fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.db_path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def owner_id():
+        """Identify this worker process"""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def read_meta(self):
+        """Return (version, fetched_at, source_digest) of the current snapshot"""
+        return self.connection().execute(
+            'SELECT version, fetched_at, source_digest FROM timetable_snapshot WHERE id = 1'
+        ).fetchone()
+
+    @contextmanager
+    def transaction(self):
+        """Run statements in one write transaction, yields the connection"""
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def bump_version(conn, source_digest=None, fetched_at=None):
+        """Mark a new snapshot as published (inside transaction()), returns the version"""
+        conn.execute(
+            'UPDATE timetable_snapshot SET version = version + 1, '
+            'fetched_at = COALESCE(?, fetched_at), source_digest = ? WHERE id = 1',
+            (fetched_at, source_digest)
+        )
+        return conn.execute('SELECT version FROM timetable_snapshot WHERE id = 1').fetchone()[0]
+
+    @staticmethod
+    def update_meta(conn, source_digest=None, fetched_at=None):
+        """Record the source of an unchanged snapshot without a new version (inside transaction())"""
+        conn.execute(
+            'UPDATE timetable_snapshot SET fetched_at = COALESCE(?, fetched_at), source_digest = ? WHERE id = 1',
+            (fetched_at, source_digest)
+        )
+        return conn.execute('SELECT version FROM timetable_snapshot WHERE id = 1').fetchone()[0]
+
+    def mark_fetched(self, fetched_at):
+        """Record an upstream fetch attempt without changing the snapshot"""
+        self.connection().execute('UPDATE timetable_snapshot SET fetched_at = ? WHERE id = 1', (fetched_at,))
+
+    def acquire_lease(self, name='refresh'):
+        """
+        Try to become the refresher for the next lease_seconds
+        Never blocks on other workers; returns True if this process holds the lease
+        """
+        owner = self.owner_id()
+        now = time_module.time()
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT owner, expires FROM refresh_lease WHERE name = ?', (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO refresh_lease (name, owner, expires) VALUES (?, ?, ?)',
+                (name, owner, now + self.lease_seconds)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return True
+
+    def release_lease(self, name='refresh'):
+        """Give up the lease so the next worker can refresh right away"""
+        self.connection().execute(
+            'DELETE FROM refresh_lease WHERE name = ? AND owner = ?', (name, self.owner_id())
+        )
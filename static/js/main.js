@@ -7,11 +7,15 @@ let notifiedExams = new Set();
 // Load translations
 async function loadTranslations(lang) {
     try {
-        const response = await fetch(`/static/lang/${lang}.json`);
+        // Content-hashed URLs from the template, plain path as fallback
+        const url = (window.LANG_URLS && window.LANG_URLS[lang]) || `/static/lang/${lang}.json`;
+        const response = await fetch(url);
         translations = await response.json();
         currentLanguage = lang;
         updatePageLanguage();
         localStorage.setItem('language', lang);
+        // Lets the server preload the right translation file
+        document.cookie = `language=${lang}; path=/; max-age=31536000; SameSite=Lax`;
     } catch (error) {
         console.error('Error loading translations:', error);
     }
@@ -126,15 +130,272 @@ function checkExamNotifications(exams) {
     });
 }
 
+// Client Scheduler
+// One timer for all periodic work instead of an interval per task.
+// Ticks are aligned to the start of each second (clock, countdowns) and
+// minute (date). Network polls only run while the tab is visible: a hidden
+// tab stops ticking, and when it becomes visible again every overdue poll
+// runs once. Each poll interval gets random jitter, so a class with the
+// page open doesn't hit the server at the same moment.
+const scheduler = {
+    secondTasks: [],
+    minuteTasks: [],
+    polls: {},
+    timer: null,
+    lastMinute: null,
+    
+    // Run fn at the start of every second (and once right away)
+    everySecond(fn) {
+        this.secondTasks.push(fn);
+        fn();
+        this.start();
+    },
+    
+    // Run fn at the start of every minute (and once right away)
+    everyMinute(fn) {
+        this.minuteTasks.push(fn);
+        fn();
+        this.start();
+    },
+    
+    // Run fn about every interval ms (± jitter share), only while visible
+    poll(name, interval, fn, jitter = 0.1) {
+        this.polls[name] = { interval, fn, jitter, due: 0 };
+        this.postpone(name);
+        this.start();
+    },
+    
+    // Next run of a poll one interval from now (e.g. after a manual refresh)
+    postpone(name) {
+        const poll = this.polls[name];
+        if (poll) {
+            const spread = poll.interval * poll.jitter;
+            poll.due = Date.now() + poll.interval + (Math.random() * 2 - 1) * spread;
+        }
+    },
+    
+    run(fn) {
+        try {
+            fn();
+        } catch (error) {
+            console.error('Scheduled task failed:', error);
+        }
+    },
+    
+    tick() {
+        this.timer = null;
+        if (document.visibilityState === 'hidden') {
+            return;
+        }
+        const now = Date.now();
+        this.secondTasks.forEach(fn => this.run(fn));
+        const minute = Math.floor(now / 60000);
+        if (minute !== this.lastMinute) {
+            this.lastMinute = minute;
+            this.minuteTasks.forEach(fn => this.run(fn));
+        }
+        Object.keys(this.polls).forEach(name => {
+            const poll = this.polls[name];
+            if (now >= poll.due) {
+                this.postpone(name);
+                this.run(poll.fn);
+            }
+        });
+        this.start();
+    },
+    
+    // Schedule the next tick for the start of the next second
+    start() {
+        if (this.timer === null && document.visibilityState !== 'hidden') {
+            this.timer = setTimeout(() => this.tick(), 1000 - Date.now() % 1000);
+        }
+    }
+};
+
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+        clearTimeout(scheduler.timer);
+        scheduler.timer = null;
+    } else {
+        // Catch up at once: clock, countdowns and every overdue poll
+        scheduler.tick();
+    }
+});
+
+// Keyed Rendering
+// Lists are patched instead of rebuilt: every item has a key (lesson start +
+// summary, message id), a node is only replaced when its HTML changed, and
+// unchanged nodes are kept (with their focus, hover and scroll state) and
+// only moved if the order changed.
+
+// Set a container's HTML only if it differs from what was set last
+function setHTML(container, html) {
+    if (container.renderedHTML !== html) {
+        container.innerHTML = html;
+        container.renderedHTML = html;
+    }
+}
+
+function createNode(html) {
+    const template = document.createElement('template');
+    template.innerHTML = html.trim();
+    return template.content.firstElementChild;
+}
+
+// Render items into container, one element per item; render(item) returns its HTML
+function renderKeyed(container, items, keyOf, render) {
+    container.renderedHTML = null;
+    
+    // Duplicate keys get a suffix, so every item has its own node
+    const seen = {};
+    const keys = items.map(item => {
+        const key = String(keyOf(item));
+        seen[key] = (seen[key] || 0) + 1;
+        return seen[key] > 1 ? `${key}#${seen[key]}` : key;
+    });
+    const wanted = new Set(keys);
+    
+    const existing = new Map();
+    Array.from(container.children).forEach(node => {
+        if (node.renderKey !== undefined && wanted.has(node.renderKey)) {
+            existing.set(node.renderKey, node);
+        } else {
+            node.remove();
+        }
+    });
+    
+    const nodes = items.map((item, i) => {
+        const html = render(item);
+        let node = existing.get(keys[i]);
+        if (!node || node.renderedHTML !== html) {
+            const fresh = createNode(html);
+            fresh.renderKey = keys[i];
+            fresh.renderedHTML = html;
+            if (node) {
+                node.replaceWith(fresh);
+            }
+            node = fresh;
+        }
+        return node;
+    });
+    
+    // Put the nodes in order, moving only those that are out of place
+    let cursor = container.firstChild;
+    nodes.forEach(node => {
+        if (node === cursor) {
+            cursor = cursor.nextSibling;
+        } else {
+            container.insertBefore(node, cursor);
+        }
+    });
+    while (cursor) {
+        const next = cursor.nextSibling;
+        cursor.remove();
+        cursor = next;
+    }
+}
+
+// Virtualized list for long lists in a scroll container: only the rows in
+// and near the visible area are in the DOM, spacers keep the scroll height.
+// Row heights are measured once rendered and estimated until then.
+function createVirtualList(container, keyOf, render, estimate = 120, overscan = 4) {
+    const list = {
+        items: [],
+        keys: [],
+        heights: {},
+        frame: null,
+        top: document.createElement('div'),
+        rows: document.createElement('div'),
+        bottom: document.createElement('div')
+    };
+    list.rows.className = 'virtual-rows';
+    
+    function attach() {
+        if (list.rows.parentNode !== container) {
+            container.renderedHTML = null;
+            container.replaceChildren(list.top, list.rows, list.bottom);
+        }
+    }
+    
+    function update() {
+        list.frame = null;
+        attach();
+        const gap = parseFloat(getComputedStyle(list.rows).rowGap) || 0;
+        const offsets = [0];
+        list.keys.forEach((key, i) => {
+            offsets.push(offsets[i] + (list.heights[key] || estimate) + gap);
+        });
+        
+        const viewTop = container.scrollTop;
+        const viewBottom = viewTop + (container.clientHeight || estimate * overscan);
+        let first = 0;
+        while (first < list.items.length && offsets[first + 1] < viewTop) {
+            first++;
+        }
+        let last = first;
+        while (last < list.items.length && offsets[last] < viewBottom) {
+            last++;
+        }
+        first = Math.max(0, first - overscan);
+        last = Math.min(list.items.length, last + overscan);
+        
+        renderKeyed(list.rows, list.items.slice(first, last), keyOf, render);
+        list.top.style.height = `${offsets[first]}px`;
+        list.bottom.style.height = `${Math.max(0, offsets[list.items.length] - offsets[last])}px`;
+        
+        // Rows that turned out higher or lower than estimated: lay out once more
+        let measured = false;
+        Array.from(list.rows.children).forEach((node, i) => {
+            const key = list.keys[first + i];
+            if (node.offsetHeight && list.heights[key] !== node.offsetHeight) {
+                list.heights[key] = node.offsetHeight;
+                measured = true;
+            }
+        });
+        if (measured) {
+            schedule();
+        }
+    }
+    
+    function schedule() {
+        if (list.frame === null) {
+            list.frame = requestAnimationFrame(update);
+        }
+    }
+    
+    container.addEventListener('scroll', schedule, { passive: true });
+    if (window.ResizeObserver) {
+        // Re-render when the list becomes visible or changes size
+        new ResizeObserver(schedule).observe(container);
+    }
+    
+    list.setItems = function(items) {
+        list.items = items;
+        list.keys = items.map(item => String(keyOf(item)));
+        update();
+    };
+    return list;
+}
+
 // Clock Update
 function updateClock() {
+    updateTime();
+    updateDate();
+}
+
+function updateTime() {
     const now = new Date();
     
     // Format time (HH:MM:SS)
     const hours = String(now.getHours()).padStart(2, '0');
     const minutes = String(now.getMinutes()).padStart(2, '0');
     const seconds = String(now.getSeconds()).padStart(2, '0');
-    const timeString = `${hours}:${minutes}:${seconds}`;
+    
+    document.getElementById('time').textContent = `${hours}:${minutes}:${seconds}`;
+}
+
+function updateDate() {
+    const now = new Date();
     
     // Format date based on language
     const locale = currentLanguage === 'de' ? 'de-DE' : 'en-US';
@@ -144,15 +405,12 @@ function updateClock() {
         month: 'long', 
         day: 'numeric' 
     };
-    const dateString = now.toLocaleDateString(locale, options);
-    
-    document.getElementById('time').textContent = timeString;
-    document.getElementById('date').textContent = dateString;
+    document.getElementById('date').textContent = now.toLocaleDateString(locale, options);
 }
 
-// Update clock every second
-setInterval(updateClock, 1000);
-updateClock(); // Initial call
+// Time every second, date at the start of every minute
+scheduler.everySecond(updateTime);
+scheduler.everyMinute(updateDate);
 
 // Countdown Timer
 let nextLessonStartTime = null;
@@ -232,7 +490,7 @@ function updateCountdown() {
 }
 
 // Update countdown every second
-setInterval(updateCountdown, 1000);
+scheduler.everySecond(updateCountdown);
 
 // Search Functions
 function search(engine) {
@@ -346,7 +604,11 @@ function updateCurrentNotebook(currentLesson) {
 // Track when next lesson starts for auto-refresh
 let nextLessonStartTimeForRefresh = null;
 let currentLessonEndTimeForRefresh = null;
-let autoRefreshInterval = null;
+
+// Key of a lesson in rendered lists
+function lessonKey(lesson) {
+    return `${lesson.start}|${lesson.summary}`;
+}
 
 // Load Timetable Data
 async function loadTimetable(useFastLoad = false) {
@@ -354,12 +616,18 @@ async function loadTimetable(useFastLoad = false) {
         let response, data;
         
         if (useFastLoad) {
-            // Fast initial load with static minimal data
-            response = await fetch('/static/fast_timetable.json');
-            data = await response.json();
+            // Fast initial load: data embedded in the page, else the server-generated snapshot
+            const embedded = document.getElementById('initialTimetable');
+            data = embedded ? JSON.parse(embedded.textContent) : null;
+            if (!data) {
+                response = await fetch('/static/fast_timetable.json');
+                data = await response.json();
+            }
             
-            // Start background fetch for real data
-            setTimeout(() => loadTimetable(false), 100);
+            // Only fetch live data right away if the snapshot is already outdated
+            if (!data.valid_until || new Date(data.valid_until) <= new Date()) {
+                setTimeout(() => loadTimetable(false), 100);
+            }
         } else {
             // Full load from API
             response = await fetch(`/api/timetable?mode=auto`);
@@ -373,7 +641,7 @@ async function loadTimetable(useFastLoad = false) {
         const nextLessonDiv = document.getElementById('nextLesson');
         
         if (data.message) {
-            nextLessonDiv.innerHTML = `<p class="no-data">${data.message}</p>`;
+            setHTML(nextLessonDiv, `<p class="no-data">${data.message}</p>`);
             nextLessonStartTime = null;
         } else if (data.next_lesson) {
             const lesson = data.next_lesson;
@@ -408,7 +676,8 @@ async function loadTimetable(useFastLoad = false) {
             
             const cancelledClass = lesson.is_cancelled ? 'cancelled' : '';
             
-            nextLessonDiv.innerHTML = `
+            // Unchanged lesson: the card (and its running countdown) stays as it is
+            setHTML(nextLessonDiv, `
                 <div class="lesson-card next-lesson-card ${cancelledClass}">
                     <div class="lesson-title">${lesson.summary}</div>
                     ${locationHtml}
@@ -416,13 +685,13 @@ async function loadTimetable(useFastLoad = false) {
                     ${lesson.description ? `<div class="lesson-description">${lesson.description}</div>` : ''}
                     ${specialBadge}
                 </div>
-            `;
+            `);
             nextLessonDiv.className = 'lesson-info compact';
             
             // Trigger initial countdown update
             updateCountdown();
         } else {
-            nextLessonDiv.innerHTML = `<p class="no-data">Keine kommenden Lektionen gefunden.</p>`;
+            setHTML(nextLessonDiv, `<p class="no-data">Keine kommenden Lektionen gefunden.</p>`);
             nextLessonStartTime = null;
             nextLessonStartTimeForRefresh = null;
         }
@@ -431,7 +700,7 @@ async function loadTimetable(useFastLoad = false) {
         const todaysListDiv = document.getElementById('todaysLessonsList');
         
         if (data.todays_lessons && data.todays_lessons.length > 0) {
-            todaysListDiv.innerHTML = data.todays_lessons.map(lesson => {
+            renderKeyed(todaysListDiv, data.todays_lessons, lessonKey, lesson => {
                 // Extract times directly from ISO strings
                 const startTime = extractTimeFromISO(lesson.start);
                 const endTime = lesson.end ? extractTimeFromISO(lesson.end) : '';
@@ -451,16 +720,16 @@ async function loadTimetable(useFastLoad = false) {
                         ${examBadge}
                     </div>
                 `;
-            }).join('');
+            });
         } else {
-            todaysListDiv.innerHTML = `<p class="no-data">Keine Lektionen für heute.</p>`;
+            setHTML(todaysListDiv, `<p class="no-data">Keine Lektionen für heute.</p>`);
         }
         
         // Display exams
         const examsListDiv = document.getElementById('examsList');
         
         if (data.exams && data.exams.length > 0) {
-            examsListDiv.innerHTML = data.exams.map(exam => {
+            renderKeyed(examsListDiv, data.exams, lessonKey, exam => {
                 const timeString = formatDateTime(exam.start, exam.end);
                 
                 const locationHtml = exam.location ? 
@@ -489,59 +758,60 @@ async function loadTimetable(useFastLoad = false) {
                         ${specialBadge}
                     </div>
                 `;
-            }).join('');
+            });
         } else {
-            examsListDiv.innerHTML = `<p class="no-data">Keine kommenden Prüfungen.</p>`;
+            setHTML(examsListDiv, `<p class="no-data">Keine kommenden Prüfungen.</p>`);
         }
         
         // Check for exam notifications
         checkExamNotifications(data.exams);
-        
-        // Setup auto-refresh when lesson starts/ends
-        setupAutoRefresh();
-        
     } catch (error) {
         console.error('Error loading timetable:', error);
-        document.getElementById('nextLesson').innerHTML = 
-            `<p class="error-message">Fehler beim Laden des Stundenplans: ${error.message}</p>`;
-        document.getElementById('examsList').innerHTML = 
-            `<p class="error-message">Fehler beim Laden der Prüfungen</p>`;
+        setHTML(document.getElementById('nextLesson'),
+            `<p class="error-message">Fehler beim Laden des Stundenplans: ${error.message}</p>`);
+        setHTML(document.getElementById('examsList'),
+            `<p class="error-message">Fehler beim Laden der Prüfungen</p>`);
     }
 }
 
-// Setup auto-refresh when lesson starts or ends
-function setupAutoRefresh() {
-    // Clear existing interval
-    if (autoRefreshInterval) {
-        clearInterval(autoRefreshInterval);
-        autoRefreshInterval = null;
+// Refresh when a lesson starts or ends (checked on every scheduler tick)
+function checkAutoRefresh() {
+    const now = new Date();
+    let refresh = false;
+    
+    // Refresh when next lesson starts (becomes current lesson)
+    if (nextLessonStartTimeForRefresh && now >= nextLessonStartTimeForRefresh) {
+        console.log('Next lesson started - refreshing timetable');
+        nextLessonStartTimeForRefresh = null;
+        refresh = true;
     }
     
-    // Check every second if we need to refresh
-    autoRefreshInterval = setInterval(() => {
-        const now = new Date();
-        
-        // Refresh when next lesson starts (becomes current lesson)
-        if (nextLessonStartTimeForRefresh && now >= nextLessonStartTimeForRefresh) {
-            console.log('Next lesson started - refreshing timetable');
-            loadTimetable(false);
-            nextLessonStartTimeForRefresh = null;
-        }
-        
-        // Refresh when current lesson ends
-        if (currentLessonEndTimeForRefresh && now >= currentLessonEndTimeForRefresh) {
-            console.log('Current lesson ended - refreshing timetable');
-            loadTimetable(false);
-            currentLessonEndTimeForRefresh = null;
-        }
-    }, 1000); // Check every second
+    // Refresh when current lesson ends
+    if (currentLessonEndTimeForRefresh && now >= currentLessonEndTimeForRefresh) {
+        console.log('Current lesson ended - refreshing timetable');
+        currentLessonEndTimeForRefresh = null;
+        refresh = true;
+    }
+    
+    // One request even if both happened while the tab was hidden
+    if (refresh) {
+        scheduler.postpone('timetable');
+        loadTimetable(false);
+    }
 }
 
-// Load Weather Data
-async function loadWeather() {
+scheduler.everySecond(checkAutoRefresh);
+
+// Load Weather Data (section: already fetched /api/dashboard section)
+async function loadWeather(section = null) {
     try {
-        const response = await fetch('/api/weather');
-        const data = await response.json();
+        let data;
+        if (section) {
+            data = section.data;
+        } else {
+            const response = await fetch('/api/weather');
+            data = await response.json();
+        }
         
         const weatherDiv = document.getElementById('weatherContent');
         
@@ -656,86 +926,87 @@ function closeWeeklyView() {
 
 async function loadWeeklySchedule() {
     const weeklyContent = document.getElementById('weeklyContent');
-    weeklyContent.innerHTML = '<p class="loading">Lade Wochenübersicht...</p>';
+    if (!weeklyContent.querySelector('.weekly-day')) {
+        setHTML(weeklyContent, '<p class="loading">Lade Wochenübersicht...</p>');
+    }
     
     try {
         const response = await fetch('/api/weekly?mode=auto');
         const data = await response.json();
         
         if (data.message) {
-            weeklyContent.innerHTML = `<p class="no-data">${data.message}</p>`;
+            setHTML(weeklyContent, `<p class="no-data">${data.message}</p>`);
             return;
         }
         
         if (!data.weekly_schedule || data.weekly_schedule.length === 0) {
-            weeklyContent.innerHTML = '<p class="no-data">Keine Lektionen für diese Woche gefunden.</p>';
+            setHTML(weeklyContent, '<p class="no-data">Keine Lektionen für diese Woche gefunden.</p>');
             return;
         }
         
-        // Build HTML for weekly schedule
-        let html = '<div class="weekly-days">';
+        // One column per day, keyed by date; the lessons of each day are patched separately
+        setHTML(weeklyContent, '<div class="weekly-days"></div>');
+        const daysDiv = weeklyContent.firstElementChild;
         
-        data.weekly_schedule.forEach(day => {
+        renderKeyed(daysDiv, data.weekly_schedule, day => day.date, day => {
             // Format date more compactly for column view
-            // Extract weekday and date from "Monday, 18. November 2025" format
+            // Extract weekday and date from "Dienstag, 18. November 2025" format
             const dateParts = day.date.split(', ');
             const weekday = dateParts[0];
             const dateNum = dateParts[1] ? dateParts[1].split('.')[0] : '';
             const compactDate = dateNum ? `${weekday}<br>${dateNum}.` : weekday;
             
-            html += `
+            return `
                 <div class="weekly-day">
                     <h3 class="weekly-day-header">${compactDate}</h3>
-                    <div class="weekly-day-lessons">
+                    <div class="weekly-day-lessons"></div>
+                </div>
             `;
+        });
+        
+        data.weekly_schedule.forEach((day, i) => {
+            const lessonsDiv = daysDiv.children[i].querySelector('.weekly-day-lessons');
             
             if (day.lessons.length === 0) {
-                html += '<p class="no-lessons">Keine Lektionen</p>';
-            } else {
-                day.lessons.forEach(lesson => {
-                    const startTime = extractTimeFromISO(lesson.start);
-                    const endTime = lesson.end ? extractTimeFromISO(lesson.end) : '';
-                    const timeString = endTime ? `${startTime} - ${endTime}` : startTime;
-                    
-                    const locationHtml = lesson.location ? 
-                        `<span class="weekly-location">${lesson.location}</span>` : '';
-                    
-                    const examBadge = lesson.is_exam ? 
-                        `<span class="weekly-exam-badge">Prüfung</span>` : '';
-                    
-                    const specialBadge = lesson.special_note ? 
-                        `<span class="weekly-special-badge">${lesson.special_note}</span>` : '';
-                    
-                    const cancelledClass = lesson.is_cancelled ? 'weekly-lesson-cancelled' : '';
-                    
-                    html += `
-                        <div class="weekly-lesson-item ${cancelledClass}">
-                            <div class="weekly-lesson-time">${timeString}</div>
-                            <div class="weekly-lesson-info">
-                                <div class="weekly-lesson-title">${lesson.summary}</div>
-                                <div class="weekly-lesson-meta">
-                                    ${locationHtml}
-                                    ${examBadge}
-                                    ${specialBadge}
-                                </div>
-                            </div>
-                        </div>
-                    `;
-                });
+                setHTML(lessonsDiv, '<p class="no-lessons">Keine Lektionen</p>');
+                return;
             }
             
-            html += `
+            renderKeyed(lessonsDiv, day.lessons, lessonKey, lesson => {
+                const startTime = extractTimeFromISO(lesson.start);
+                const endTime = lesson.end ? extractTimeFromISO(lesson.end) : '';
+                const timeString = endTime ? `${startTime} - ${endTime}` : startTime;
+                
+                const locationHtml = lesson.location ? 
+                    `<span class="weekly-location">${lesson.location}</span>` : '';
+                
+                const examBadge = lesson.is_exam ? 
+                    `<span class="weekly-exam-badge">Prüfung</span>` : '';
+                
+                const specialBadge = lesson.special_note ? 
+                    `<span class="weekly-special-badge">${lesson.special_note}</span>` : '';
+                
+                const cancelledClass = lesson.is_cancelled ? 'weekly-lesson-cancelled' : '';
+                
+                return `
+                    <div class="weekly-lesson-item ${cancelledClass}">
+                        <div class="weekly-lesson-time">${timeString}</div>
+                        <div class="weekly-lesson-info">
+                            <div class="weekly-lesson-title">${lesson.summary}</div>
+                            <div class="weekly-lesson-meta">
+                                ${locationHtml}
+                                ${examBadge}
+                                ${specialBadge}
+                            </div>
+                        </div>
                     </div>
-                </div>
-            `;
+                `;
+            });
         });
         
-        html += '</div>';
-        weeklyContent.innerHTML = html;
-        
     } catch (error) {
         console.error('Error loading weekly schedule:', error);
-        weeklyContent.innerHTML = `<p class="error-message">Fehler beim Laden der Wochenübersicht: ${error.message}</p>`;
+        setHTML(weeklyContent, `<p class="error-message">Fehler beim Laden der Wochenübersicht: ${error.message}</p>`);
     }
 }
 
@@ -912,23 +1183,51 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Use fast load for instant UI
     loadTimetable(true);
-    loadWeather();
+    loadDashboard();
     
-    // Refresh full data periodically (every 5 minutes)
-    setInterval(() => loadTimetable(false), 5 * 60 * 1000);
-    setInterval(loadWeather, 10 * 60 * 1000);  // Every 10 minutes
+    // Refresh full data periodically (every 5 and 10 minutes, paused in background tabs)
+    scheduler.poll('timetable', 5 * 60 * 1000, () => loadTimetable(false));
+    scheduler.poll('weather', 10 * 60 * 1000, () => loadWeather());
 });
 
+// Service Worker (offline use, see templates/sw.js)
+// Timetable, weekly and weather data come from the worker's cache first;
+// when its background update brings different data, render it again.
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js').catch(error => {
+            console.error('Service worker registration failed:', error);
+        });
+    });
+    
+    navigator.serviceWorker.addEventListener('message', event => {
+        if (!event.data || event.data.type !== 'refreshed') return;
+        const path = new URL(event.data.url).pathname;
+        if (path === '/api/timetable') {
+            loadTimetable(false);
+        } else if (path === '/api/weekly' && weeklyViewOpen) {
+            loadWeeklySchedule();
+        } else if (path === '/api/weather') {
+            loadWeather();
+        }
+    });
+}
+
 // ISY Authentication Functions
 // =============================
 
 let isyAuthenticated = false;
 let isyUsername = null;
 
-async function checkISYStatus() {
+async function checkISYStatus(section = null, loadDashboardMessages = true) {
     try {
-        const response = await fetch('/api/isy/status');
-        const data = await response.json();
+        let data;
+        if (section) {
+            data = section.data;
+        } else {
+            const response = await fetch('/api/isy/status');
+            data = await response.json();
+        }
         
         isyAuthenticated = data.authenticated;
         isyUsername = data.username;
@@ -938,12 +1237,14 @@ async function checkISYStatus() {
         if (isyAuthenticated) {
             // Load messages if authenticated
             loadISYMessages();
-            loadISYDashboardMessages();
+            if (loadDashboardMessages) {
+                loadISYDashboardMessages();
+            }
         } else {
             // Clear dashboard messages if not authenticated
             const dashboardDiv = document.getElementById('isyDashboardMessages');
             if (dashboardDiv) {
-                dashboardDiv.innerHTML = '<p class="info-message" data-i18n="isy_login_required">Bitte anmelden für Mitteilungen</p>';
+                setHTML(dashboardDiv, '<p class="info-message" data-i18n="isy_login_required">Bitte anmelden für Mitteilungen</p>');
             }
         }
     } catch (error) {
@@ -1099,11 +1400,56 @@ async function submitISYLogout() {
     }
 }
 
+// One row of the ISY message list
+function renderISYMessage(msg) {
+    const priorityText = ['Niedrig', 'Normal', 'Hoch', 'Dringend'][msg.priority] || 'Normal';
+    const priorityClass = ['low', 'normal', 'high', 'urgent'][msg.priority] || 'normal';
+    
+    let dateInfo = '';
+    if (msg.dtDue) {
+        dateInfo = `<div class="isy-message-date">📅 Fällig: ${new Date(msg.dtDue).toLocaleDateString('de-DE', { day: '2-digit', month: '2-digit', year: 'numeric' })}</div>`;
+    } else if (msg.visibleTo) {
+        dateInfo = `<div class="isy-message-date">📅 Bis: ${new Date(msg.visibleTo).toLocaleDateString('de-DE', { day: '2-digit', month: '2-digit', year: 'numeric' })}</div>`;
+    }
+    
+    const statusBadges = [];
+    if (msg.completed) {
+        statusBadges.push('<span class="isy-badge completed">✅ Erledigt</span>');
+    }
+    if (msg.readWhen) {
+        statusBadges.push('<span class="isy-badge read">👁️ Gelesen</span>');
+    }
+    if (msg.archivedWhen) {
+        statusBadges.push('<span class="isy-badge archived">📦 Archiviert</span>');
+    }
+    
+    return `
+        <div class="isy-message-item priority-${priorityClass}" data-message-id="${msg.id}">
+            <div class="isy-message-header">
+                <div class="isy-message-title">${msg.title || 'Keine Titel'}</div>
+                <div class="isy-message-priority priority-${priorityClass}">
+                    <span class="priority-dot"></span>${priorityText}
+                </div>
+            </div>
+            ${dateInfo}
+            ${msg.previewText ? `<div class="isy-message-body">${msg.previewText.substring(0, 200)}${msg.previewText.length > 200 ? '...' : ''}</div>` : ''}
+            ${statusBadges.length > 0 ? `<div class="isy-message-badges">${statusBadges.join('')}</div>` : ''}
+        </div>
+    `;
+}
+
+// Virtualized, created on first load
+let isyMessageList = null;
+// Messages of the list by id (for the click handler)
+let isyMessagesById = new Map();
+
 async function loadISYMessages() {
     if (!isyAuthenticated) return;
     
     const messagesList = document.getElementById('isyMessagesList');
-    messagesList.innerHTML = '<p class="loading">Lade Mitteilungen...</p>';
+    if (!messagesList.querySelector('.isy-message-item')) {
+        setHTML(messagesList, '<p class="loading">Lade Mitteilungen...</p>');
+    }
     
     try {
         const response = await fetch('/api/isy/messages');
@@ -1113,44 +1459,13 @@ async function loadISYMessages() {
         
         if (response.ok) {
             if (data.messages && data.messages.length > 0) {
-                messagesList.innerHTML = data.messages.map(msg => {
-                    const priorityText = ['Niedrig', 'Normal', 'Hoch', 'Dringend'][msg.priority] || 'Normal';
-                    const priorityClass = ['low', 'normal', 'high', 'urgent'][msg.priority] || 'normal';
-                    
-                    let dateInfo = '';
-                    if (msg.dtDue) {
-                        dateInfo = `<div class="isy-message-date">📅 Fällig: ${new Date(msg.dtDue).toLocaleDateString('de-DE', { day: '2-digit', month: '2-digit', year: 'numeric' })}</div>`;
-                    } else if (msg.visibleTo) {
-                        dateInfo = `<div class="isy-message-date">📅 Bis: ${new Date(msg.visibleTo).toLocaleDateString('de-DE', { day: '2-digit', month: '2-digit', year: 'numeric' })}</div>`;
-                    }
-                    
-                    const statusBadges = [];
-                    if (msg.completed) {
-                        statusBadges.push('<span class="isy-badge completed">✅ Erledigt</span>');
-                    }
-                    if (msg.readWhen) {
-                        statusBadges.push('<span class="isy-badge read">👁️ Gelesen</span>');
-                    }
-                    if (msg.archivedWhen) {
-                        statusBadges.push('<span class="isy-badge archived">📦 Archiviert</span>');
-                    }
-                    
-                    return `
-                        <div class="isy-message-item priority-${priorityClass}" data-message-id="${msg.id}">
-                            <div class="isy-message-header">
-                                <div class="isy-message-title">${msg.title || 'Keine Titel'}</div>
-                                <div class="isy-message-priority priority-${priorityClass}">
-                                    <span class="priority-dot"></span>${priorityText}
-                                </div>
-                            </div>
-                            ${dateInfo}
-                            ${msg.body ? `<div class="isy-message-body">${msg.body.substring(0, 200)}${msg.body.length > 200 ? '...' : ''}</div>` : ''}
-                            ${statusBadges.length > 0 ? `<div class="isy-message-badges">${statusBadges.join('')}</div>` : ''}
-                        </div>
-                    `;
-                }).join('');
+                if (!isyMessageList) {
+                    isyMessageList = createVirtualList(messagesList, msg => msg.id, renderISYMessage);
+                }
+                isyMessagesById = new Map(data.messages.map(msg => [String(msg.id), msg]));
+                isyMessageList.setItems(data.messages);
             } else {
-                messagesList.innerHTML = '<p class="no-data">Keine Mitteilungen vorhanden</p>';
+                setHTML(messagesList, '<p class="no-data">Keine Mitteilungen vorhanden</p>');
             }
         } else {
             // Check if token expired
@@ -1158,7 +1473,7 @@ async function loadISYMessages() {
                 // Token expired - clear auth state and prompt re-login
                 isyAuthenticated = false;
                 localStorage.removeItem('isyAuthenticated');
-                messagesList.innerHTML = '<p class="error-message">Sitzung abgelaufen - bitte erneut anmelden</p>';
+                setHTML(messagesList, '<p class="error-message">Sitzung abgelaufen - bitte erneut anmelden</p>');
                 
                 // Update UI to show login button
                 const isyButton = document.getElementById('isyLoginBtn');
@@ -1170,37 +1485,50 @@ async function loadISYMessages() {
                 // Show error details for debugging
                 const errorMsg = data.error || 'Fehler beim Laden der Mitteilungen';
                 const errorDetail = data.message ? `<br><small>${data.message}</small>` : '';
-                messagesList.innerHTML = `<p class="error-message">${errorMsg}${errorDetail}</p>`;
+                setHTML(messagesList, `<p class="error-message">${errorMsg}${errorDetail}</p>`);
             }
             console.error('ISY messages error:', data);
         }
     } catch (error) {
         console.error('Error loading ISY messages:', error);
-        messagesList.innerHTML = `<p class="error-message">Verbindungsfehler: ${error.message}</p>`;
+        setHTML(messagesList, `<p class="error-message">Verbindungsfehler: ${error.message}</p>`);
     }
 }
 
+// Messages shown in the dashboard column by id (for the click handler)
+let dashboardMessages = new Map();
+
 // Load dashboard messages (full archive) for the 5th column
-async function loadISYDashboardMessages() {
+async function loadISYDashboardMessages(section = null) {
     if (!isyAuthenticated) return;
     
     const dashboardDiv = document.getElementById('isyDashboardMessages');
     if (!dashboardDiv) return;
     
-    dashboardDiv.innerHTML = '<p class="loading">Lade Mitteilungen...</p>';
+    if (!dashboardDiv.querySelector('.dashboard-message-item')) {
+        setHTML(dashboardDiv, '<p class="loading">Lade Mitteilungen...</p>');
+    }
     
     try {
-        const response = await fetch('/api/isy/dashboard-messages');
-        const data = await response.json();
+        let data, ok;
+        if (section) {
+            data = section.data;
+            ok = section.status < 400;
+        } else {
+            const response = await fetch('/api/isy/dashboard-messages');
+            data = await response.json();
+            ok = response.ok;
+        }
         
         console.log('ISY Dashboard Messages Response:', data);
         
-        if (response.ok) {
+        if (ok) {
             if (data.messages && data.messages.length > 0) {
                 // Show only first 10 messages for dashboard
                 const displayMessages = data.messages.slice(0, 10);
+                dashboardMessages = new Map(displayMessages.map(msg => [String(msg.id), msg]));
                 
-                dashboardDiv.innerHTML = displayMessages.map(msg => {
+                renderKeyed(dashboardDiv, displayMessages, msg => msg.id, msg => {
                     const priorityText = ['Niedrig', 'Normal', 'Hoch', 'Dringend'][msg.priority] || 'Normal';
                     const priorityClass = ['low', 'normal', 'high', 'urgent'][msg.priority] || 'normal';
                     
@@ -1213,7 +1541,7 @@ async function loadISYDashboardMessages() {
                     const readIndicator = msg.iHaveReadIt ? '' : '<span class="unread-dot">●</span>';
                     
                     return `
-                        <div class="dashboard-message-item priority-${priorityClass}" data-message-id="${msg.id}" data-message-full='${JSON.stringify(msg).replace(/'/g, "&#39;")}' style="cursor: pointer;">
+                        <div class="dashboard-message-item priority-${priorityClass}" data-message-id="${msg.id}" style="cursor: pointer;">
                             <div class="dashboard-msg-header">
                                 <div class="dashboard-msg-title">
                                     ${readIndicator}
@@ -1226,17 +1554,9 @@ async function loadISYDashboardMessages() {
                             ${dateInfo}
                         </div>
                     `;
-                }).join('');
-                
-                // Add click event listeners
-                document.querySelectorAll('.dashboard-message-item').forEach(item => {
-                    item.addEventListener('click', function() {
-                        const msgData = JSON.parse(this.getAttribute('data-message-full').replace(/&#39;/g, "'"));
-                        showMessageModal(msgData);
-                    });
                 });
             } else {
-                dashboardDiv.innerHTML = '<p class="no-data">Keine Mitteilungen vorhanden</p>';
+                setHTML(dashboardDiv, '<p class="no-data">Keine Mitteilungen vorhanden</p>');
             }
         } else {
             // Check if token expired
@@ -1244,7 +1564,7 @@ async function loadISYDashboardMessages() {
                 // Token expired - clear auth state
                 isyAuthenticated = false;
                 localStorage.removeItem('isyAuthenticated');
-                dashboardDiv.innerHTML = '<p class="error-message">Sitzung abgelaufen - bitte erneut anmelden</p>';
+                setHTML(dashboardDiv, '<p class="error-message">Sitzung abgelaufen - bitte erneut anmelden</p>');
                 
                 // Update UI to show login button
                 const isyButton = document.getElementById('isyLoginBtn');
@@ -1254,13 +1574,66 @@ async function loadISYDashboardMessages() {
                 }
             } else {
                 const errorMsg = data.error || 'Fehler beim Laden';
-                dashboardDiv.innerHTML = `<p class="error-message">${errorMsg}</p>`;
+                setHTML(dashboardDiv, `<p class="error-message">${errorMsg}</p>`);
             }
             console.error('ISY dashboard messages error:', data);
         }
     } catch (error) {
         console.error('Error loading ISY dashboard messages:', error);
-        dashboardDiv.innerHTML = `<p class="error-message">Verbindungsfehler: ${error.message}</p>`;
+        setHTML(dashboardDiv, `<p class="error-message">Verbindungsfehler: ${error.message}</p>`);
+    }
+}
+
+// Read/seen/completed marks, collected for a moment and sent as one request
+// (the server turns them into a single ISY mutation)
+const ISY_MARK_DELAY = 500;
+const ISY_MARK_FIELDS = { read: 'readWhen', seen: 'seenWhen', completed: 'completedWhen' };
+const isyMarkQueue = new Map();
+let isyMarkTimer = null;
+
+// Mark a message, e.g. markISYMessage(msg, { read: true }); the UI updates right away
+function markISYMessage(msg, flags) {
+    const now = new Date().toISOString();
+    Object.entries(flags).forEach(([flag, value]) => {
+        msg[ISY_MARK_FIELDS[flag]] = value ? now : null;
+    });
+    if ('read' in flags) {
+        msg.iHaveReadIt = flags.read;
+    }
+    if ('completed' in flags) {
+        msg.completed = flags.completed;
+    }
+    
+    const key = String(msg.id);
+    isyMarkQueue.set(key, Object.assign(isyMarkQueue.get(key) || { id: msg.id }, flags));
+    if (!isyMarkTimer) {
+        isyMarkTimer = setTimeout(flushISYMarks, ISY_MARK_DELAY);
+    }
+}
+
+async function flushISYMarks(keepalive = false) {
+    clearTimeout(isyMarkTimer);
+    isyMarkTimer = null;
+    if (isyMarkQueue.size === 0) return;
+    
+    const updates = [...isyMarkQueue.values()];
+    isyMarkQueue.clear();
+    try {
+        const response = await fetch('/api/isy/messages/mark', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ updates }),
+            keepalive
+        });
+        const data = await response.json();
+        if (!data.success) {
+            // Show the state ISY really has, in the dashboard column and the list
+            console.error('ISY mark error:', data);
+            loadISYDashboardMessages();
+            loadISYMessages();
+        }
+    } catch (error) {
+        console.error('Error marking ISY messages:', error);
     }
 }
 
@@ -1288,9 +1661,18 @@ async function showMessageModal(msg) {
     `;
     modal.style.display = 'flex';
     
+    const unread = {};
+    if (!msg.readWhen) unread.read = true;
+    if (!msg.seenWhen) unread.seen = true;
+    if (Object.keys(unread).length > 0) {
+        markISYMessage(msg, unread);
+        const dot = document.querySelector(`.dashboard-message-item[data-message-id="${CSS.escape(String(msg.id))}"] .unread-dot`);
+        if (dot) dot.remove();
+    }
+    
     try {
         // Fetch full message details from API
-        const response = await fetch(`/api/isy/message/${msg.id.split('/')[2]}`, {
+        const response = await fetch(`/api/isy/message/${encodeURIComponent(String(msg.id).split('/').pop())}`, {
             method: 'GET',
             headers: {
                 'Content-Type': 'application/json'
@@ -1374,9 +1756,110 @@ function closeMessageModal() {
     }
 }
 
-// Check ISY status on page load
+// Load weather and ISY sections with one /api/dashboard request
+// Sections are streamed as they complete, so a slow ISY doesn't hold up the weather
+async function loadDashboard() {
+    const handlers = {
+        weather: section => loadWeather(section),
+        isy_status: section => checkISYStatus(section, false),
+        isy_dashboard_messages: section => loadISYDashboardMessages(section)
+    };
+    // Fallbacks for sections that failed or timed out on the server
+    const fallbacks = {
+        weather: () => loadWeather(),
+        isy_status: () => checkISYStatus(),
+        isy_dashboard_messages: () => loadISYDashboardMessages()
+    };
+    // A service worker serves /api/weather from its cache at once and
+    // revalidates it (templates/sw.js); it doesn't cache the dashboard stream
+    if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+        delete handlers.weather;
+        delete fallbacks.weather;
+        loadWeather();
+    }
+    const received = {};
+    let statusHandled = false;
+    
+    const handle = (section) => {
+        received[section.section] = true;
+        if (section.status === 504 || !('data' in section)) {
+            fallbacks[section.section]();
+        } else if (section.section === 'isy_dashboard_messages' && !statusHandled) {
+            // Messages can only be shown once the login status is known
+            received.pendingMessages = section;
+        } else {
+            handlers[section.section](section);
+        }
+        if (section.section === 'isy_status' && section.status !== 504) {
+            statusHandled = true;
+            if (received.pendingMessages) {
+                handlers.isy_dashboard_messages(received.pendingMessages);
+            }
+        }
+    };
+    
+    try {
+        const response = await fetch(`/api/dashboard?stream=1&sections=${Object.keys(handlers).join(',')}`);
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let newline;
+            while ((newline = buffer.indexOf('\n')) >= 0) {
+                const line = buffer.slice(0, newline);
+                buffer = buffer.slice(newline + 1);
+                if (line) {
+                    const section = JSON.parse(line);
+                    if (section.section) {
+                        handle(section);
+                    }
+                }
+            }
+        }
+    } catch (error) {
+        console.error('Error loading dashboard:', error);
+    }
+    
+    // Anything missing (e.g. the stream broke off) is loaded on its own
+    Object.keys(fallbacks).filter(name => !received[name]).forEach(name => fallbacks[name]());
+}
+
+// ISY login form
 document.addEventListener('DOMContentLoaded', function() {
-    checkISYStatus();
+    // One click handler for all dashboard messages, also those rendered later
+    const dashboardDiv = document.getElementById('isyDashboardMessages');
+    if (dashboardDiv) {
+        dashboardDiv.addEventListener('click', function(e) {
+            const item = e.target.closest('.dashboard-message-item');
+            const msg = item && dashboardMessages.get(item.dataset.messageId);
+            if (msg) {
+                showMessageModal(msg);
+            }
+        });
+    }
+    
+    // Message list: bodies are only loaded when a message is opened
+    const isyMessagesList = document.getElementById('isyMessagesList');
+    if (isyMessagesList) {
+        isyMessagesList.addEventListener('click', function(e) {
+            const item = e.target.closest('.isy-message-item');
+            const msg = item && isyMessagesById.get(item.dataset.messageId);
+            if (msg) {
+                showMessageModal(msg);
+            }
+        });
+    }
+    
+    // Send pending read marks before the page goes away
+    document.addEventListener('visibilitychange', function() {
+        if (document.hidden) {
+            flushISYMarks(true);
+        }
+    });
     
     // Allow Enter key in ISY login form
     const isyPassword = document.getElementById('isyPassword');
@@ -0,0 +1,120 @@
+// SuperGUI service worker (rendered by the /sw.js route)
+//
+// - The page shell (index page, hashed CSS/JS, translations) is precached on
+//   install. A new deployment changes the hashed file names and with them
+//   this file, so the browser installs a new worker and old caches are dropped.
+//   Tabs still on the previous build then load its files from the server,
+//   which keeps them for one more release (assets.build_assets).
+// - Hashed assets under /static/dist/ (and the other precached files) are
+//   served from the cache, the network is only asked on a cache miss.
+// - The index page comes from the network (it embeds the current timetable),
+//   the cached copy is only used when offline.
+// - The timetable, weekly and weather APIs are served from the cache right
+//   away and revalidated in the background. When the fresh response
+//   differs, open pages get a message and render it. Pages controlled by
+//   this worker load the weather from /api/weather instead of the
+//   /api/dashboard stream for that reason.
+// - Everything else (ISY, uploads, search, AI) always goes to the network.
+
+const CACHE_VERSION = {{ version|tojson }};
+const SHELL_CACHE = `supergui-shell-${CACHE_VERSION}`;
+const DATA_CACHE = 'supergui-data-v1';
+const PRECACHE_URLS = {{ precache_urls|tojson }};
+const DATA_PATHS = ['/api/timetable', '/api/weekly', '/api/weather'];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith('supergui-shell-') && key !== SHELL_CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+async function notifyClients(url) {
+    const clients = await self.clients.matchAll({ type: 'window' });
+    clients.forEach(client => client.postMessage({ type: 'refreshed', url }));
+}
+
+// Fetch from the network and update the cache; tell pages if the content changed
+async function revalidate(cacheName, request, cached) {
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(cacheName);
+        await cache.put(request, response.clone());
+        if (cached) {
+            const [before, after] = await Promise.all([cached.text(), response.clone().text()]);
+            if (before !== after) {
+                await notifyClients(request.url);
+            }
+        }
+    }
+    return response;
+}
+
+// Cached response at once (network update in the background), else the network
+async function staleWhileRevalidate(event, cacheName) {
+    const request = event.request;
+    const cached = await caches.match(request);
+    if (!cached) {
+        return revalidate(cacheName, request, null);
+    }
+    event.waitUntil(revalidate(cacheName, request, cached.clone()).catch(() => null));
+    return cached;
+}
+
+// The network, falling back to the cache when it can't be reached
+async function networkFirst(request, cacheName) {
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            const cache = await caches.open(cacheName);
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await caches.match(request);
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(SHELL_CACHE);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+
+    if (request.mode === 'navigate' && url.pathname === '/') {
+        event.respondWith(networkFirst(request, SHELL_CACHE));
+    } else if (url.pathname.startsWith('/static/dist/') || PRECACHE_URLS.includes(url.pathname)) {
+        event.respondWith(cacheFirst(request));
+    } else if (DATA_PATHS.includes(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event, DATA_CACHE));
+    }
+});
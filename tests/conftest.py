@@ -0,0 +1,30 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# The modules live in the repository root, next to app.py
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+
+@pytest.fixture(scope='session')
+def supergui(tmp_path_factory):
+    """
+    The app module, importing app.py in a scratch directory
+    uploads/ (timetable, event store) and the built static files go there
+    instead of into the checkout.
+    """
+    workdir = tmp_path_factory.mktemp('supergui')
+    static = workdir / 'static'
+    shutil.copytree(os.path.join(REPO, 'static'), static,
+                    ignore=shutil.ignore_patterns('dist', 'fast_timetable.json'))
+    os.environ['STATIC_FOLDER'] = str(static)
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import app
+        yield app
+    finally:
+        os.chdir(previous_cwd)
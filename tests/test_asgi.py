@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def asgi(supergui):
+    import asgi
+    return asgi
+
+
+def call(application, method, path, body=b'', headers=()):
+    """Send one HTTP request through the ASGI app, return (status, headers, body)"""
+    scope = {'type': 'http', 'http_version': '1.1', 'scheme': 'http', 'root_path': '',
+             'method': method, 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+             'headers': list(headers), 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000)}
+    incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start = sent[0]
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def test_async_view_routes(asgi):
+    assert asgi.async_view('GET', '/api/weather') is asgi.weather_view
+    assert asgi.async_view('POST', '/api/weather') is None
+    assert asgi.async_view('GET', '/') is None
+    view = asgi.async_view('GET', '/api/isy/message/abc123')
+    assert view.func is asgi.isy_message_view and view.args == ('abc123',)
+    assert asgi.async_view('GET', '/api/isy/message/') is None
+    assert asgi.async_view('GET', '/api/isy/message/a/b') is None
+
+
+def test_build_environ(asgi):
+    scope = {'method': 'POST', 'path': '/api/ai/chat', 'query_string': b'x=1',
+             'headers': [(b'content-type', b'application/json'), (b'content-length', b'2'),
+                         (b'accept', b'text/html'), (b'accept', b'application/json'),
+                         (b'x-forwarded-for', b'10.0.0.1')],
+             'client': ('127.0.0.1', 5000)}
+    environ = asgi.build_environ(scope, b'{}')
+    assert environ['REQUEST_METHOD'] == 'POST'
+    assert environ['PATH_INFO'] == '/api/ai/chat' and environ['QUERY_STRING'] == 'x=1'
+    assert environ['CONTENT_TYPE'] == 'application/json'
+    # The length comes from the body that was read, not from the header
+    assert environ['CONTENT_LENGTH'] == '2' and 'HTTP_CONTENT_LENGTH' not in environ
+    assert environ['HTTP_ACCEPT'] == 'text/html,application/json'
+    assert environ['HTTP_X_FORWARDED_FOR'] == '10.0.0.1'
+    assert environ['REMOTE_ADDR'] == '127.0.0.1'
+    assert environ['SERVER_NAME'] == 'localhost' and environ['wsgi.input'].read() == b'{}'
+
+
+def test_async_route_runs_in_flask_request_context(asgi):
+    status, headers, body = call(asgi.application, 'GET', '/api/isy/messages')
+    assert status == 401
+    assert headers[b'content-type'] == b'application/json'
+    assert json.loads(body)['login_required'] is True
+
+
+def test_other_routes_go_to_the_flask_app(asgi):
+    status, _headers, _body = call(asgi.application, 'GET', '/api/does-not-exist')
+    assert status == 404
@@ -0,0 +1,51 @@
+import json
+
+from flask import Flask
+
+from fastjson import FastJSONProvider, dumps_bytes, fragment
+
+
+def make_app():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    return app
+
+
+def test_fragment_is_spliced_verbatim():
+    lesson = fragment({'summary': 'Mathematik', 'room': 'A1'})
+    data = json.loads(dumps_bytes({'lessons': [lesson, lesson], 'count': 2}))
+    assert data == {'lessons': [{'summary': 'Mathematik', 'room': 'A1'}] * 2, 'count': 2}
+
+
+def test_dumps_is_compact_and_keeps_umlauts():
+    assert make_app().json.dumps({'b': 'Prüfung', 'a': 1}) == '{"b":"Prüfung","a":1}'
+
+
+def test_dumps_honours_formatting_kwargs():
+    provider = make_app().json
+    assert provider.dumps({'b': 1, 'a': 2}, sort_keys=True) == '{"a": 2, "b": 1}'
+    assert provider.dumps([1], indent=2) == '[\n  1\n]'
+
+
+def test_jsonify_handles_fragments():
+    app = make_app()
+    with app.app_context():
+        response = app.json.response({'lesson': fragment({'summary': 'Chemie'})})
+    assert response.get_json() == {'lesson': {'summary': 'Chemie'}}
+
+
+def test_formatting_kwargs_expand_fragments():
+    provider = make_app().json
+    data = {'b': fragment({'y': 1, 'x': 2}), 'a': 0}
+    assert provider.dumps(data, sort_keys=True) == '{"a": 0, "b": {"x": 2, "y": 1}}'
+
+
+def test_tojson_filter_splices_fragments(supergui):
+    with supergui.app.app_context():
+        rendered = supergui.app.jinja_env.from_string('{{ value|tojson }}').render(
+            value={'lesson': fragment({'summary': 'Chemie'})})
+    assert rendered == '{"lesson":{"summary":"Chemie"}}'
+
+
+def test_index_page_renders(supergui):
+    assert supergui.app.test_client().get('/').status_code == 200
@@ -0,0 +1,68 @@
+import calendar
+import os
+
+from ics_parser import CSV_FIELDNAMES, decode_lines, event_to_csv_row, iter_ics_events, unfold_lines
+from lessons import event_from_csv_row, event_from_ics
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_timetable.ics')
+
+
+def utc(*args):
+    return calendar.timegm(args + (0,) * (6 - len(args)))
+
+
+def test_unfold_lines_joins_continuations():
+    lines = ['SUMMARY:M sig\r\n', ' 1Mf HL3.01\r\n', '\tX\r\n', 'UID:1\n']
+    assert list(unfold_lines(lines)) == ['SUMMARY:M sig1Mf HL3.01X', 'UID:1']
+
+
+def test_parses_the_sample_feed():
+    with open(SAMPLE, 'rb') as f:
+        events = list(iter_ics_events(decode_lines(f)))
+    assert len(events) == 8
+    first = events[0]
+    assert first == {'Subject': 'M sig 1Mf HL3.01', 'UID': 'lesson1@ksr.ch',
+                     'start_ts': utc(2025, 11, 14, 8), 'end_ts': utc(2025, 11, 14, 9, 30)}
+    assert any('(Prüfung)' in e['Subject'] for e in events)
+
+
+def test_parsing_is_lazy():
+    consumed = []
+
+    def lines():
+        for line in ['BEGIN:VCALENDAR', 'BEGIN:VEVENT', 'SUMMARY:A', 'DTSTART:20251114T080000Z', 'END:VEVENT',
+                     'BEGIN:VEVENT', 'SUMMARY:B', 'END:VEVENT', 'END:VCALENDAR']:
+            consumed.append(line)
+            yield line + '\r\n'
+
+    events = iter_ics_events(lines())
+    assert next(events)['Subject'] == 'A'
+    # Only read up to the line after the first event (the unfolder looks one line ahead)
+    assert consumed[-1] == 'BEGIN:VEVENT'
+    assert [e['Subject'] for e in events] == ['B']
+
+
+def test_events_without_data_and_lines_outside_events_are_skipped():
+    lines = ['SUMMARY:outside\n', 'BEGIN:VEVENT\n', 'UID:empty\n', 'END:VEVENT\n',
+             'BEGIN:VEVENT\n', 'DTSTART:20251114T080000Z\n', 'DTEND:bad\n', 'END:VEVENT\n']
+    events = list(iter_ics_events(lines))
+    assert events == [{'Subject': '', 'UID': '', 'start_ts': utc(2025, 11, 14, 8), 'end_ts': None}]
+
+
+def test_decode_lines_reports_progress_and_ignores_bad_bytes():
+    progress = []
+    lines = list(decode_lines([b'SUMMARY:Pr\xc3\xbcfung\r\n', b'UID:\xff1\r\n'], progress.append))
+    assert lines == ['SUMMARY:Prüfung\r\n', 'UID:1\r\n']
+    assert progress == [18, 26]
+
+
+def test_csv_rows_are_utc_and_load_back():
+    ics_event = {'Subject': 'GG sig 1Mf P1.09 (Prüfung)', 'UID': 'exam1',
+                 'start_ts': utc(2025, 11, 20, 9), 'end_ts': utc(2025, 11, 20, 11)}
+    row = event_to_csv_row(ics_event)
+    assert list(row) == CSV_FIELDNAMES
+    assert (row['Start Date'], row['Start Time'], row['End Time']) == ('11/20/2025', '09:00', '11:00')
+    loaded, direct = event_from_csv_row(row), event_from_ics(ics_event)
+    for field in ('summary', 'start_ts', 'end_ts', 'location', 'is_exam'):
+        assert loaded[field] == direct[field]
+    assert loaded['is_exam'] and loaded['location'] == 'P1.09'
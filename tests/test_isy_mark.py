@@ -0,0 +1,144 @@
+import json
+
+import pytest
+import requests
+from flask import request, session
+
+from upstream import UpstreamUnavailable
+
+USER = 'student'
+
+# Message.me has a type name the app can't guess; the mutation comes from the schema
+SCHEMA = {
+    'message': {'fields': [{'name': 'me', 'type': {'name': 'MessagePersonState', 'ofType': None}}]},
+    'schema': {'mutationType': {'fields': [
+        {'name': 'updateMessagePersonState', 'type': {
+            'name': None, 'fields': None,
+            'ofType': {'name': 'updateMessagePersonStatePayload', 'fields': [{'name': 'messagePersonState'}]}
+        }}
+    ]}}
+}
+
+
+def response(data, status=200):
+    result = requests.Response()
+    result.status_code = status
+    result._content = json.dumps(data).encode('utf-8')
+    return result
+
+
+def run(supergui, updates, isy):
+    """
+    Run isy_mark_messages_flow against a fake ISY
+    isy(operation, query, variables) returns the JSON body or an exception to raise.
+    Returns (status, body, operations sent).
+    """
+    sent = []
+    with supergui.app.test_request_context('/api/isy/messages/mark', method='POST', json={'updates': updates}):
+        session['isy_token'] = 'token'
+        request.isy_username = USER
+        flow = supergui.isy_mark_messages_flow()
+        result, error = None, None
+        while True:
+            try:
+                call = flow.throw(error) if error is not None else flow.send(result)
+            except StopIteration as stop:
+                rv = supergui.app.make_response(stop.value)
+                return rv.status_code, rv.get_json(), sent
+            payload = call.kwargs['json']
+            sent.append(payload['operationName'])
+            answer = isy(payload['operationName'], payload['query'], payload['variables'])
+            result, error = (None, answer) if isinstance(answer, Exception) else (response(answer), None)
+
+
+def message(number, me_id=True):
+    return {
+        'id': f'/messages/{number}', 'title': f'Mitteilung {number}', 'iHaveReadIt': False,
+        'readWhen': None, 'seenWhen': None, 'meId': f'/states/{number}' if me_id else None
+    }
+
+
+@pytest.fixture
+def cached(supergui):
+    supergui._isy_state_mutation.clear()
+    supergui.remember_isy_messages(USER, 'todo', [message(1001), message(1002, me_id=False), message(1003)])
+    supergui.remember_isy_messages(USER, 'inbox', [message(1001)])
+    yield lambda kind, number: supergui._isy_message_store[USER][kind][f'/messages/{number}']
+    supergui._isy_message_store.pop(USER, None)
+
+
+def test_batch_is_one_aliased_mutation_and_rejections_are_restored(supergui, cached):
+    mutations = []
+
+    def isy(operation, query, variables):
+        if operation == 'stateMutation':
+            return {'data': SCHEMA}
+        if operation == 'messageStates':
+            assert variables == {'q0': '/messages/1002'}
+            return {'data': {'q0': {'id': '/messages/1002', 'me': {'id': '/states/1002'}}}}
+        mutations.append((query, variables))
+        # ISY refuses the third alias
+        return {
+            'data': {'m0': {'messagePersonState': {'id': '/states/1001'}},
+                     'm1': {'messagePersonState': {'id': '/states/1002'}}, 'm2': None},
+            'errors': [{'message': 'Access denied', 'path': ['m2']}]
+        }
+
+    status, body, sent = run(supergui, [
+        {'id': 1001, 'read': True},
+        {'id': '/messages/1002', 'seen': True},
+        {'id': 1003, 'read': True},
+        {'id': 1001, 'seen': True}
+    ], isy)
+
+    assert status == 200
+    assert body == {'success': False, 'updated': [1001, '/messages/1002'], 'failed': [1003]}
+    assert sent == ['stateMutation', 'messageStates', 'markMessages']
+    query, variables = mutations[0]
+    assert query.count('updateMessagePersonState(') == 3
+    assert 'm0: updateMessagePersonState(' in query and 'messagePersonState {' in query
+    # Both updates of 1001 were merged into one alias
+    assert variables['m0'] == '/states/1001'
+    assert variables['m0readWhen'] and variables['m0seenWhen']
+    # Accepted: both cached copies show the new state
+    for kind in ('todo', 'inbox'):
+        assert cached(kind, 1001)['iHaveReadIt'] and cached(kind, 1001)['seenWhen']
+    assert cached('todo', 1002)['seenWhen']
+    # Rejected: back to what ISY has
+    assert cached('todo', 1003)['readWhen'] is None and not cached('todo', 1003)['iHaveReadIt']
+
+
+def test_unreachable_isy_restores_the_optimistic_state(supergui, cached):
+    def isy(operation, query, variables):
+        if operation == 'stateMutation':
+            return {'data': SCHEMA}
+        return UpstreamUnavailable('isy: circuit open')
+
+    status, body, sent = run(supergui, [{'id': 1001, 'read': True}], isy)
+    assert status == 503 and body['failed'] == [1001]
+    assert sent == ['stateMutation', 'markMessages']
+    assert cached('todo', 1001)['readWhen'] is None and not cached('inbox', 1001)['iHaveReadIt']
+
+
+def test_missing_mutation_marks_nothing(supergui, cached):
+    schema = dict(SCHEMA, schema={'mutationType': {'fields': []}})
+
+    def isy(operation, query, variables):
+        assert operation == 'stateMutation'
+        return {'data': schema}
+
+    for _ in range(2):
+        status, body, sent = run(supergui, [{'id': 1001, 'read': True}], isy)
+        assert status == 501 and body['failed'] == [1001]
+    # The schema is only read once
+    assert sent == []
+    assert cached('todo', 1001)['readWhen'] is None
+
+
+def test_invalid_updates_are_rejected_before_isy(supergui, cached):
+    def isy(operation, query, variables):
+        raise AssertionError('ISY must not be called')
+
+    assert run(supergui, [{'id': 'abc', 'read': True}], isy)[0] == 400
+    assert run(supergui, [{'id': 1001, 'read': 'yes'}], isy)[0] == 400
+    assert run(supergui, [], isy)[0] == 400
@@ -0,0 +1,87 @@
+import calendar
+
+import pytest
+
+from event_store import EventStore
+from lessons import build_event
+from room_index import RoomIndex
+from shared_cache import SharedTimetableCache
+
+
+def utc(*args):
+    return calendar.timegm(args + (0,) * (6 - len(args)))
+
+
+def at(hour, minute=0):
+    return utc(2025, 11, 17, hour, minute)
+
+
+def booking(start, end, summary='Mathematik', feeds=1):
+    return (start, end, summary, summary, feeds)
+
+
+@pytest.fixture
+def index():
+    index = RoomIndex()
+    index.load([
+        ('HL3.01', *booking(at(7), at(7, 45))),
+        ('HL3.01', *booking(at(9), at(9, 45))),
+        # A long block: found even when the query starts long after it began
+        ('TH1', *booking(at(7), at(11), 'Sporttag')),
+        ('TH1', *booking(at(12), at(12, 45), 'Sport')),
+        ('N2.03', *booking(at(8), at(8, 45), 'Biologie', feeds=3))
+    ], cursor=5)
+    return index
+
+
+def test_rooms_and_case_insensitive_lookup(index):
+    assert index.rooms() == ['HL3.01', 'N2.03', 'TH1']
+    assert index.find(' hl3.01 ') == 'HL3.01'
+    assert index.find('X1') is None
+    assert index.cursor == 5 and len(index) == 3
+
+
+def test_free_rooms_at_an_instant(index):
+    free, occupied = index.free_rooms(at(8, 10))
+    assert free == [('HL3.01', at(9))]
+    assert [(room, b[2]) for room, b in occupied] == [('N2.03', 'Biologie'), ('TH1', 'Sporttag')]
+
+
+def test_free_rooms_for_a_period(index):
+    # Touching bookings don't overlap: HL3.01 is free from 07:45 until 09:00
+    free, occupied = index.free_rooms(at(7, 45), at(9))
+    assert ('HL3.01', at(9)) in free
+    assert [room for room, _b in occupied] == ['N2.03', 'TH1']
+    free, _occupied = index.free_rooms(at(13), at(14))
+    assert free == [('HL3.01', None), ('N2.03', None), ('TH1', None)]
+
+
+def test_schedule(index):
+    assert [b[0] for b in index.schedule('TH1', at(10), at(13))] == [at(7), at(12)]
+    assert index.schedule('HL3.01', at(7, 45), at(9)) == []
+
+
+def test_set_room_replaces_and_removes(index):
+    index.set_room('HL3.01', [booking(at(8), at(10))])
+    assert index.free_rooms(at(9, 30))[0] == [('N2.03', None)]
+    index.set_room('N2.03', [])
+    assert index.rooms() == ['HL3.01', 'TH1'] and index.find('n2.03') is None
+
+
+def test_bookings_from_the_event_store(tmp_path):
+    store = EventStore(SharedTimetableCache(str(tmp_path / 'supergui.db')))
+    lesson = ('BIO hub 1Mf N2.03', at(8), at(8, 45))
+    with store.shared.transaction() as conn:
+        # The same lesson in two class feeds is one booking; cancelled lessons are none
+        store.upsert(conn, '1Mf', [build_event(*lesson)], seen_at=0)
+        store.upsert(conn, '1Na', [build_event(*lesson),
+                                   build_event('M sig 1Na HL3.01', at(9), at(9, 45), description='Entfällt')],
+                     seen_at=0)
+        store.record_room_updates(conn, {'N2.03', 'HL3.01'}, 0)
+    index = RoomIndex()
+    index.load(store.room_bookings(), store.latest_room_update())
+    assert index.rooms() == ['N2.03']
+    [(room, found)] = index.free_rooms(at(8, 30))[1]
+    assert room == 'N2.03' and found[-1] == 2
+    assert store.room_updates_since(0) == (2, {'N2.03', 'HL3.01'})
+    assert store.room_updates_since(2) == (2, set())
@@ -0,0 +1,102 @@
+from search_index import SearchIndex, normalize, tokenize
+
+NOW = 1_000_000
+
+
+def doc(text, rank_time=None, payload=None, weight=1):
+    return ([(text, weight)], payload or {'text': text}, rank_time)
+
+
+def texts(results):
+    return [r['text'] for r in results]
+
+
+def test_normalize_folds_umlauts_and_digraphs():
+    assert normalize('Prüfung') == normalize('Pruefung') == normalize('PRUFUNG') == 'prufung'
+    assert normalize('Straße') == 'strasse'
+
+
+def test_tokenize_drops_stopwords_and_stems():
+    assert tokenize('Wann ist die nächste Prüfung?') == ['prufung']
+    assert tokenize('Prüfungen') == tokenize('Prüfung')
+    # Rooms and numbers stay whole
+    assert tokenize('Raum HL3.01') == ['raum', 'hl3.01']
+    assert tokenize('') == []
+
+
+def test_search_matches_prefixes_and_ranks_exact_first():
+    index = SearchIndex()
+    index.sync_group('lessons', {
+        'chem': doc('Chemie', NOW + 10),
+        'chemlab': doc('Chemielabor', NOW + 20),
+        'math': doc('Mathematik', NOW + 30)
+    })
+    assert texts(index.search('chem', now=NOW)) == ['Chemie', 'Chemielabor']
+    assert texts(index.search('Chemie', now=NOW))[0] == 'Chemie'
+    assert index.search('Physik', now=NOW) == []
+    assert index.search('die und', now=NOW) == []
+
+
+def test_field_weights_and_matched_share_decide_the_score():
+    index = SearchIndex()
+    index.sync_group('lessons', {
+        'title': ([('Mathematik', 3), ('Algebra', 1)], {'text': 'title'}, NOW),
+        'note': ([('Englisch', 3), ('Mathematik', 1)], {'text': 'note'}, NOW),
+        'both': ([('Mathematik', 1), ('Algebra', 1)], {'text': 'both'}, NOW)
+    })
+    assert texts(index.search('Mathematik', now=NOW)) == ['title', 'both', 'note']
+    assert texts(index.search('Mathematik Algebra', now=NOW))[:2] == ['title', 'both']
+
+
+def test_ties_prefer_upcoming_soonest_then_recent_past():
+    index = SearchIndex()
+    index.sync_group('lessons', {
+        'past_old': doc('Deutsch', NOW - 500, {'text': 'past_old'}),
+        'past_recent': doc('Deutsch', NOW - 100, {'text': 'past_recent'}),
+        'later': doc('Deutsch', NOW + 500, {'text': 'later'}),
+        'soon': doc('Deutsch', NOW + 100, {'text': 'soon'})
+    })
+    assert texts(index.search('Deutsch', now=NOW)) == ['soon', 'later', 'past_recent', 'past_old']
+    assert texts(index.search('Deutsch', now=NOW, limit=2)) == ['soon', 'later']
+
+
+def test_owned_documents_are_only_visible_to_their_owner():
+    index = SearchIndex()
+    index.sync_group('lessons', {'lesson': doc('Sporttag')})
+    index.sync_group('messages:anna', {'msg': doc('Sporttag verschoben')}, owner='anna')
+    assert len(index.search('Sporttag', now=NOW)) == 1
+    assert len(index.search('Sporttag', now=NOW, owner='ben')) == 1
+    assert len(index.search('Sporttag', now=NOW, owner='anna')) == 2
+
+
+def test_sync_group_only_touches_changed_documents():
+    index = SearchIndex()
+    docs = {'a': doc('Mathematik'), 'b': doc('Deutsch')}
+    assert index.sync_group('lessons', docs) == 2
+    assert index.sync_group('lessons', dict(docs)) == 0
+    assert index.sync_group('lessons', {'a': doc('Mathematik'), 'c': doc('Englisch')}) == 2
+    assert len(index) == 2
+    assert index.search('Deutsch', now=NOW) == []
+    # Other groups are left alone
+    index.sync_group('exams', {'x': doc('Deutsch')})
+    index.sync_group('lessons', {})
+    assert texts(index.search('Deutsch', now=NOW)) == ['Deutsch']
+
+
+def test_patch_group_changes_only_the_given_documents():
+    index = SearchIndex()
+    index.sync_group('lessons', {'a': doc('Mathematik'), 'b': doc('Deutsch')})
+    assert index.patch_group('lessons', {'b': doc('Englisch')}, removed=['a']) == 2
+    assert texts(index.search('Englisch', now=NOW)) == ['Englisch']
+    assert index.search('Mathematik', now=NOW) == [] and index.search('Deutsch', now=NOW) == []
+    # Removing a document of another group does nothing
+    index.sync_group('exams', {'x': doc('Chemie')})
+    assert index.patch_group('lessons', {}, removed=['x']) == 0
+    assert texts(index.search('Chemie', now=NOW)) == ['Chemie']
+
+
+def test_results_carry_payload_and_score():
+    index = SearchIndex()
+    index.sync_group('lessons', {'a': doc('Chemie', NOW, {'type': 'lesson', 'text': 'Chemie'})})
+    [result] = index.search('Chemie', now=NOW)
+    assert result['type'] == 'lesson' and result['score'] > 0
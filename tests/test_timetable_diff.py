@@ -0,0 +1,80 @@
+import calendar
+
+from event_store import event_key
+from lessons import build_event
+from timetable_diff import (ADDED, CANCELLED, MOVED, REMOVED, ROOM_CHANGED, UPDATED, affected_keys,
+                            affected_rooms, diff_events)
+
+
+def utc(*args):
+    return calendar.timegm(args + (0,) * (6 - len(args)))
+
+
+def lesson(summary, hour, day=17, uid='', description='', minutes=45):
+    start = utc(2025, 11, day, hour)
+    return build_event(summary, start, start + minutes * 60, description=description, uid=uid)
+
+
+def kinds(changes):
+    return [c['kind'] for c in changes]
+
+
+def test_identical_snapshots_have_no_changes():
+    events = [lesson('M sig 1Mf HL3.01', 7, uid='a'), lesson('D mur 1Mf HR3.06', 8)]
+    assert diff_events(events, [dict(e) for e in events]) == []
+
+
+def test_classification_with_uids():
+    old = [lesson('M sig 1Mf HL3.01', 7, uid='m'), lesson('D mur 1Mf HR3.06', 8, uid='d'),
+           lesson('E kel 1Mf HR2.04', 9, uid='e'), lesson('F bru 1Mf HR2.11', 10, uid='f')]
+    new = [lesson('M sig 1Mf HL3.01', 7, uid='m', description='Ausgefallen'),
+           lesson('D mur 1Mf HR3.06', 12, uid='d'),
+           lesson('E kel 1Mf HR1.01', 9, uid='e'),
+           lesson('F bru 1Mf HR2.11', 10, uid='f', description='Vokabeltest')]
+    changes = diff_events(old, new)
+    assert kinds(changes) == [CANCELLED, ROOM_CHANGED, UPDATED, MOVED]
+    moved = changes[-1]
+    assert moved['before']['start_ts'] == utc(2025, 11, 17, 8) and moved['start_ts'] == utc(2025, 11, 17, 12)
+
+
+def test_added_and_removed():
+    old = [lesson('M sig 1Mf HL3.01', 7, uid='m')]
+    new = [lesson('D mur 1Mf HR3.06', 8, uid='d')]
+    changes = diff_events(old, new)
+    assert kinds(changes) == [REMOVED, ADDED]
+    assert 'before' not in changes[0] and 'before' not in changes[1]
+
+
+def test_uidless_room_change_is_paired_up():
+    # Without a UID the key contains the summary, so a new room means a new key
+    old = [lesson('M sig 1Mf HL3.01', 7)]
+    new = [lesson('M sig 1Mf HL1.12', 7)]
+    assert event_key(old[0]) != event_key(new[0])
+    changes = diff_events(old, new)
+    assert kinds(changes) == [ROOM_CHANGED]
+    assert changes[0]['before']['location'] == 'HL3.01' and changes[0]['location'] == 'HL1.12'
+
+
+def test_uidless_lesson_moved_within_the_day_is_paired_up():
+    old = [lesson('M sig 1Mf HL3.01', 7)]
+    new = [lesson('M sig 1Mf HL3.01', 13)]
+    assert kinds(diff_events(old, new)) == [MOVED]
+    # Moved to another day: no longer the same lesson
+    assert kinds(diff_events(old, [lesson('M sig 1Mf HL3.01', 7, day=18)])) == [REMOVED, ADDED]
+
+
+def test_affected_keys():
+    old = [lesson('M sig 1Mf HL3.01', 7), lesson('D mur 1Mf HR3.06', 8, uid='d')]
+    new = [lesson('M sig 1Mf HL1.12', 7)]
+    changes = diff_events(old, new)
+    removed, changed = affected_keys(changes)
+    assert changed == {event_key(new[0])}
+    assert removed == {event_key(old[0]), event_key(old[1])}
+
+
+def test_affected_rooms():
+    old = [lesson('M sig 1Mf HL3.01', 7), lesson('D mur 1Mf HR3.06', 8, uid='d')]
+    new = [lesson('M sig 1Mf HL1.12', 7), lesson('D mur 1Mf HR3.06', 8, uid='d'), lesson('SP gra 1Mf', 9)]
+    assert affected_rooms(diff_events(old, new), old, new) == {'HL3.01', 'HL1.12'}
+    # First import: every room of both snapshots, without lessons that have none
+    assert affected_rooms(None, old, new) == {'HL3.01', 'HL1.12', 'HR3.06'}
@@ -0,0 +1,69 @@
+import calendar
+import csv
+import io
+
+from ics_parser import iter_ics_events, unfold_lines
+from lessons import build_event, event_from_csv_row
+from timetable_export import csv_chunks, ics_chunks
+
+
+def utc(*args):
+    return calendar.timegm(args + (0,) * (6 - len(args)))
+
+
+def sample_events():
+    return [
+        # Summer time (UTC+2) and winter time (UTC+1)
+        build_event('M mue 3Ma H1.03', utc(2025, 6, 2, 6, 35), utc(2025, 6, 2, 7, 20)),
+        build_event('CH abc 3Ma (Prüfung) N2.05', utc(2025, 11, 14, 8, 0), utc(2025, 11, 14, 9, 30),
+                    description='Kapitel 1-4'),
+        build_event('D xyz 3Ma H2.01', utc(2025, 11, 17, 12, 0), utc(2025, 11, 17, 12, 45),
+                    description='Entfällt, Lehrperson krank')
+    ]
+
+
+def read_csv(chunks):
+    return [event_from_csv_row(row) for row in csv.DictReader(io.StringIO(''.join(chunks)))]
+
+
+def test_csv_export_round_trips_through_the_csv_loader():
+    events = sample_events()
+    loaded = read_csv(csv_chunks(events))
+    fields = ('summary', 'original_summary', 'start_ts', 'end_ts', 'day', 'description',
+              'location', 'is_exam', 'is_cancelled', 'special_note')
+    assert [[e[f] for f in fields] for e in loaded] == [[e[f] for f in fields] for e in events]
+
+
+def test_csv_export_of_exams_keeps_the_exam_marker():
+    exams = [e for e in sample_events() if e['is_exam']]
+    loaded = read_csv(csv_chunks(exams))
+    assert len(loaded) == 1 and loaded[0]['is_exam']
+    assert loaded[0]['summary'] == 'Chemie (N2.05)'
+
+
+def test_csv_export_writes_utc_times():
+    text = ''.join(csv_chunks(sample_events()[:1]))
+    assert text.splitlines()[1] == 'M mue 3Ma H1.03,06/02/2025,06:35,06/02/2025,07:20,,H1.03'
+
+
+def test_ics_export_parses_back():
+    events = sample_events()
+    parsed = list(iter_ics_events(''.join(ics_chunks(events, dtstamp=utc(2025, 11, 1))).splitlines(True)))
+    assert [(p['start_ts'], p['end_ts']) for p in parsed] == [(e['start_ts'], e['end_ts']) for e in events]
+    assert [p['Subject'] for p in parsed] == [e['summary'] for e in events]
+
+
+def test_ics_export_marks_exams_and_cancellations():
+    text = ''.join(ics_chunks(sample_events(), dtstamp=utc(2025, 11, 1)))
+    assert text.count('CATEGORIES:Prüfung') == 1
+    assert text.count('STATUS:CANCELLED') == 1
+    assert text.startswith('BEGIN:VCALENDAR\r\n') and text.endswith('END:VCALENDAR\r\n')
+
+
+def test_ics_lines_are_folded_and_escaped():
+    event = build_event('D xyz 3Ma H2.01', utc(2025, 11, 17, 12, 0), utc(2025, 11, 17, 12, 45),
+                        description='Lektüre; Kapitel 1, 2 und 3 – ' + 'ä' * 60)
+    text = ''.join(ics_chunks([event], dtstamp=utc(2025, 11, 1)))
+    assert all(len(line.encode('utf-8')) <= 75 for line in text.split('\r\n'))
+    description = next(line for line in unfold_lines(text.split('\r\n')) if line.startswith('DESCRIPTION:'))
+    assert description == 'DESCRIPTION:Lektüre\\; Kapitel 1\\, 2 und 3 – ' + 'ä' * 60
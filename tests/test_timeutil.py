@@ -0,0 +1,92 @@
+import calendar
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from flask import Flask
+
+from timeutil import (format_csv_utc, format_ics_utc, local_day, local_day_start, parse_csv_utc,
+                      parse_ics_utc, parse_local_iso, request_now, to_local, utc_offset)
+
+ZURICH = ZoneInfo('Europe/Zurich')
+
+
+def utc(*args):
+    return calendar.timegm(args + (0,) * (6 - len(args)))
+
+
+@pytest.mark.parametrize('ts', [
+    utc(2025, 1, 15, 12),
+    utc(2025, 7, 1, 6, 35),
+    # Around the switches: 30 March 2025 01:00 UTC and 26 October 2025 01:00 UTC
+    utc(2025, 3, 30, 0, 59, 59), utc(2025, 3, 30, 1), utc(2025, 3, 30, 23, 30),
+    utc(2025, 10, 26, 0, 59, 59), utc(2025, 10, 26, 1), utc(2025, 10, 25, 22, 30)
+])
+def test_to_local_matches_zoneinfo(ts):
+    expected = datetime.fromtimestamp(ts, ZURICH)
+    local = to_local(ts)
+    assert local.replace(tzinfo=None) == expected.replace(tzinfo=None)
+    assert local.utcoffset() == expected.utcoffset()
+    assert utc_offset(ts) == expected.utcoffset().total_seconds()
+
+
+def test_offsets_switch_exactly_at_the_dst_change():
+    assert utc_offset(utc(2025, 3, 30, 0, 59, 59)) == 3600
+    assert utc_offset(utc(2025, 3, 30, 1)) == 7200
+    assert utc_offset(utc(2025, 10, 26, 0, 59, 59)) == 7200
+    assert utc_offset(utc(2025, 10, 26, 1)) == 3600
+
+
+def test_local_day_counts_local_midnights():
+    # 23:30 UTC on 31 December is already New Year in Zurich
+    new_year = local_day(utc(2024, 12, 31, 23, 30))
+    assert new_year == local_day(utc(2025, 1, 1, 12))
+    assert new_year == local_day(utc(2024, 12, 31, 22, 59)) + 1
+    assert local_day_start(new_year) == utc(2024, 12, 31, 23)
+
+
+@pytest.mark.parametrize('day', [(2025, 3, 30), (2025, 3, 31), (2025, 10, 26), (2025, 10, 27), (2025, 6, 1)])
+def test_local_day_start_is_local_midnight(day):
+    midnight = int(datetime(*day, tzinfo=ZURICH).timestamp())
+    number = local_day(midnight)
+    assert local_day_start(number) == midnight
+    assert local_day(midnight - 1) == number - 1
+
+
+def test_switch_days_are_23_and_25_hours_long():
+    spring = local_day(utc(2025, 3, 30, 12))
+    autumn = local_day(utc(2025, 10, 26, 12))
+    assert local_day_start(spring + 1) - local_day_start(spring) == 23 * 3600
+    assert local_day_start(autumn + 1) - local_day_start(autumn) == 25 * 3600
+
+
+def test_parse_local_iso():
+    assert parse_local_iso('2025-11-14T08:00') == utc(2025, 11, 14, 7)
+    assert parse_local_iso('2025-07-01') == utc(2025, 6, 30, 22)
+    assert parse_local_iso('2025-11-14T08:00:00+00:00') == utc(2025, 11, 14, 8)
+    with pytest.raises(ValueError):
+        parse_local_iso('14.11.2025')
+
+
+def test_ics_stamps():
+    assert parse_ics_utc('20251114T080000Z') == utc(2025, 11, 14, 8)
+    assert parse_ics_utc(' 20251114T080000Z\r\n') == utc(2025, 11, 14, 8)
+    assert parse_ics_utc('20251114T080000') is None
+    assert parse_ics_utc('20251314T080000Z') is None
+    assert format_ics_utc(utc(2025, 11, 14, 8, 5, 9)) == '20251114T080509Z'
+
+
+def test_csv_times_are_utc():
+    ts = utc(2025, 7, 1, 6, 35)
+    assert format_csv_utc(ts) == ('07/01/2025', '06:35')
+    assert parse_csv_utc(*format_csv_utc(ts)) == ts
+
+
+def test_request_now_is_fixed_per_request(monkeypatch):
+    app = Flask(__name__)
+    clock = iter([1000.0, 2000.0, 3000.0])
+    monkeypatch.setattr('timeutil.time_module.time', lambda: next(clock))
+    with app.test_request_context():
+        assert request_now() == 1000
+        assert request_now() == 1000
+    assert request_now() == 2000
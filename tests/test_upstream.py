@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+import requests
+
+import upstream
+from upstream import CLOSED, HALF_OPEN, OPEN, Blocking, CircuitBreaker, Upstream, UpstreamUnavailable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream.time_module, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(upstream.time_module, 'sleep', clock.sleep)
+    return clock
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """Answers requests from a list of status codes or exceptions"""
+    calls = []
+    answers = []
+
+    def request(method, url, timeout=None, **kwargs):
+        calls.append((method, url))
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return Response(answer)
+
+    monkeypatch.setattr(upstream._session, 'request', request)
+    return calls, answers
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    clock.now += 10
+    assert breaker.retry_after() == 20
+
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.retry_after() == 0
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    assert breaker.retry_after() == 30
+
+
+def test_request_retries_then_succeeds(clock, session):
+    calls, answers = session
+    answers[:] = [requests.exceptions.ConnectionError('reset'), 503, 200]
+    service = Upstream('test', attempts=3, base_delay=0.01)
+    assert service.request('GET', 'https://example.invalid/a').status_code == 200
+    assert len(calls) == 3
+    assert service.breaker.state == CLOSED
+
+
+def test_client_errors_are_not_retried(clock, session):
+    calls, answers = session
+    answers[:] = [404]
+    service = Upstream('test')
+    assert service.request('GET', 'https://example.invalid/a').status_code == 404
+    assert len(calls) == 1
+
+
+def test_failure_is_cached_per_key(clock, session):
+    calls, answers = session
+    answers[:] = [500, 200]
+    service = Upstream('test', attempts=1, failure_threshold=5, negative_ttl=15)
+    with pytest.raises(UpstreamUnavailable, match='HTTP 500'):
+        service.request('GET', 'https://example.invalid/a')
+    # Same key fails fast without a request, other keys still go out
+    with pytest.raises(UpstreamUnavailable, match='recent failure'):
+        service.request('GET', 'https://example.invalid/a')
+    assert len(calls) == 1
+    assert service.request('GET', 'https://example.invalid/b').status_code == 200
+    clock.now += 15
+    answers.append(200)
+    assert service.request('GET', 'https://example.invalid/a').status_code == 200
+
+
+def test_open_circuit_fails_fast_and_probes_once(clock, session):
+    calls, answers = session
+    answers[:] = [500, 500]
+    service = Upstream('test', attempts=1, failure_threshold=2, reset_timeout=30, negative_ttl=0)
+    for path in ('a', 'b'):
+        with pytest.raises(UpstreamUnavailable):
+            service.request('GET', f'https://example.invalid/{path}')
+    with pytest.raises(UpstreamUnavailable, match='circuit open'):
+        service.request('GET', 'https://example.invalid/c')
+    assert len(calls) == 2
+    clock.now += 30
+    answers.append(200)
+    assert service.request('GET', 'https://example.invalid/c').status_code == 200
+    assert service.breaker.state == CLOSED
+
+
+def flow(service, log):
+    try:
+        yield service.call('GET', 'https://example.invalid/a')
+    except UpstreamUnavailable as e:
+        log.append(str(e))
+    value = yield Blocking(lambda: 41)
+    return value + 1
+
+
+def test_run_flow_passes_results_and_errors(clock, session):
+    _calls, answers = session
+    answers[:] = [500]
+    log = []
+    service = Upstream('test', attempts=1)
+    assert upstream.run_flow(flow(service, log)) == 42
+    assert log == ['test: HTTP 500']
+
+
+def test_run_flow_async_uses_async_variants(clock):
+    class Service:
+        def call(self, method, url):
+            return Blocking(None, self.fail)
+
+        async def fail(self):
+            raise UpstreamUnavailable('test: down')
+
+    log = []
+    assert asyncio.run(upstream.run_flow_async(flow(Service(), log))) == 42
+    assert log == ['test: down']
@@ -0,0 +1,143 @@
+"""
+Differences between two timetable snapshots
+
+Events are matched by their stable identity (event_store.event_key: the ICS
+UID, or start time + summary). Events without a UID change their key when
+they move or change room, so unmatched removed/added pairs are paired up
+again: same start and end means the room or summary changed, same summary
+on the same local day means the lesson was moved.
+
+Each difference is classified as exactly one kind, the most relevant one
+for a student first: cancelled, moved, room_changed, then updated for any
+other field (description, exam flag, ...). Events only in the new or old
+snapshot are added or removed.
+"""
+from event_store import event_key
+from timeutil import local_day
+
+ADDED = 'added'
+REMOVED = 'removed'
+MOVED = 'moved'
+ROOM_CHANGED = 'room_changed'
+CANCELLED = 'cancelled'
+UPDATED = 'updated'
+
+# Event fields stored in the event store, compared to detect any change
+COMPARED_FIELDS = ('uid', 'original_summary', 'summary', 'start_ts', 'end_ts', 'description',
+                   'location', 'is_exam', 'is_cancelled', 'special_note')
+
+
+def classify(old, new):
+    """Kind of change between two versions of the same event, None if equal"""
+    if all(old[f] == new[f] for f in COMPARED_FIELDS):
+        return None
+    if new['is_cancelled'] and not old['is_cancelled']:
+        return CANCELLED
+    if old['start_ts'] != new['start_ts'] or old['end_ts'] != new['end_ts']:
+        return MOVED
+    if old['location'] != new['location']:
+        return ROOM_CHANGED
+    return UPDATED
+
+
+def _subject(event):
+    return event['original_summary'].split()[0] if event['original_summary'] else ''
+
+
+def _pair_unmatched(removed, added):
+    """Pair UID-less events whose key changed; returns (pairs, removed, added) left over"""
+    pairs = []
+    for same in (lambda e: (e['start_ts'], e['end_ts'], _subject(e)),
+                 lambda e: (local_day(e['start_ts']), e['original_summary'])):
+        by_key = {}
+        for key, event in removed.items():
+            if not event['uid']:
+                by_key.setdefault(same(event), []).append(key)
+        for new_key, event in list(added.items()):
+            candidates = by_key.get(same(event)) if not event['uid'] else None
+            if candidates:
+                old_key = candidates.pop(0)
+                pairs.append((removed.pop(old_key), added.pop(new_key)))
+    return pairs, removed, added
+
+
+def change_record(kind, event, old=None):
+    """A change as stored in the change feed"""
+    record = {
+        'kind': kind,
+        'event_key': event_key(event),
+        'summary': event['summary'],
+        'start_ts': event['start_ts'],
+        'end_ts': event['end_ts'],
+        'location': event['location'],
+        'is_exam': event['is_exam']
+    }
+    if old is not None:
+        record['before'] = {
+            'event_key': event_key(old),
+            'summary': old['summary'],
+            'start_ts': old['start_ts'],
+            'end_ts': old['end_ts'],
+            'location': old['location'],
+            'is_exam': old['is_exam']
+        }
+    return record
+
+
+def diff_events(old_events, new_events):
+    """
+    Changes from old_events to new_events as a list of change records,
+    sorted by the (new) start time of the affected event
+    """
+    old_by_key = {event_key(e): e for e in old_events}
+    new_by_key = {event_key(e): e for e in new_events}
+
+    changes = []
+    for key, new in new_by_key.items():
+        old = old_by_key.get(key)
+        if old is not None:
+            kind = classify(old, new)
+            if kind:
+                changes.append(change_record(kind, new, old))
+
+    removed = {k: e for k, e in old_by_key.items() if k not in new_by_key}
+    added = {k: e for k, e in new_by_key.items() if k not in old_by_key}
+    pairs, removed, added = _pair_unmatched(removed, added)
+    for old, new in pairs:
+        changes.append(change_record(classify(old, new) or UPDATED, new, old))
+    changes.extend(change_record(ADDED, e) for e in added.values())
+    changes.extend(change_record(REMOVED, e) for e in removed.values())
+
+    changes.sort(key=lambda c: (c['start_ts'], c['event_key']))
+    return changes
+
+
+def affected_keys(changes):
+    """Event keys touched by changes, as (removed keys, added or changed keys)"""
+    removed, changed = set(), set()
+    for change in changes:
+        if change['kind'] == REMOVED:
+            removed.add(change['event_key'])
+            continue
+        changed.add(change['event_key'])
+        before = change.get('before')
+        if before and before['event_key'] != change['event_key']:
+            removed.add(before['event_key'])
+    return removed, changed
+
+
+def affected_rooms(changes, old_events=(), new_events=()):
+    """
+    Rooms whose bookings changed (before and after)
+    changes None means there is no diff (first import): all rooms of both snapshots.
+    """
+    if changes is None:
+        rooms = {e['location'] for e in old_events} | {e['location'] for e in new_events}
+    else:
+        rooms = set()
+        for change in changes:
+            rooms.add(change['location'])
+            if change.get('before'):
+                rooms.add(change['before']['location'])
+    rooms.discard('')
+    return rooms
@@ -0,0 +1,105 @@
+"""
+Timetable export as iCalendar and CSV
+
+Both writers take any iterable of events and yield the file piece by piece
+(one chunk per lesson), so /api/export.ics and /api/export.csv stream
+straight from the event store without building the file in memory.
+
+The CSV is a timetable.csv as the app stores and reads it: times in UTC
+and the original feed summary, which carries the subject, teacher and the
+"(Prüfung)" marker. An export can be uploaded again unchanged; for
+calendar apps the ICS file has the local times.
+"""
+import csv
+import io
+
+from event_store import event_key
+from ics_parser import CSV_FIELDNAMES
+from timeutil import format_csv_utc, format_ics_utc
+
+ICS_PRODID = '-//SuperGUI//Stundenplan//DE'
+
+
+def _ics_text(value):
+    """Escape a TEXT value (RFC 5545 3.3.11)"""
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _ics_line(line):
+    """Fold a content line into 75-octet pieces, CRLF-terminated"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    pieces, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Don't split a UTF-8 sequence (continuation bytes are 0b10xxxxxx)
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        pieces.append(data[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def ics_chunks(events, dtstamp, name='Stundenplan'):
+    """iCalendar file for events as str chunks; dtstamp: epoch seconds of the export's data"""
+    yield ''.join(_ics_line(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{ICS_PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_ics_text(name)}',
+        'X-WR-TIMEZONE:Europe/Zurich'
+    ))
+    stamp = format_ics_utc(dtstamp)
+    for event in events:
+        description = ' - '.join(part for part in (event['special_note'], event['description']) if part)
+        lines = [
+            'BEGIN:VEVENT',
+            f"UID:{_ics_text(event['uid'] or event_key(event) + '@supergui')}",
+            f'DTSTAMP:{stamp}',
+            f"DTSTART:{format_ics_utc(event['start_ts'])}",
+            f"DTEND:{format_ics_utc(event['end_ts'])}",
+            f"SUMMARY:{_ics_text(event['summary'])}"
+        ]
+        if description:
+            lines.append(f'DESCRIPTION:{_ics_text(description)}')
+        if event['location']:
+            lines.append(f"LOCATION:{_ics_text(event['location'])}")
+        if event['is_exam']:
+            lines.append('CATEGORIES:Prüfung')
+        if event['is_cancelled']:
+            lines.append('STATUS:CANCELLED')
+        lines.append('END:VEVENT')
+        yield ''.join(_ics_line(line) for line in lines)
+    yield _ics_line('END:VCALENDAR')
+
+
+def csv_chunks(events):
+    """CSV file for events as str chunks, in the format of uploads/timetable.csv"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDNAMES)
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writeheader()
+    yield flush()
+    for event in events:
+        start_date, start_time = format_csv_utc(event['start_ts'])
+        end_date, end_time = format_csv_utc(event['end_ts'])
+        writer.writerow({
+            "Subject": event['original_summary'],
+            "Start Date": start_date,
+            "Start Time": start_time,
+            "End Date": end_date,
+            "End Time": end_time,
+            "Description": event['description'],
+            "Location": event['location']
+        })
+        yield flush()
@@ -0,0 +1,151 @@
+"""
+Time conversion helpers for the timetable
+
+All timetable times are handled as UTC epoch seconds internally and only
+converted to Europe/Zurich wall-clock time when needed. UTC offsets are
+cached per UTC day, so converting thousands of lessons only does a handful
+of real timezone lookups.
+"""
+import calendar
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import time as time_module
+
+from flask import g, has_request_context
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    try:
+        ZURICH_TZ = ZoneInfo('Europe/Zurich')
+    except ZoneInfoNotFoundError:
+        # Windows without the tzdata package - fall back to pytz
+        import pytz
+        ZURICH_TZ = pytz.timezone('Europe/Zurich')
+except ImportError:
+    # Python < 3.9
+    import pytz
+    ZURICH_TZ = pytz.timezone('Europe/Zurich')
+
+SECONDS_PER_DAY = 86400
+
+# Marker for UTC days that contain a DST transition
+_MIXED_OFFSET = None
+
+
+@lru_cache(maxsize=4096)
+def _day_offset(utc_day):
+    """
+    Return the Zurich UTC offset (seconds) valid for the whole UTC day,
+    or None if a DST transition happens on that day
+    """
+    day_start = utc_day * SECONDS_PER_DAY
+    first = datetime.fromtimestamp(day_start, ZURICH_TZ).utcoffset()
+    last = datetime.fromtimestamp(day_start + SECONDS_PER_DAY - 1, ZURICH_TZ).utcoffset()
+    if first != last:
+        return _MIXED_OFFSET
+    return int(first.total_seconds())
+
+
+def utc_offset(ts):
+    """Get the Europe/Zurich UTC offset in seconds for an epoch timestamp"""
+    offset = _day_offset(ts // SECONDS_PER_DAY)
+    if offset is _MIXED_OFFSET:
+        # Only the two DST switch days per year take this path
+        return int(datetime.fromtimestamp(ts, ZURICH_TZ).utcoffset().total_seconds())
+    return offset
+
+
+@lru_cache(maxsize=8)
+def _fixed_tz(offset):
+    """Shared fixed-offset tzinfo instance for an offset in seconds"""
+    return timezone(timedelta(seconds=offset))
+
+
+def to_local(ts):
+    """Convert an epoch timestamp to an aware Europe/Zurich datetime"""
+    offset = utc_offset(ts)
+    return datetime.fromtimestamp(ts, _fixed_tz(offset))
+
+
+def local_day(ts):
+    """Local (Zurich) day number of an epoch timestamp, counted like UTC days"""
+    return (ts + utc_offset(ts)) // SECONDS_PER_DAY
+
+
+def local_day_start(day):
+    """Epoch timestamp of local midnight for a local day number"""
+    # Midnight is never inside a DST switch in Zurich (switches happen at 02:00/03:00)
+    naive = day * SECONDS_PER_DAY
+    return naive - utc_offset(naive - 7200)
+
+
+def parse_local_iso(value):
+    """
+    Parse an ISO date or date/time into epoch seconds
+    Values without a UTC offset are Zurich local time. Raises ValueError.
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        return int(parsed.timestamp())
+    naive_ts = calendar.timegm(parsed.timetuple())
+    return naive_ts - utc_offset(naive_ts)
+
+
+def parse_ics_utc(value):
+    """
+    Parse an ICS UTC stamp like '20251114T080000Z' into epoch seconds
+    Returns None if the value is not in UTC stamp format
+    """
+    value = value.strip()
+    if len(value) != 16 or value[8] != 'T' or value[15] != 'Z':
+        return None
+    try:
+        return calendar.timegm((
+            int(value[0:4]), int(value[4:6]), int(value[6:8]),
+            int(value[9:11]), int(value[11:13]), int(value[13:15])
+        ))
+    except ValueError:
+        return None
+
+
+def format_ics_utc(ts):
+    """Format epoch seconds as an ICS UTC stamp like '20251114T080000Z'"""
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+@lru_cache(maxsize=2048)
+def _csv_day_epoch(date_str):
+    """UTC epoch of midnight for a 'MM/DD/YYYY' date string"""
+    month, day, year = date_str.split('/')
+    return calendar.timegm((int(year), int(month), int(day), 0, 0, 0))
+
+
+def parse_csv_utc(date_str, time_str):
+    """
+    Parse CSV 'MM/DD/YYYY' + 'HH:MM' (UTC, as written by the ICS converter)
+    into epoch seconds
+    """
+    hours, minutes = time_str.split(':')
+    return _csv_day_epoch(date_str) + int(hours) * 3600 + int(minutes) * 60
+
+
+def format_csv_utc(ts):
+    """Format epoch seconds as CSV ('MM/DD/YYYY', 'HH:MM') in UTC"""
+    dt = datetime.fromtimestamp(ts, timezone.utc)
+    return dt.strftime('%m/%d/%Y'), dt.strftime('%H:%M')
+
+
+def request_now():
+    """
+    Get the current time as epoch seconds
+
+    Inside a Flask request the clock is captured once and reused, so all
+    helpers called during the same request agree on "now".
+    """
+    if not has_request_context():
+        return int(time_module.time())
+    now = g.get('request_now')
+    if now is None:
+        now = int(time_module.time())
+        g.request_now = now
+    return now
@@ -0,0 +1,329 @@
+"""
+Resilient calls to the external services (ICS feed, OpenWeather, ISY)
+
+Every upstream has a circuit breaker: after failure_threshold failed calls
+in a row it opens, and calls fail immediately for reset_timeout seconds.
+After that a single probe call is let through (half-open); its outcome
+closes the breaker again or keeps it open. A failed call is also cached
+per key for negative_ttl seconds, so the same request isn't sent again by
+every incoming request while it keeps failing.
+
+Within one call, attempts are retried with jittered exponential backoff,
+but only as long as the total deadline allows. Callers that have older
+data should serve it when UpstreamUnavailable is raised.
+
+Routes that mostly wait on upstreams are written once as flows: generators
+that yield the calls they need (upstream.call(...) or Blocking(...)) and
+get the results sent back. run_flow() executes them in the calling thread
+(WSGI mode), run_flow_async() on an event loop with a shared httpx client
+(ASGI mode, see asgi.py), so an upstream wait no longer occupies a thread.
+"""
+import asyncio
+import random
+import threading
+import time as time_module
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# Negative cache entries are pruned once there are this many
+_MAX_NEGATIVE_ENTRIES = 256
+
+# Connection pools shared by all upstreams: one requests session for the
+# threaded mode, one httpx client per event loop for the async mode
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=32))
+_session.mount('http://', HTTPAdapter(pool_connections=8, pool_maxsize=32))
+ASYNC_MAX_CONNECTIONS = 200
+ASYNC_MAX_KEEPALIVE = 40
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class UpstreamUnavailable(requests.exceptions.ConnectionError):
+    """The upstream failed, is known to be failing, or its circuit is open"""
+
+
+def async_client():
+    """The shared httpx client of the running event loop"""
+    if httpx is None:
+        raise RuntimeError('The async mode needs httpx (pip install httpx)')
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=ASYNC_MAX_CONNECTIONS, max_keepalive_connections=ASYNC_MAX_KEEPALIVE
+        ))
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the shared httpx client of the running event loop (on shutdown)"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _to_requests_response(response):
+    """Wrap an httpx response as requests.Response, so flows handle both modes alike"""
+    result = requests.Response()
+    result.status_code = response.status_code
+    result.reason = response.reason_phrase
+    result.headers = CaseInsensitiveDict(response.headers)
+    result.url = str(response.url)
+    result.encoding = response.encoding
+    result._content = response.content
+    return result
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go out now (in half-open state only one at a time)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time_module.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time_module.monotonic()
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed (0 when closed)"""
+        if self.state == CLOSED:
+            return 0
+        return max(0, self.reset_timeout - (time_module.monotonic() - self._opened_at))
+
+
+class Upstream:
+    """HTTP calls to one external service, guarded by a circuit breaker"""
+
+    def __init__(self, name, timeout=10, deadline=15, attempts=3, base_delay=0.25, max_delay=4,
+                 failure_threshold=3, reset_timeout=30, negative_ttl=15):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.negative_ttl = negative_ttl
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._failures = {}  # key -> (expires, reason)
+        self._lock = threading.Lock()
+
+    def _cached_failure(self, key):
+        with self._lock:
+            failure = self._failures.get(key)
+            if failure and failure[0] <= time_module.monotonic():
+                del self._failures[key]
+                return None
+            return failure
+
+    def _remember_failure(self, key, reason):
+        now = time_module.monotonic()
+        with self._lock:
+            if len(self._failures) >= _MAX_NEGATIVE_ENTRIES:
+                self._failures = {k: v for k, v in self._failures.items() if v[0] > now}
+            self._failures[key] = (now + self.negative_ttl, reason)
+
+    def _admit(self, method, url, key):
+        """Fail fast if possible, else return (key, attempts, deadline) for a new call"""
+        if key is None:
+            key = (method, url)
+        failure = self._cached_failure(key)
+        if failure:
+            raise UpstreamUnavailable(f"{self.name}: {failure[1]} (recent failure)")
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(f"{self.name}: circuit open, retry in {self.breaker.retry_after():.0f}s")
+        # A half-open probe gets exactly one attempt
+        attempts = 1 if self.breaker.state == HALF_OPEN else self.attempts
+        return key, attempts, time_module.monotonic() + self.deadline
+
+    def _backoff(self, attempt, attempts, deadline):
+        """Delay before the next attempt, or None if there is no time or attempt left"""
+        # Full jitter: a random share of the exponential step
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if attempt + 1 >= attempts or time_module.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _failed(self, key, reason):
+        print(f"Upstream {self.name} failed: {reason}")
+        self.breaker.record_failure()
+        self._remember_failure(key, reason)
+        return UpstreamUnavailable(f"{self.name}: {reason}")
+
+    @staticmethod
+    def _succeeded(status_code):
+        return status_code < 500 and status_code != 429
+
+    def request(self, method, url, key=None, **kwargs):
+        """
+        Send a request like requests.request() and return the response
+
+        Responses below 500 (except 429) count as success and are returned
+        as they are. Raises UpstreamUnavailable without waiting when the
+        circuit is open or the same key failed within negative_ttl, and after
+        all attempts within the deadline failed. key identifies the request
+        for negative caching (default: method and URL).
+        """
+        key, attempts, deadline = self._admit(method, url, key)
+        reason = 'deadline exceeded'
+        for attempt in range(attempts):
+            remaining = deadline - time_module.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                response = _session.request(method, url, timeout=min(self.timeout, remaining), **kwargs)
+            except requests.exceptions.RequestException as e:
+                reason = f"{type(e).__name__}: {e}"
+            else:
+                if self._succeeded(response.status_code):
+                    self.breaker.record_success()
+                    return response
+                reason = f"HTTP {response.status_code}"
+                response.close()
+
+            delay = self._backoff(attempt, attempts, deadline)
+            if delay is None:
+                break
+            time_module.sleep(delay)
+
+        raise self._failed(key, reason)
+
+    async def arequest(self, method, url, key=None, **kwargs):
+        """
+        Async variant of request() on the shared httpx client
+        Returns a requests.Response (read completely); stream=True is not supported.
+        """
+        key, attempts, deadline = self._admit(method, url, key)
+        reason = 'deadline exceeded'
+        for attempt in range(attempts):
+            remaining = deadline - time_module.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                response = await async_client().request(
+                    method, url, timeout=min(self.timeout, remaining), **kwargs
+                )
+            except httpx.HTTPError as e:
+                reason = f"{type(e).__name__}: {e}"
+            else:
+                if self._succeeded(response.status_code):
+                    self.breaker.record_success()
+                    return _to_requests_response(response)
+                reason = f"HTTP {response.status_code}"
+
+            delay = self._backoff(attempt, attempts, deadline)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+
+        raise self._failed(key, reason)
+
+    def call(self, method, url, **kwargs):
+        """A request for a flow to yield (see run_flow)"""
+        return Call(self, method, url, kwargs)
+
+
+class Call:
+    """An upstream request yielded by a flow"""
+
+    def __init__(self, upstream, method, url, kwargs):
+        self.upstream = upstream
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+
+    def run(self):
+        return self.upstream.request(self.method, self.url, **self.kwargs)
+
+    async def arun(self):
+        return await self.upstream.arequest(self.method, self.url, **self.kwargs)
+
+
+class Blocking:
+    """
+    A blocking call yielded by a flow (SDK call, lock, disk)
+    In async mode async_func is awaited if given, else func runs in a worker thread.
+    """
+
+    def __init__(self, func, async_func=None):
+        self.func = func
+        self.async_func = async_func
+
+    def run(self):
+        return self.func()
+
+    async def arun(self):
+        if self.async_func is not None:
+            return await self.async_func()
+        return await asyncio.to_thread(self.func)
+
+
+def run_flow(flow):
+    """Run a flow in the calling thread and return its result"""
+    result, error = None, None
+    while True:
+        try:
+            step = flow.throw(error) if error is not None else flow.send(result)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            result = step.run()
+        except Exception as e:
+            error = e
+
+
+async def run_flow_async(flow):
+    """Run a flow on the event loop; upstream waits don't block a thread"""
+    result, error = None, None
+    while True:
+        try:
+            step = flow.throw(error) if error is not None else flow.send(result)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            result = await step.arun()
+        except Exception as e:
+            error = e